@@ -0,0 +1,87 @@
+"""
+Accuracy parity and CPU throughput of the inference engines against Keras.
+
+Run from urban-backend/ after exporting the models (services.model_export):
+    python -m benchmarks.bench_inference --engines onnx:none onnx:int8 tflite:float16
+    python -m benchmarks.bench_inference --engines keras:none:4 onnx:int8:4 --batch-sizes 4000 16000
+
+An engine spec is engine:quantization[:workers]; with workers the engine runs
+in a process pool (services.inference_pool).
+
+Inputs are random stacks assembled exactly as in production; pass --stack with
+an .npy file of real (pixels, 12, 18) features for a more meaningful parity
+check. Exits non-zero if any engine agrees with Keras on fewer than
+--min-agreement of the predicted classes.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.bench_preprocess import MODEL_BAND_ORDER, MONTH_DATES, make_stack
+from services.inference_engine import create_inference_engine
+from services.pixel_features import assemble_batch
+
+
+def run(engine, X: np.ndarray, batch_size: int) -> np.ndarray:
+    return np.concatenate([engine.predict(X[i:i + batch_size]) for i in range(0, len(X), batch_size)])
+
+
+def throughput(engine, X: np.ndarray, batch_size: int, repeat: int) -> float:
+    """Best pixels/s over repeat passes."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run(engine, X, batch_size)
+        best = min(best, time.perf_counter() - start)
+    return len(X) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='models/LSTM_model_64.keras')
+    parser.add_argument('--engines', nargs='+', default=['onnx:none', 'onnx:int8', 'tflite:none', 'tflite:float16'],
+                        help='engine:quantization[:workers] specs to compare with keras')
+    parser.add_argument('--pixels', type=int, default=20_000)
+    parser.add_argument('--stack', help='.npy file of (pixels, 12, 18) features to use instead of random data')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[256, 1000, 4096])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--min-agreement', type=float, default=0.99)
+    args = parser.parse_args()
+
+    features = np.load(args.stack)[:args.pixels] if args.stack else make_stack(args.pixels)
+    X = assemble_batch(features, MODEL_BAND_ORDER, MODEL_BAND_ORDER, MONTH_DATES)
+
+    engines = {'keras:none': create_inference_engine(args.model, 'keras', 'none', workers=0)}
+    for spec in args.engines:
+        name, *options = spec.split(':')
+        quantization = options[0] if options else 'none'
+        workers = int(options[1]) if len(options) > 1 else 0
+        try:
+            engines[spec] = create_inference_engine(args.model, name, quantization, workers=workers)
+        except (FileNotFoundError, ImportError) as e:
+            print(f"Skipping {spec}: {e}")
+
+    reference = run(engines['keras:none'], X, max(args.batch_sizes))
+    reference_classes = reference.argmax(axis=1)
+
+    print(f"Pixels: {len(X):,}")
+    header = f"{'engine':<18}{'agreement':>11}{'max |dp|':>10}" + ''.join(f"{f'px/s @{b}':>15}" for b in args.batch_sizes)
+    print(header)
+    failed = False
+    for name, engine in engines.items():
+        probs = run(engine, X, max(args.batch_sizes))
+        agreement = float(np.mean(probs.argmax(axis=1) == reference_classes))
+        max_diff = float(np.max(np.abs(probs - reference)))
+        rates = [throughput(engine, X, b, args.repeat) for b in args.batch_sizes]
+        print(f"{name:<18}{agreement:>10.2%}{max_diff:>10.4f}" + ''.join(f"{r:>15,.0f}" for r in rates))
+        failed |= agreement < args.min_agreement
+
+    if failed:
+        print(f"Agreement below {args.min_agreement:.2%} for at least one engine")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Keras inference throughput: Model.predict vs the compiled, bucket-padded path,
+across intra-/inter-op thread counts.
+
+Run from urban-backend/:
+    python -m benchmarks.bench_keras --pixels 200000 --intra 1 2 4 --inter 1 2
+
+TensorFlow fixes its thread pools at startup, so every configuration runs in
+its own subprocess. Batches are fed the way LandCoverClassifier does, with a
+ragged last batch, so retracing shows up in the predict numbers.
+"""
+import argparse
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.bench_preprocess import MODEL_BAND_ORDER, MONTH_DATES, make_stack
+from services.inference_engine import create_inference_engine
+from services.pixel_features import assemble_batch
+
+
+def measure(args) -> dict:
+    """Child mode: time one configuration, taken from the LULC_* environment."""
+    engine = create_inference_engine(args.model, 'keras', 'none', workers=0)
+    X = assemble_batch(make_stack(args.pixels), MODEL_BAND_ORDER, MODEL_BAND_ORDER, MONTH_DATES)
+
+    start = time.perf_counter()
+    engine.warm_up(X.shape[1:])
+    warm_up = time.perf_counter() - start
+
+    best = float('inf')
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        for i in range(0, len(X), args.batch_size):
+            engine.predict(X[i:i + args.batch_size])
+        best = min(best, time.perf_counter() - start)
+    return {'pixels_per_second': len(X) / best, 'warm_up': warm_up}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default='models/LSTM_model_64.keras')
+    parser.add_argument('--pixels', type=int, default=100_000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--buckets', default='64,256,1024')
+    parser.add_argument('--intra', type=int, nargs='+', default=[0])
+    parser.add_argument('--inter', type=int, nargs='+', default=[0])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args)))
+        return
+
+    print(f"Pixels: {args.pixels:,}, batch size {args.batch_size}, buckets {args.buckets} (0 threads = TF default)")
+    print(f"{'mode':<10}{'intra':>7}{'inter':>7}{'warm-up s':>11}{'pixels/s':>14}")
+    for compiled, intra, inter in itertools.product(('0', '1'), args.intra, args.inter):
+        env = {
+            **os.environ,
+            'LULC_KERAS_COMPILED': compiled,
+            'LULC_KERAS_BATCH_BUCKETS': args.buckets,
+            'LULC_INFERENCE_THREADS': str(intra),
+            'LULC_INFERENCE_INTER_THREADS': str(inter),
+            'TF_CPP_MIN_LOG_LEVEL': '2',
+        }
+        command = [
+            sys.executable, '-m', 'benchmarks.bench_keras', '--child', '--model', args.model,
+            '--pixels', str(args.pixels), '--batch-size', str(args.batch_size), '--repeat', str(args.repeat)
+        ]
+        output = subprocess.run(command, env=env, capture_output=True, text=True, check=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        mode = 'compiled' if compiled == '1' else 'predict'
+        print(f"{mode:<10}{intra:>7}{inter:>7}{result['warm_up']:>11.2f}{result['pixels_per_second']:>14,.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+"""
+Per-pixel vs batch model-input assembly.
+
+Run from urban-backend/:
+    python -m benchmarks.bench_preprocess --pixels 1000000
+
+The per-pixel path needs one nested dict per pixel, which does not fit in
+memory at 1M pixels, so it is timed on --legacy-sample pixels and scaled up.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from services.pixel_features import assemble_batch, preprocess_pixel
+
+MODEL_BAND_ORDER = [
+    'NDWI', 'MNDWI', 'NDSI', 'NDVI', 'SAVI', 'NDMI', 'NDBI',
+    'B3', 'B2', 'B4', 'B11', 'B8', 'B8A', 'B9', 'VV', 'VH', 'B1', 'B12'
+]
+MONTH_DATES = [f"2023-{month:02d}-15" for month in range(1, 13)]
+
+
+def make_stack(n_pixels: int, seed: int = 0) -> np.ndarray:
+    """Random (pixels, 12, 18) stack with masked values and an all-missing month."""
+    rng = np.random.default_rng(seed)
+    features = rng.random((n_pixels, 12, len(MODEL_BAND_ORDER)), dtype=np.float32)
+    features[rng.random(features.shape) < 0.05] = np.nan
+    features[:, 6, :] = np.nan
+    return features
+
+
+def stack_to_pixels(features: np.ndarray) -> list:
+    """Legacy nested-dict representation of a stack (months with no data are dropped)."""
+    pixels = []
+    for row in features:
+        monthly_data = []
+        for month_idx, values in enumerate(row):
+            month_features = {
+                band: float(value)
+                for band, value in zip(MODEL_BAND_ORDER, values)
+                if not np.isnan(value)
+            }
+            if month_features:
+                monthly_data.append({'month': MONTH_DATES[month_idx], 'features': month_features})
+        pixels.append({'latitude': 0.0, 'longitude': 0.0, 'monthly_data': monthly_data})
+    return pixels
+
+
+def timed(fn, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pixels', type=int, default=1_000_000)
+    parser.add_argument('--legacy-sample', type=int, default=20_000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    features = make_stack(args.pixels)
+    sample = min(args.legacy_sample, args.pixels)
+    legacy_pixels = stack_to_pixels(features[:sample])
+
+    # Both paths must produce the same tensor
+    expected = np.array([preprocess_pixel(p, MODEL_BAND_ORDER) for p in legacy_pixels])
+    actual = assemble_batch(features, MODEL_BAND_ORDER, MODEL_BAND_ORDER, MONTH_DATES, 0, sample)
+    assert np.array_equal(expected, actual), "batch assembly differs from preprocess_pixel"
+
+    legacy_time = timed(
+        lambda: np.array([preprocess_pixel(p, MODEL_BAND_ORDER) for p in legacy_pixels]), args.repeat
+    ) * args.pixels / sample
+    full_time = timed(
+        lambda: assemble_batch(features, MODEL_BAND_ORDER, MODEL_BAND_ORDER, MONTH_DATES), args.repeat
+    )
+    batched_time = timed(
+        lambda: [
+            assemble_batch(features, MODEL_BAND_ORDER, MODEL_BAND_ORDER, MONTH_DATES, start, start + args.batch_size)
+            for start in range(0, args.pixels, args.batch_size)
+        ],
+        args.repeat
+    )
+
+    print(f"Pixels: {args.pixels:,} (per-pixel path timed on {sample:,} and scaled)")
+    print(f"{'path':<28}{'seconds':>10}{'pixels/s':>16}{'speedup':>10}")
+    for name, seconds in [
+        ('preprocess_pixel loop', legacy_time),
+        ('assemble_batch (whole)', full_time),
+        (f'assemble_batch ({args.batch_size}/batch)', batched_time),
+    ]:
+        print(f"{name:<28}{seconds:>10.3f}{args.pixels / seconds:>16,.0f}{legacy_time / seconds:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
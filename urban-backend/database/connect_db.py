@@ -1,21 +1,12 @@
-from urllib.parse import urlparse
-import os
-from dotenv import load_dotenv
-import mysql.connector
+from database.database import engine
 
-load_dotenv()
 
 def connect_db():
-    db_url = os.getenv("DATABASE_URL")
-    if db_url.startswith("mysql+mysqlconnector://"):
-        db_url = db_url.replace("mysql+mysqlconnector://", "mysql://")
-
-    parsed = urlparse(db_url)
-
-    return mysql.connector.connect(
-        host=parsed.hostname,
-        port=parsed.port or 3306,
-        user=parsed.username,
-        password=parsed.password,
-        database=parsed.path.lstrip('/')
-    )
+    """
+    A DBAPI (mysql.connector) connection checked out from the shared engine pool.
+
+    It behaves like a plain connection (cursor(), commit(), rollback()), but
+    close() returns it to the pool instead of closing the socket, so callers
+    don't pay a TCP and auth handshake each time.
+    """
+    return engine.raw_connection()
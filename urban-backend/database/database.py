@@ -1,6 +1,6 @@
 from sqlalchemy import create_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.orm import sessionmaker
 import os
 from dotenv import load_dotenv
 
@@ -8,11 +8,20 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 print(f"Connecting to database at: {DATABASE_URL}")
-engine = create_engine(DATABASE_URL)
-SessionLocal = scoped_session(sessionmaker(autocommit=False, autoflush=False, bind=engine))
+# One connection pool per process, shared by ORM sessions and raw cursors (database.connect_db)
+engine = create_engine(
+    DATABASE_URL,
+    pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+    max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+    pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+    # Check connections before use, and replace them before MySQL's wait_timeout drops them
+    pool_pre_ping=os.getenv("DB_POOL_PRE_PING", "1") == "1",
+    pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800"))
+)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
-# Dependency to get DB session
+# Dependency to get DB session: a fresh session per request, returned to the pool afterwards
 def get_db():
     db = SessionLocal()
     try:
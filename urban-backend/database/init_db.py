@@ -0,0 +1,340 @@
+"""
+Schema upgrades that Base.metadata.create_all cannot do on existing tables.
+
+Some steps delete rows, so this never runs at API startup. Back up the
+database, stop the batch runner, then run it once per deploy that needs it:
+    python -m database.init_db
+Every step checks the live schema first, so running it again is safe.
+The legacy uc_analysis.result_geojson column is only dropped by a separate,
+later run, which first checks that every result was copied out of it:
+    python -m database.init_db --drop-result-geojson
+MySQL commits each ALTER TABLE on its own, so a run that stops halfway is
+finished by running it again.
+
+Some UC names cover several polygons. A UC is one result per name, computed
+over the union of its pieces, so legacy per-piece boundaries and results of
+the same name are dissolved into one rather than dropped (see
+processor.uc_inputs.dissolve_ucs).
+"""
+import json
+import logging
+from collections import defaultdict
+
+import shapely
+from shapely.geometry import mapping, shape
+from sqlalchemy import bindparam, inspect, text
+
+from database.uc_results import METRICS, METRIC_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = "urbandb"
+
+
+def _geometry(value):
+    """Shapely geometry of a GeoJSON geometry read from a JSON column."""
+    return shape(json.loads(value) if isinstance(value, (str, bytes)) else value)
+
+
+def _dissolve(geometries):
+    """One GeoJSON geometry covering all pieces of a UC, as a JSON string."""
+    return json.dumps(mapping(shapely.union_all([_geometry(geometry) for geometry in geometries])))
+
+
+def upgrade_uc_analysis(engine):
+    """Add uc_analysis.period, backfilled for existing rows."""
+    inspector = inspect(engine)
+    if not inspector.has_table("uc_analysis", schema=SCHEMA):
+        return
+
+    columns = {column["name"]: column for column in inspector.get_columns("uc_analysis", schema=SCHEMA)}
+    with engine.begin() as conn:
+        if "period" not in columns:
+            logger.info("Adding uc_analysis.period")
+            conn.execute(text(f"ALTER TABLE {SCHEMA}.uc_analysis ADD COLUMN period VARCHAR(32) NULL AFTER analysis_type"))
+        if "period" not in columns or columns["period"]["nullable"]:
+            # Existing rows are keyed by the day they were computed on
+            conn.execute(text(
+                f"UPDATE {SCHEMA}.uc_analysis SET period = DATE_FORMAT(analysis_date, '%Y-%m-%d') WHERE period IS NULL"
+            ))
+            conn.execute(text(f"ALTER TABLE {SCHEMA}.uc_analysis MODIFY period VARCHAR(32) NOT NULL"))
+
+
+def merge_split_uc_results(conn):
+    """
+    Combine legacy rows computed per piece of a split UC (same uc_id,
+    analysis_type and period, different geometries) into one row whose metrics
+    are the area-weighted mean of the pieces' newest values. Returns the
+    number of results merged.
+    """
+    columns = ", ".join(f"a.{column}" for column in METRIC_COLUMNS)
+    rows = conn.execute(text(f"""
+        SELECT a.id, a.uc_id, a.analysis_type, a.period, {columns}, JSON_EXTRACT(a.result_geojson, '$.geometry')
+        FROM {SCHEMA}.uc_analysis a
+        JOIN (
+            SELECT uc_id, analysis_type, period FROM {SCHEMA}.uc_analysis
+            WHERE JSON_EXTRACT(result_geojson, '$.geometry') IS NOT NULL
+            GROUP BY uc_id, analysis_type, period
+            HAVING COUNT(DISTINCT MD5(CAST(JSON_EXTRACT(result_geojson, '$.geometry') AS CHAR))) > 1
+        ) split ON split.uc_id = a.uc_id AND split.analysis_type = a.analysis_type AND split.period = a.period
+        WHERE JSON_EXTRACT(a.result_geojson, '$.geometry') IS NOT NULL
+        ORDER BY a.analysis_date, a.id
+    """)).all()
+
+    # (uc_id, analysis_type, period) -> {piece geometry: (id, metric values)}, newest row per piece
+    results = defaultdict(dict)
+    for row_id, uc_id, analysis_type, period, *values, geometry in rows:
+        results[(uc_id, analysis_type, period)][geometry] = (row_id, values)
+
+    for (uc_id, analysis_type, period), pieces in results.items():
+        weights = [_geometry(geometry).area for geometry in pieces]
+        merged = {}
+        for i, column in enumerate(METRIC_COLUMNS):
+            known = [
+                (weight, values[i]) for weight, (_, values) in zip(weights, pieces.values())
+                if values[i] is not None
+            ]
+            total = sum(weight for weight, _ in known)
+            merged[column] = sum(weight * value for weight, value in known) / total if total else None
+        keep = max(row_id for row_id, _ in pieces.values())
+        conn.execute(
+            text(
+                f"UPDATE {SCHEMA}.uc_analysis SET "
+                + ", ".join(f"{column} = :{column}" for column in METRIC_COLUMNS)
+                + " WHERE id = :id"
+            ),
+            {**merged, "id": keep}
+        )
+        conn.execute(
+            text(
+                f"DELETE FROM {SCHEMA}.uc_analysis "
+                "WHERE uc_id = :uc_id AND analysis_type = :analysis_type AND period = :period AND id <> :id"
+            ),
+            {"uc_id": uc_id, "analysis_type": analysis_type, "period": period, "id": keep}
+        )
+    return len(results)
+
+
+def add_uc_analysis_key(engine):
+    """
+    Add the (uc_id, analysis_type, period) unique key: per-piece results of
+    split UCs are merged, and of rows left by earlier reruns only the newest is kept.
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table("uc_analysis", schema=SCHEMA):
+        return
+    constraints = {constraint["name"] for constraint in inspector.get_unique_constraints("uc_analysis", schema=SCHEMA)}
+    if "uq_uc_analysis_period" in constraints:
+        return
+    columns = {column["name"] for column in inspector.get_columns("uc_analysis", schema=SCHEMA)}
+
+    with engine.begin() as conn:
+        if "result_geojson" in columns:
+            merged = merge_split_uc_results(conn)
+            logger.info(f"Merged per-piece rows of {merged} split UC results")
+        removed = conn.execute(text(f"""
+            DELETE older FROM {SCHEMA}.uc_analysis older
+            JOIN {SCHEMA}.uc_analysis newer
+              ON older.uc_id = newer.uc_id
+             AND older.analysis_type = newer.analysis_type
+             AND older.period = newer.period
+             AND (older.analysis_date < newer.analysis_date
+                  OR (older.analysis_date = newer.analysis_date AND older.id < newer.id))
+        """)).rowcount
+        logger.info(f"Removed {removed} duplicate uc_analysis rows; adding unique key")
+        conn.execute(text(
+            f"ALTER TABLE {SCHEMA}.uc_analysis "
+            "ADD CONSTRAINT uq_uc_analysis_period UNIQUE (uc_id, analysis_type, period)"
+        ))
+
+
+def upgrade_uc_boundaries(engine):
+    """
+    Make uc_boundaries.name unique, so results can be joined to their UC
+    geometry by name. Rows sharing a name (the pieces of a split UC, or
+    repeats) are dissolved into one boundary.
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table("uc_boundaries", schema=SCHEMA):
+        return
+    unique = [
+        *inspector.get_unique_constraints("uc_boundaries", schema=SCHEMA),
+        *[index for index in inspector.get_indexes("uc_boundaries", schema=SCHEMA) if index.get("unique")]
+    ]
+    if any(constraint["column_names"] == ["name"] for constraint in unique):
+        return
+
+    with engine.begin() as conn:
+        rows = conn.execute(text(f"""
+            SELECT b.id, b.name, b.geometry FROM {SCHEMA}.uc_boundaries b
+            JOIN (SELECT name FROM {SCHEMA}.uc_boundaries GROUP BY name HAVING COUNT(*) > 1) repeated
+              ON repeated.name = b.name
+            ORDER BY b.id
+        """)).all()
+        pieces = defaultdict(list)
+        for row_id, name, geometry in rows:
+            pieces[name].append((row_id, geometry))
+        for name, group in pieces.items():
+            keep = group[-1][0]
+            conn.execute(
+                text(f"UPDATE {SCHEMA}.uc_boundaries SET geometry = :geometry WHERE id = :id"),
+                {"geometry": _dissolve([geometry for _, geometry in group]), "id": keep}
+            )
+            conn.execute(
+                text(f"DELETE FROM {SCHEMA}.uc_boundaries WHERE name = :name AND id <> :id"),
+                {"name": name, "id": keep}
+            )
+        logger.info(f"Dissolved {len(rows)} uc_boundaries rows into {len(pieces)}; adding unique key on name")
+        conn.execute(text(f"ALTER TABLE {SCHEMA}.uc_boundaries ADD CONSTRAINT uq_uc_boundaries_name UNIQUE (name)"))
+
+
+def _json_metric(prop):
+    """A metric's value in a legacy result_geojson blob, as SQL (NULL where absent or null)."""
+    return f"NULLIF(JSON_UNQUOTE(JSON_EXTRACT(result_geojson, '$.properties.{prop}')), 'null')"
+
+
+def upgrade_uc_metrics(engine):
+    """
+    Copy uc_analysis results from result_geojson blobs into typed metric
+    columns and keep each UC's geometry once in uc_boundaries. result_geojson
+    itself is kept (and made nullable, as current writers leave it empty)
+    until drop_result_geojson has checked the copy.
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table("uc_analysis", schema=SCHEMA):
+        return
+    columns = {column["name"]: column for column in inspector.get_columns("uc_analysis", schema=SCHEMA)}
+
+    with engine.begin() as conn:
+        missing = [column for column in METRIC_COLUMNS if column not in columns]
+        if missing:
+            logger.info(f"Adding uc_analysis metric columns: {', '.join(missing)}")
+            conn.execute(text(
+                f"ALTER TABLE {SCHEMA}.uc_analysis "
+                + ", ".join(f"ADD COLUMN {column} FLOAT NULL" for column in missing)
+            ))
+
+        if "result_geojson" not in columns:
+            return
+        if not columns["result_geojson"]["nullable"]:
+            conn.execute(text(f"ALTER TABLE {SCHEMA}.uc_analysis MODIFY result_geojson JSON NULL"))
+
+        for analysis_type, metrics in METRICS.items():
+            assignments = ", ".join(f"{column} = {_json_metric(prop)}" for prop, column in metrics.items())
+            not_copied = " AND ".join(f"{column} IS NULL" for column in metrics.values())
+            # Only rows not copied yet: rows written since the upgrade have no blob,
+            # and merged split-UC rows hold values their blob doesn't
+            copied = conn.execute(
+                text(
+                    f"UPDATE {SCHEMA}.uc_analysis SET {assignments} "
+                    f"WHERE analysis_type = :analysis_type AND result_geojson IS NOT NULL AND {not_copied}"
+                ),
+                {"analysis_type": analysis_type}
+            ).rowcount
+            logger.info(f"Copied {analysis_type} metrics of {copied} uc_analysis rows to typed columns")
+
+        # Boundaries of UCs that have none yet: the union of the distinct piece
+        # geometries found in their results (the batch runner keeps them current after this)
+        rows = conn.execute(text(f"""
+            SELECT a.uc_id, JSON_EXTRACT(a.result_geojson, '$.geometry')
+            FROM {SCHEMA}.uc_analysis a
+            JOIN (
+                SELECT MAX(id) AS id FROM {SCHEMA}.uc_analysis
+                WHERE JSON_EXTRACT(result_geojson, '$.geometry') IS NOT NULL
+                GROUP BY uc_id, MD5(CAST(JSON_EXTRACT(result_geojson, '$.geometry') AS CHAR))
+            ) piece ON piece.id = a.id
+            WHERE a.uc_id NOT IN (SELECT name FROM {SCHEMA}.uc_boundaries)
+        """)).all()
+        pieces = defaultdict(list)
+        for uc_id, geometry in rows:
+            pieces[uc_id].append(geometry)
+        if pieces:
+            conn.execute(
+                text(f"INSERT INTO {SCHEMA}.uc_boundaries (name, geometry) VALUES (:name, :geometry)"),
+                [{"name": uc_id, "geometry": _dissolve(geometries)} for uc_id, geometries in pieces.items()]
+            )
+            logger.info(f"Stored boundaries of {len(pieces)} UCs from their results")
+    logger.info("Run with --drop-result-geojson to check the copy and drop uc_analysis.result_geojson")
+
+
+def unmigrated_results(conn):
+    """
+    What dropping result_geojson would lose: rows whose blob holds a metric its
+    typed column lacks (or whose analysis type has no typed columns), and UCs
+    whose blob geometry has no uc_boundaries row.
+    """
+    lost = {}
+    for analysis_type, metrics in METRICS.items():
+        conditions = " OR ".join(
+            f"({column} IS NULL AND {_json_metric(prop)} IS NOT NULL)" for prop, column in metrics.items()
+        )
+        lost[analysis_type] = conn.execute(
+            text(
+                f"SELECT COUNT(*) FROM {SCHEMA}.uc_analysis "
+                f"WHERE analysis_type = :analysis_type AND result_geojson IS NOT NULL AND ({conditions})"
+            ),
+            {"analysis_type": analysis_type}
+        ).scalar()
+    lost["unknown analysis types"] = conn.execute(
+        text(
+            f"SELECT COUNT(*) FROM {SCHEMA}.uc_analysis "
+            "WHERE result_geojson IS NOT NULL AND analysis_type NOT IN :analysis_types"
+        ).bindparams(bindparam("analysis_types", expanding=True)),
+        {"analysis_types": list(METRICS)}
+    ).scalar()
+    lost["uc geometries"] = conn.execute(text(f"""
+        SELECT COUNT(DISTINCT a.uc_id) FROM {SCHEMA}.uc_analysis a
+        LEFT JOIN {SCHEMA}.uc_boundaries b ON b.name = a.uc_id
+        WHERE b.name IS NULL AND JSON_EXTRACT(a.result_geojson, '$.geometry') IS NOT NULL
+    """)).scalar()
+    return {name: count for name, count in lost.items() if count}
+
+
+def drop_result_geojson(engine):
+    """
+    Drop uc_analysis.result_geojson once upgrade_uc_metrics has copied all of it.
+    Raises instead of dropping if any row or geometry would be lost.
+    """
+    inspector = inspect(engine)
+    if not inspector.has_table("uc_analysis", schema=SCHEMA):
+        return
+    columns = {column["name"] for column in inspector.get_columns("uc_analysis", schema=SCHEMA)}
+    if "result_geojson" not in columns:
+        return
+    if any(column not in columns for column in METRIC_COLUMNS):
+        raise RuntimeError("Typed metric columns are missing; run python -m database.init_db first")
+
+    with engine.connect() as conn:
+        lost = unmigrated_results(conn)
+    if lost:
+        details = ", ".join(f"{name}: {count}" for name, count in lost.items())
+        raise RuntimeError(f"Not dropping result_geojson, data not copied yet ({details}); run python -m database.init_db")
+
+    logger.info("All results and geometries copied; dropping uc_analysis.result_geojson")
+    with engine.begin() as conn:
+        conn.execute(text(f"ALTER TABLE {SCHEMA}.uc_analysis DROP COLUMN result_geojson"))
+
+
+def upgrade_schema(engine):
+    upgrade_uc_analysis(engine)
+    upgrade_uc_boundaries(engine)
+    upgrade_uc_metrics(engine)
+    # After the metric copy, so split UC results are merged from typed values
+    add_uc_analysis_key(engine)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from database.database import engine
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--drop-result-geojson", action="store_true",
+                        help="after a completed upgrade, check the copied results and drop uc_analysis.result_geojson")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.drop_result_geojson:
+        drop_result_geojson(engine)
+    else:
+        upgrade_schema(engine)
@@ -0,0 +1,154 @@
+"""
+Reads and bulk writes of UC indicator results.
+
+uc_analysis holds one row of typed metric columns per UC, indicator and
+period (the time of the newest input scene, see processor.uc_inputs), upserted on the (uc_id, analysis_type, period) unique key with
+multi-row INSERT ... ON DUPLICATE KEY UPDATE statements. UC geometry is
+stored once in uc_boundaries and joined back in (from an in-process cache)
+when results are read as GeoJSON.
+"""
+import json
+import os
+import threading
+import time
+
+# analysis_type -> {GeoJSON property: uc_analysis column}
+METRICS = {
+    'ndvi': {'NDVI': 'ndvi'},
+    'thermal': {'LST': 'lst'},
+    'air_quality': {'AQI': 'aqi', 'NO2_AQI': 'no2_aqi', 'SO2_AQI': 'so2_aqi', 'O3_AQI': 'o3_aqi'},
+}
+METRIC_COLUMNS = [column for metrics in METRICS.values() for column in metrics.values()]
+RESULT_COLUMNS = ['uc_id', 'analysis_type', 'period', 'analysis_date', *METRIC_COLUMNS]
+
+# Rows per INSERT statement; keeps packets well under max_allowed_packet
+UPSERT_CHUNK_ROWS = 500
+
+UPSERT_SQL = """INSERT INTO uc_analysis
+    ({columns})
+    VALUES {values}
+    ON DUPLICATE KEY UPDATE
+    {updates}"""
+
+# UC boundaries rarely change; re-read them at most this often (seconds)
+BOUNDARY_CACHE_TTL = float(os.getenv("UC_BOUNDARY_CACHE_TTL", "3600"))
+_boundaries = {'loaded_at': 0.0, 'geometries': {}}
+_boundaries_lock = threading.Lock()
+
+
+def result_row(analysis_type, properties, period, analysis_date):
+    """uc_analysis row (in RESULT_COLUMNS order) from a result feature's properties."""
+    metrics = METRICS[analysis_type]
+    values = {column: properties.get(prop) for prop, column in metrics.items()}
+    return (properties['uc_id'], analysis_type, period, analysis_date,
+            *[values.get(column) for column in METRIC_COLUMNS])
+
+
+def _upsert(db, sql, rows, width):
+    cursor = db.cursor()
+    try:
+        for i in range(0, len(rows), UPSERT_CHUNK_ROWS):
+            chunk = rows[i:i + UPSERT_CHUNK_ROWS]
+            values = ", ".join(["(" + ", ".join(["%s"] * width) + ")"] * len(chunk))
+            cursor.execute(sql.format(values=values), [value for row in chunk for value in row])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        cursor.close()
+
+
+def upsert_uc_results(db, rows):
+    """
+    Upsert result_row() rows in one transaction; rolls back and re-raises on
+    failure. Returns the row count.
+    """
+    if not rows:
+        return 0
+    updated = ['analysis_date', *METRIC_COLUMNS]
+    sql = UPSERT_SQL.format(
+        columns=", ".join(RESULT_COLUMNS),
+        values="{values}",
+        updates=",\n    ".join(f"{column} = VALUES({column})" for column in updated)
+    )
+    _upsert(db, sql, rows, len(RESULT_COLUMNS))
+    return len(rows)
+
+
+def upsert_uc_boundaries(db, geometries):
+    """Store {uc_id: GeoJSON geometry} in uc_boundaries, one row per UC."""
+    if not geometries:
+        return 0
+    sql = """INSERT INTO uc_boundaries (name, geometry)
+    VALUES {values}
+    ON DUPLICATE KEY UPDATE geometry = VALUES(geometry)"""
+    _upsert(db, sql, [(uc_id, json.dumps(geometry)) for uc_id, geometry in geometries.items()], 2)
+    with _boundaries_lock:
+        _boundaries['loaded_at'] = 0.0
+    return len(geometries)
+
+
+def uc_boundaries(db):
+    """{uc_id: GeoJSON geometry}, cached for BOUNDARY_CACHE_TTL seconds."""
+    with _boundaries_lock:
+        if time.time() - _boundaries['loaded_at'] < BOUNDARY_CACHE_TTL:
+            return _boundaries['geometries']
+        cursor = db.cursor()
+        try:
+            cursor.execute("SELECT name, geometry FROM uc_boundaries")
+            _boundaries['geometries'] = {
+                name: json.loads(geometry) if isinstance(geometry, (str, bytes)) else geometry
+                for name, geometry in cursor.fetchall()
+            }
+        finally:
+            cursor.close()
+        _boundaries['loaded_at'] = time.time()
+        return _boundaries['geometries']
+
+
+def stored_periods(db, analysis_type):
+    """{uc_id: newest stored period} of every UC with a result for an analysis type."""
+    cursor = db.cursor()
+    try:
+        cursor.execute(
+            "SELECT uc_id, MAX(period) FROM uc_analysis WHERE analysis_type = %s GROUP BY uc_id",
+            (analysis_type,)
+        )
+        return dict(cursor.fetchall())
+    finally:
+        cursor.close()
+
+
+def latest_uc_features(db, analysis_type):
+    """Latest-period result of every UC for an analysis type, as GeoJSON features with geometry."""
+    metrics = METRICS[analysis_type]
+    cursor = db.cursor()
+    try:
+        cursor.execute(
+            f"""SELECT a.uc_id, a.analysis_date, {', '.join(f'a.{column}' for column in metrics.values())}
+            FROM uc_analysis a
+            JOIN (
+                SELECT uc_id, MAX(period) AS period FROM uc_analysis
+                WHERE analysis_type = %s GROUP BY uc_id
+            ) latest ON latest.uc_id = a.uc_id AND latest.period = a.period
+            WHERE a.analysis_type = %s""",
+            (analysis_type, analysis_type)
+        )
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    geometries = uc_boundaries(db)
+    features = []
+    for uc_id, analysis_date, *values in rows:
+        features.append({
+            "type": "Feature",
+            "geometry": geometries.get(uc_id),
+            "properties": {
+                "uc_id": uc_id,
+                **dict(zip(metrics, values)),
+                "timestamp": str(analysis_date)
+            }
+        })
+    return features
@@ -1,4 +1,6 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI,HTTPException
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
 from fastapi.middleware.cors import CORSMiddleware
 from routes.kml_routes import router as kml_router
@@ -6,21 +8,22 @@ from routes import auth
 from database.database import engine, Base
 from fastapi.responses import FileResponse
 import os
-import database, json
 from database.connect_db import connect_db
-from routes.lulc import router as lulc_router
+from database.uc_results import METRICS, latest_uc_features
+from routes.lulc import router as lulc_router, start_warmup as start_lulc_warmup
+from routes.tiles import router as tiles_router
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create missing tables when the server starts, not whenever this module is imported.
+    # Changes to existing tables are a separate, explicit step: python -m database.init_db
+    await run_in_threadpool(Base.metadata.create_all, bind=engine)
+    # Load the land cover model and Earth Engine in the background; see /api/lulc/ready
+    start_lulc_warmup()
+    yield
 
-Base.metadata.create_all(bind=engine)
-
-app = FastAPI()
-def get_db():
-    db = database.SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+app = FastAPI(lifespan=lifespan)
 origins = ['http://localhost:3000']
 # Enable CORS
 app.add_middleware(
@@ -30,10 +33,10 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
-db=connect_db
 app.include_router(auth.router)
 app.include_router(kml_router, prefix="/api")
 app.include_router(lulc_router, prefix="/api")
+app.include_router(tiles_router)
 
 
 #lahore UCs
@@ -58,22 +61,20 @@ def get_air_quality_geojson():
     return FileResponse(file_path, media_type="application/json")
 
 @app.get("/uc-data/{analysis_type}")
-async def get_uc_data(analysis_type: str):
+def get_uc_data(analysis_type: str):
+    # Sync, so FastAPI runs the pooled database call in its threadpool instead of on the event loop
+    if analysis_type not in METRICS:
+        raise HTTPException(status_code=404, detail=f"Unknown analysis type: {analysis_type}")
     db_connection = connect_db()
-    cursor = db_connection.cursor(dictionary=True)
     
     try:
-        cursor.execute(
-            "SELECT result_geojson FROM uc_analysis WHERE analysis_type = %s",
-            (analysis_type,)
-        )
-        results = cursor.fetchall()
+        # Latest metrics per UC, with geometry joined in from the cached uc_boundaries
+        features = latest_uc_features(db_connection, analysis_type)
         
-        if not results:
+        if not features:
             raise HTTPException(status_code=404, detail="No data found")
         
         # Create a proper FeatureCollection
-        features = [json.loads(row['result_geojson']) for row in results]
         feature_collection = {
             "type": "FeatureCollection",
             "features": features
@@ -81,10 +82,11 @@ async def get_uc_data(analysis_type: str):
         
         return feature_collection  # Directly return GeoJSON structure
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Database Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
         
     finally:
-        cursor.close()
         db_connection.close()
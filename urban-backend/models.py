@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, JSON, Enum
+from sqlalchemy import Column, Integer, String, Text, TIMESTAMP, JSON, Enum, Float, UniqueConstraint
 from database.database import Base  
 from sqlalchemy.sql import text 
 
@@ -35,12 +35,18 @@ class UCBoundary(Base):
     __table_args__ = {'schema': 'urbandb'}
     
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String(255), nullable=False)
+    # The UC id that uc_analysis.uc_id refers to; a UC split into several polygons
+    # has one row, its geometry the union of the pieces
+    name = Column(String(255), nullable=False, unique=True)
     geometry = Column(JSON, nullable=False)
 
 class UC_analysis(Base):
     __tablename__ = "uc_analysis"
-    __table_args__ = {'schema': 'urbandb'}
+    # One result per UC, indicator and period (newest input scene); reruns upsert instead of adding rows
+    __table_args__ = (
+        UniqueConstraint('uc_id', 'analysis_type', 'period', name='uq_uc_analysis_period'),
+        {'schema': 'urbandb'}
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     uc_id = Column(String(255), nullable=False)
@@ -48,7 +54,16 @@ class UC_analysis(Base):
         Enum('ndvi', 'thermal', 'air_quality', name='analysis_types'),
         nullable=False
     )
-    result_geojson = Column(JSON, nullable=False)
+    # Acquisition time (UTC ISO timestamp) of the newest input scene the result was computed from
+    period = Column(String(32), nullable=False)
+    # Metrics of the row's analysis_type; the others stay NULL. UC geometry
+    # lives once in uc_boundaries (joined on uc_boundaries.name = uc_id).
+    ndvi = Column(Float, nullable=True)
+    lst = Column(Float, nullable=True)
+    aqi = Column(Float, nullable=True)
+    no2_aqi = Column(Float, nullable=True)
+    so2_aqi = Column(Float, nullable=True)
+    o3_aqi = Column(Float, nullable=True)
     analysis_date = Column(
         TIMESTAMP,
         nullable=False,
@@ -1,11 +1,10 @@
 import ee
-import json
 import mysql.connector
 from datetime import datetime, timedelta, UTC
 from database.connect_db import connect_db
-
-ee.Initialize(project='ee-sp22-bse-059')
-db = connect_db()
+from database.uc_results import result_row, upsert_uc_boundaries, upsert_uc_results
+from processor.uc_inputs import dissolve_ucs, input_period, with_input_time
+from services.gee_project import initialize_ee
 
 AQI_BREAKPOINTS = {
     'NO2': [    # mol/m² × 1e5 for conversion
@@ -44,127 +43,112 @@ def calculate_subindex(value, pollutant):
     print(f"⚠️ {pollutant} value {value} out of range! Using 0")
     return 0 
 
-def compute_aqi(uc_feature):
-    try:
-        uc_id = uc_feature.get('UC').getInfo()
-        print(f"\n🌫 Processing UC: {uc_id}")
-
-        # Date range for analysis
-        start_date, end_date = get_date_range()
-
-        collections = {
-            'NO2': ('COPERNICUS/S5P/OFFL/L3_NO2', 'NO2_column_number_density', 1e5),
-            'SO2': ('COPERNICUS/S5P/OFFL/L3_SO2', 'SO2_column_number_density', 1e5),
-            'CO': ('COPERNICUS/S5P/OFFL/L3_CO', 'CO_column_number_density', 1.15),
-            'O3': ('COPERNICUS/S5P/OFFL/L3_O3', 'O3_column_number_density', 2e3)
-        }
+POLLUTANT_COLLECTIONS = {
+    'NO2': ('COPERNICUS/S5P/OFFL/L3_NO2', 'NO2_column_number_density', 1e5),
+    'SO2': ('COPERNICUS/S5P/OFFL/L3_SO2', 'SO2_column_number_density', 1e5),
+    'CO': ('COPERNICUS/S5P/OFFL/L3_CO', 'CO_column_number_density', 1.15),
+    'O3': ('COPERNICUS/S5P/OFFL/L3_O3', 'O3_column_number_density', 2e3)
+}
 
+UC_ASSET = "projects/ee-sp22-bse-059/assets/lahore_ucs_shapefile"
+
+def input_collections(uc_collection, start_date, end_date):
+    """Sentinel-5P collections for each pollutant, in POLLUTANT_COLLECTIONS order."""
+    return [
+        ee.ImageCollection(collection_id)
+            .filterDate(start_date, end_date)
+            .filterBounds(uc_collection.geometry())
+        for collection_id, _, _ in POLLUTANT_COLLECTIONS.values()
+    ]
+
+def compute_aqi(uc_collection, retain_geometry=True):
+    """
+    AQI for every Union Council in one server-side pass: the pollutant means
+    are stacked into one image and reduced over all UCs with a single
+    reduceRegions call. Returns GeoJSON features.
+    With retain_geometry=False the features carry no geometry, for callers
+    that already hold the UC boundaries.
+    """
+    # Date range for analysis
+    start_date, end_date = get_date_range()
+
+    collections = dict(zip(POLLUTANT_COLLECTIONS, input_collections(uc_collection, start_date, end_date)))
+    # Image counts for all pollutants in one request
+    sizes = ee.Dictionary({pol: col.size() for pol, col in collections.items()}).getInfo()
+
+    bands = []
+    for pol, (collection_id, band, conv) in POLLUTANT_COLLECTIONS.items():
+        if not sizes[pol]:
+            print(f"⚠️ No images found for {pol} ({collection_id})")
+            continue
+        bands.append(collections[pol].select(band).mean().multiply(conv).rename(pol))
+    if not bands:
+        return []
+
+    # Each UC also carries the time of the newest scene covering it, its result's period
+    ucs = with_input_time(uc_collection, list(collections.values()))
+    stats = ee.Image.cat(bands).reduceRegions(
+        collection=ucs.select(['UC', 'input_time'], None, retain_geometry),
+        reducer=ee.Reducer.mean(),
+        scale=5000
+    )
+
+    features = []
+    for feature in stats.getInfo()['features']:
+        uc_id = feature['properties'].get('UC')
+        input_time = feature['properties'].get('input_time')
+        if input_time is None:
+            print(f"⚠️ No Sentinel-5P scenes cover {uc_id}")
+            continue
+        print(f"\n🌫 Processing UC: {uc_id}")
         pollutant_data = {}
-        for pol, (collection_id, band, conv) in collections.items():
-            try:
-                img_col = ee.ImageCollection(collection_id) \
-                    .filterDate(start_date, end_date) \
-                    .filterBounds(uc_feature.geometry()) 
-                if img_col.size().getInfo() == 0:
-                    print(f"⚠️ No images found for {pol} ({collection_id})")
-                    pollutant_data[pol] = 0
-                    continue
-                
-                img = img_col.select(band).mean().multiply(conv)
-                
-                stats = img.reduceRegion(
-                    reducer=ee.Reducer.mean(),
-                    geometry=uc_feature.geometry(),
-                    scale=5000
-                )
-                
-                value = stats.get(band).getInfo()
-                pollutant_data[pol] = calculate_subindex(value, pol) if value else 0
-            except Exception as e:
-                pollutant_data[pol] = 0
+        for pol in POLLUTANT_COLLECTIONS:
+            value = feature['properties'].get(pol)
+            pollutant_data[pol] = calculate_subindex(value, pol) if value else 0
 
         # Calculate overall AQI
         aqi = max(pollutant_data.values())
         print(f"✅ AQI Components: {pollutant_data}")
         print(f"🚨 Final AQI: {aqi:.1f}")
 
-        return uc_feature.set({
-            'AQI': aqi,
-            **{f'{k}_AQI': v for k, v in pollutant_data.items()},
-            'uc_id': uc_id,
-            'start_date': start_date,
-            'end_date': end_date
+        features.append({
+            "type": "Feature",
+            "geometry": feature.get('geometry'),
+            "properties": {
+                'AQI': aqi,
+                **{f'{k}_AQI': v for k, v in pollutant_data.items()},
+                'uc_id': uc_id,
+                'start_date': start_date,
+                'end_date': end_date,
+                'period': input_period(input_time)
+            }
         })
+    return features
 
-    except Exception as e:
-        print(f"🔥 AQI Error: {str(e)}")
-        return None
-
-def process_batch(batch):
-    cursor = None
+def save_results(db, features):
+    """Upsert the boundaries of the UCs, then all UC results of an AQI run in one transaction."""
     try:
-        cursor = db.cursor()
-        batch_time = datetime.now(UTC).strftime('%Y-%m-%d %H:%M:%S')
-        processed = 0
-
-        for uc in batch:
-            try:
-                result = compute_aqi(ee.Feature(uc))
-                if not result: continue
-
-                feature = result.getInfo()
-                geojson = {
-                    "type": "Feature",
-                    "geometry": feature['geometry'],
-                    "properties": {
-                        'uc_id': feature['properties']['uc_id'],
-                        'AQI': feature['properties']['AQI'],
-                        'NO2_AQI': feature['properties']['NO2_AQI'],
-                        'SO2_AQI': feature['properties']['SO2_AQI'],
-                        'O3_AQI': feature['properties']['O3_AQI'],
-                        'timestamp': batch_time
-                    }
-                }
-
-                cursor.execute(
-                    """INSERT INTO uc_analysis 
-                    (uc_id, analysis_type, result_geojson, analysis_date)
-                    VALUES (%s, %s, %s, %s)
-                    ON DUPLICATE KEY UPDATE 
-                    result_geojson=VALUES(result_geojson), 
-                    analysis_date=VALUES(analysis_date)""",
-                    (geojson['properties']['uc_id'], 'air_quality', 
-                     json.dumps(geojson), batch_time)
-                )
-                processed += 1
-
-            except Exception as e:
-                print(f"⚠️ Failed UC: {str(e)}")
-
-        db.commit()
-        print(f"✅ Processed {processed}/{len(batch)} UCs")
-        return processed
+        analysis_date = datetime.now(UTC).strftime('%Y-%m-%d %H:%M:%S')
+        upsert_uc_boundaries(db, {feature['properties']['uc_id']: feature['geometry'] for feature in features})
+        rows = [
+            result_row('air_quality', feature['properties'], feature['properties']['period'], analysis_date)
+            for feature in features
+        ]
+        upsert_uc_results(db, rows)
+        print(f"✅ Processed {len(rows)} UCs")
+        return len(rows)
 
     except Exception as e:
         print(f"❌ Batch Failed: {str(e)}")
-        db.rollback()
         return 0
-    finally:
-        if cursor: cursor.close()
-
-# Batch processing setup
-uc_collection = ee.FeatureCollection("projects/ee-sp22-bse-059/assets/lahore_ucs_shapefile")
-uc_list = uc_collection.toList(uc_collection.size())
-total_ucs = uc_collection.size().getInfo()
-
-for i in range(0, total_ucs, 5):  # Optimal batch size for AQI
-    batch = uc_list.slice(i, min(i+5, total_ucs)).getInfo()
-    process_batch(batch)
 
 if __name__ == "__main__":
+    initialize_ee()
+    db = connect_db()
     try:
-        print(f"Total UCs: {total_ucs}")
+        uc_collection = dissolve_ucs(ee.FeatureCollection(UC_ASSET))
+        save_results(db, compute_aqi(uc_collection))
     except Exception as e:
         print(f"Fatal Error: {str(e)}")
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -1,155 +1,107 @@
 import ee
-import json
 import mysql.connector
 from datetime import datetime, timedelta
 from database.connect_db import connect_db
+from database.uc_results import result_row, upsert_uc_boundaries, upsert_uc_results
+from processor.uc_inputs import dissolve_ucs, input_period, with_input_time
+from services.gee_project import initialize_ee
 
-# GEE Authentication
-ee.Initialize(project = 'ee-sp22-bse-059')
-
-# Database Configuration
-db = connect_db()
+UC_ASSET = "projects/ee-sp22-bse-059/assets/lahore_ucs_shapefile"
 
 def get_date_range():
     end_date = datetime.now()
     start_date = end_date - timedelta(days=30)
     return start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
 
-uc_collection = ee.FeatureCollection("projects/ee-sp22-bse-059/assets/lahore_ucs_shapefile")
-
-def compute_ndvi(uc_feature):
-    """Calculate NDVI for a Union Council feature with robust error handling."""
-    try:
-        # Get UC identifier
-        uc_id = uc_feature.get('UC').getInfo()
-        print(f"\n🏙 Processing UC: {uc_id}")
-
-        # 1. Date Range Setup (Last 30 days)
-        start_date = (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d')
-        end_date = datetime.now().strftime('%Y-%m-%d')
-
-        # 2. Get Sentinel-2 imagery
-        s2_collection = (ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
-                         .filterDate(start_date, end_date)
-                         .filterBounds(uc_feature.geometry())
-                         .filter(ee.Filter.lte('CLOUDY_PIXEL_PERCENTAGE', 20)))
-
-        # 3. Check image availability
-        if s2_collection.size().getInfo() == 0:
-            print(f"☁️ No cloud-free images found for {uc_id} (Last 30 days)")
-            return None
-
-        # 4. Calculate NDVI
-        image = s2_collection.median()
-        ndvi = image.normalizedDifference(['B8', 'B4']).rename('NDVI')
-        
-        # 5. Calculate mean NDVI with validation
-        stats = ndvi.reduceRegion(
-            reducer=ee.Reducer.mean(),
-            geometry=uc_feature.geometry(),
-            scale=10,
-            maxPixels=1e10
-        )
-        
-        mean_ndvi = stats.get('NDVI')
-        if not mean_ndvi:
+def input_collections(uc_collection, start_date, end_date):
+    """Sentinel-2 scenes the NDVI composite is built from."""
+    return [ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
+            .filterDate(start_date, end_date)
+            .filterBounds(uc_collection.geometry())
+            .filter(ee.Filter.lte('CLOUDY_PIXEL_PERCENTAGE', 20))]
+
+def compute_ndvi(uc_collection, retain_geometry=True):
+    """
+    Mean NDVI for every Union Council in one server-side pass: a single
+    Sentinel-2 composite over all UCs, reduced with reduceRegions and
+    downloaded with one getInfo call. Returns GeoJSON features.
+    With retain_geometry=False the features carry no geometry, for callers
+    that already hold the UC boundaries.
+    """
+    # 1. Date Range Setup (Last 30 days)
+    start_date, end_date = get_date_range()
+
+    # 2. Get Sentinel-2 imagery covering any UC
+    s2_collection, = input_collections(uc_collection, start_date, end_date)
+
+    # 3. Check image availability
+    if s2_collection.size().getInfo() == 0:
+        print("☁️ No cloud-free images found for Lahore (Last 30 days)")
+        return []
+
+    # 4. Calculate NDVI
+    ndvi = s2_collection.median().normalizedDifference(['B8', 'B4']).rename('NDVI')
+
+    # 5. Mean NDVI per UC, all UCs at once
+    # Each UC also carries the time of the newest scene covering it, its result's period
+    ucs = with_input_time(uc_collection, [s2_collection])
+    stats = ndvi.reduceRegions(
+        collection=ucs.select(['UC', 'input_time'], None, retain_geometry),
+        reducer=ee.Reducer.mean().setOutputs(['NDVI']),
+        scale=10,
+        tileScale=4
+    )
+
+    features = []
+    for feature in stats.getInfo()['features']:
+        uc_id = feature['properties'].get('UC')
+        ndvi_value = feature['properties'].get('NDVI')
+        input_time = feature['properties'].get('input_time')
+        if ndvi_value is None or input_time is None:
             print(f"⚠️ No NDVI values calculated for {uc_id}")
-            return None
-
-        # 6. Return feature with NDVI property
-        ndvi_value = mean_ndvi.getInfo()
-        print(f"✅ Success: {uc_id} NDVI = {ndvi_value:.4f}")
-        
-        return uc_feature.set({
-            'NDVI': ndvi_value,
-            'uc_id': uc_id,
-            'start_date': start_date,
-            'end_date': end_date
+            continue
+        features.append({
+            "type": "Feature",
+            "geometry": feature.get('geometry'),
+            "properties": {
+                "uc_id": uc_id,
+                "NDVI": ndvi_value,
+                "start_date": start_date,
+                "end_date": end_date,
+                "period": input_period(input_time)
+            }
         })
 
-    except ee.EEException as gee_error:
-        print(f"🌍 GEE API Error in {uc_id}: {str(gee_error)}")
-        return None
-    except Exception as generic_error:
-        print(f"🔥 Unexpected error processing {uc_id}: {str(generic_error)}")
-        return None
+    print(f"✅ NDVI computed for {len(features)} UCs ({start_date} to {end_date})")
+    return features
 
-def process_batch(batch):
-    """Process a batch of Union Councils and save results to database"""
-    cursor = None
+def save_results(db, features):
+    """Upsert the boundaries of the UCs, then all UC results of a run in one transaction."""
     try:
-        cursor = db.cursor()
-        batch_start_time = datetime.utcnow().isoformat() + "Z"
-        processed_count = 0
-
-        for uc in batch:
-            try:
-                # Convert to EE Feature
-                ee_feature = ee.Feature(uc)
-                
-                # Compute NDVI
-                result = compute_ndvi(ee_feature)
-                if not result:
-                    continue
-                
-                # Get result data
-                feature_info = result.getInfo()
-                
-                # Validate and format GeoJSON
-                valid_geojson = {
-                    "type": "Feature",
-                    "geometry": feature_info['geometry'],
-                    "properties": {
-                        "uc_id": feature_info['properties']['uc_id'],
-                        "NDVI": feature_info['properties']['NDVI'],
-                        "timestamp": batch_start_time
-                    }
-                }
-                
-                # Database insertion
-                cursor.execute(
-                    """INSERT INTO uc_analysis 
-                    (uc_id, analysis_type, result_geojson, analysis_date)
-                    VALUES (%s, %s, %s, %s)""",
-                    (
-                        valid_geojson['properties']['uc_id'],
-                        'ndvi',
-                        json.dumps(valid_geojson),
-                        batch_start_time
-                    )
-                )
-                processed_count += 1
-
-            except Exception as uc_error:
-                print(f"⚠️ Failed UC {uc.get('id', 'unknown')}: {str(uc_error)}")
-                continue
-
-        db.commit()
-        print(f"✅ Successfully processed {processed_count}/{len(batch)} UCs in batch")
-        return processed_count
+        analysis_date = datetime.utcnow().isoformat() + "Z"
+        upsert_uc_boundaries(db, {feature['properties']['uc_id']: feature['geometry'] for feature in features})
+        rows = [
+            result_row('ndvi', feature['properties'], feature['properties']['period'], analysis_date)
+            for feature in features
+        ]
+        upsert_uc_results(db, rows)
+        print(f"✅ Successfully saved {len(rows)} UCs")
+        return len(rows)
 
     except Exception as batch_error:
         print(f"❌ Critical batch failure: {str(batch_error)}")
-        db.rollback()
         return 0
-        
-    finally:
-        if cursor:
-            cursor.close()
-# Remove limit(1) and use proper batching
-uc_list = uc_collection.toList(uc_collection.size())
-total_ucs = uc_collection.size().getInfo()
-batch_size = 1  # For testing
-
-for i in range(0, total_ucs, batch_size):
-    batch = uc_list.slice(i, min(i+batch_size, total_ucs))
-    process_batch(batch.getInfo())
 
 if __name__ == "__main__":
+    # GEE Authentication
+    initialize_ee()
+
+    # Database Configuration
+    db = connect_db()
     try:
-        print(f"Total UCs: {uc_collection.size().getInfo()}")
-        # Your processing loop
+        uc_collection = dissolve_ucs(ee.FeatureCollection(UC_ASSET))
+        save_results(db, compute_ndvi(uc_collection))
     except Exception as e:
         print(f"Fatal error: {str(e)}")
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
@@ -0,0 +1,167 @@
+"""
+Nightly UC indicator refresh: NDVI, land surface temperature and AQI in one run.
+
+Earth Engine is initialized, the database opened and the UC boundaries
+downloaded (one per UC name, the pieces of split UCs dissolved, see
+processor.uc_inputs) and stored in uc_boundaries once; the enabled indicators are then computed concurrently
+(reduceRegions over chunks of UCs, without re-downloading geometry) and
+share one analysis_date. Results are upserted per (UC, indicator, period),
+the period being the time of the newest input scene covering the UC (see
+processor.uc_inputs), so reruns without new imagery replace rows rather than add them.
+
+Runs are incremental and resumable, with uc_analysis itself as the record of
+what is done: a UC is only recomputed when no stored row has the period of
+its newest Sentinel-2 / Landsat / Sentinel-5P scene. Every chunk is committed
+on its own, so rerunning after a crash picks up where it stopped, on any host,
+and a run with no new scenes does no reductions at all. UCs whose reduction
+gives no value are tried again on every run. A stored result is not
+recomputed just because older scenes have since left the indicator's window.
+
+Run from urban-backend/:
+    python -m processor.batch_runner
+    python -m processor.batch_runner --indicators ndvi thermal --force
+"""
+import argparse
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, UTC
+
+import ee
+
+from database.connect_db import connect_db
+from database.uc_results import result_row, stored_periods, upsert_uc_boundaries, upsert_uc_results
+from processor import batch_aqi_processor, batch_ndvi_processor, batch_thermal_processor
+from processor.batch_ndvi_processor import UC_ASSET
+from processor.uc_inputs import dissolve_ucs, input_period, with_input_time
+from services.gee_project import initialize_ee
+
+# analysis_type -> (processor module, compute function)
+INDICATORS = {
+    'ndvi': (batch_ndvi_processor, batch_ndvi_processor.compute_ndvi),
+    'thermal': (batch_thermal_processor, batch_thermal_processor.compute_thermal),
+    'air_quality': (batch_aqi_processor, batch_aqi_processor.compute_aqi),
+}
+
+# UCs per reduceRegions call; also the commit granularity
+CHUNK_SIZE = int(os.getenv('BATCH_CHUNK_SIZE', '50'))
+
+
+def load_uc_geometries(uc_collection):
+    """UC id -> GeoJSON geometry, downloaded once per run."""
+    ucs = uc_collection.select(['UC']).getInfo()['features']
+    return {feature['properties']['UC']: feature['geometry'] for feature in ucs}
+
+
+def latest_input_times(uc_collection, indicator):
+    """UC id -> time (ms) of the newest input scene covering it in the indicator's window, or None."""
+    module = INDICATORS[indicator][0]
+    collections = module.input_collections(uc_collection, *module.get_date_range())
+    ucs = with_input_time(uc_collection, collections).select(['UC', 'input_time'], None, False)
+    features = ucs.getInfo()['features']
+    return {feature['properties']['UC']: feature['properties'].get('input_time') for feature in features}
+
+
+def stale_ucs(stored, latest, force=False):
+    """UCs whose newest input scene has no stored result yet, given {uc_id: newest stored period}."""
+    return [
+        uc_id for uc_id, input_time in latest.items()
+        # No scenes at all: nothing to compute until some arrive
+        if input_time is not None and (force or stored.get(uc_id) != input_period(input_time))
+    ]
+
+
+def build_rows(indicator, features, geometries, run_time):
+    rows = []
+    for feature in features:
+        uc_id = feature['properties']['uc_id']
+        if uc_id not in geometries:
+            print(f"⚠️ Unknown UC {uc_id} in {indicator} results")
+            continue
+        rows.append(result_row(indicator, feature['properties'], feature['properties']['period'], run_time))
+    return rows
+
+
+class ResultWriter:
+    """One database connection shared by the indicator threads; each chunk is its own transaction."""
+
+    def __init__(self, db):
+        self.db = db
+        self._lock = threading.Lock()
+
+    def stored_periods(self, indicator):
+        with self._lock:
+            return stored_periods(self.db, indicator)
+
+    def save(self, rows):
+        with self._lock:
+            upsert_uc_results(self.db, rows)
+
+
+def run_indicator(indicator, uc_collection, geometries, writer, run_time, force=False):
+    """Recompute the stale UCs of one indicator chunk by chunk; returns the number of rows saved."""
+    latest = latest_input_times(uc_collection, indicator)
+    pending = stale_ucs(writer.stored_periods(indicator), latest, force)
+    print(f"{indicator}: {len(pending)} of {len(latest)} UCs need updating")
+
+    saved = 0
+    for i in range(0, len(pending), CHUNK_SIZE):
+        chunk = pending[i:i + CHUNK_SIZE]
+        features = INDICATORS[indicator][1](uc_collection.filter(ee.Filter.inList('UC', chunk)), False)
+        rows = build_rows(indicator, features, geometries, run_time)
+        if rows:
+            writer.save(rows)
+        saved += len(rows)
+        print(f"✅ {indicator}: saved {len(rows)} UCs ({min(i + CHUNK_SIZE, len(pending))}/{len(pending)})")
+    return saved
+
+
+def run(indicators, force=False):
+    # Same project setting as the API's Earth Engine backend
+    initialize_ee()
+    # One feature per UC name; split UCs are reduced over the union of their pieces
+    uc_collection = dissolve_ucs(ee.FeatureCollection(UC_ASSET))
+
+    start = datetime.now(UTC)
+    run_time = start.strftime('%Y-%m-%d %H:%M:%S')
+    geometries = load_uc_geometries(uc_collection)
+    print(f"Loaded {len(geometries)} UCs; computing {', '.join(indicators)}")
+
+    db = connect_db()
+    writer = ResultWriter(db)
+    results = {}
+    try:
+        # Geometry is stored once per UC, not with every result row
+        upsert_uc_boundaries(db, geometries)
+        with ThreadPoolExecutor(max_workers=len(indicators)) as executor:
+            futures = {
+                indicator: executor.submit(
+                    run_indicator, indicator, uc_collection, geometries, writer, run_time, force
+                )
+                for indicator in indicators
+            }
+            for indicator, future in futures.items():
+                try:
+                    results[indicator] = future.result()
+                except Exception as e:
+                    print(f"❌ {indicator} failed: {str(e)}")
+    finally:
+        db.close()
+
+    counts = ', '.join(f"{indicator}: {saved}" for indicator, saved in results.items())
+    print(f"✅ Saved results ({counts}) in {(datetime.now(UTC) - start).total_seconds():.1f}s")
+    return len(results) == len(indicators)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--indicators', nargs='+', choices=list(INDICATORS),
+                        default=os.getenv('BATCH_INDICATORS', ' '.join(INDICATORS)).split())
+    parser.add_argument('--force', action='store_true', help='recompute every UC, even if its inputs are unchanged')
+    args = parser.parse_args()
+    if not run(args.indicators, args.force):
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
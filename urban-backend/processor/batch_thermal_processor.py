@@ -1,22 +1,18 @@
 import ee
-import json
 import mysql.connector
 from datetime import datetime, timedelta, UTC
 from database.connect_db import connect_db
+from database.uc_results import result_row, upsert_uc_boundaries, upsert_uc_results
+from processor.uc_inputs import dissolve_ucs, input_period, with_input_time
+from services.gee_project import initialize_ee
 
-# GEE Authentication
-ee.Initialize(project='ee-sp22-bse-059')
-
-# Database Configuration
-db = connect_db()
+UC_ASSET = "projects/ee-sp22-bse-059/assets/lahore_ucs_shapefile"
 
 def get_date_range():
     end_date = datetime.now()
     start_date = end_date - timedelta(days=30)
     return start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')
 
-uc_collection = ee.FeatureCollection("projects/ee-sp22-bse-059/assets/lahore_ucs_shapefile")
-
 def calculate_lst(image):
     """Convert Landsat 8 ST_B10 to Land Surface Temperature (LST) in Kelvin"""
     return image.select('ST_B10') \
@@ -24,133 +20,95 @@ def calculate_lst(image):
                .add(149.0) \
                .rename('LST')
 
-def compute_thermal(uc_feature):
-    """Calculate Land Surface Temperature for a Union Council"""
-    try:
-        uc_id = uc_feature.get('UC').getInfo()
-        print(f"\n🌡 Processing UC: {uc_id}")
-
-        # 1. Date Range Setup (Last 30 days)
-        start_date, end_date = get_date_range()
-
-        # 2. Get Landsat 8 imagery
-        landsat_collection = (ee.ImageCollection('LANDSAT/LC08/C02/T1_L2')
-                              .filterDate(start_date, end_date)
-                              .filterBounds(uc_feature.geometry())
-                              .select(['ST_B10']))
-
-        # 3. Check image availability
-        if landsat_collection.size().getInfo() == 0:
-            print(f"☁️ No Landsat data found for {uc_id} (Last 30 days)")
-            return None
-
-        # 4. Calculate mean LST
-        lst_collection = landsat_collection.map(calculate_lst)
-        mean_lst = lst_collection.mean()
-
-        # 5. Calculate zonal statistics
-        stats = mean_lst.reduceRegion(
-            reducer=ee.Reducer.mean(),
-            geometry=uc_feature.geometry(),
-            scale=1000,  # Matching GEE script scale
-            maxPixels=1e10
-        )
-
-        lst_value = stats.get('LST')
-        if not lst_value:
+def input_collections(uc_collection, start_date, end_date):
+    """Landsat 8 scenes the LST composite is built from."""
+    return [ee.ImageCollection('LANDSAT/LC08/C02/T1_L2')
+            .filterDate(start_date, end_date)
+            .filterBounds(uc_collection.geometry())
+            .select(['ST_B10'])]
+
+def compute_thermal(uc_collection, retain_geometry=True):
+    """
+    Mean Land Surface Temperature for every Union Council in one server-side
+    pass (one Landsat composite, one reduceRegions, one download).
+    Returns GeoJSON features with LST in Celsius.
+    With retain_geometry=False the features carry no geometry, for callers
+    that already hold the UC boundaries.
+    """
+    # 1. Date Range Setup (Last 30 days)
+    start_date, end_date = get_date_range()
+
+    # 2. Get Landsat 8 imagery covering any UC
+    landsat_collection, = input_collections(uc_collection, start_date, end_date)
+
+    # 3. Check image availability
+    if landsat_collection.size().getInfo() == 0:
+        print("☁️ No Landsat data found for Lahore (Last 30 days)")
+        return []
+
+    # 4. Calculate mean LST
+    mean_lst = landsat_collection.map(calculate_lst).mean()
+
+    # 5. Zonal statistics for all UCs at once
+    # Each UC also carries the time of the newest scene covering it, its result's period
+    ucs = with_input_time(uc_collection, [landsat_collection])
+    stats = mean_lst.reduceRegions(
+        collection=ucs.select(['UC', 'input_time'], None, retain_geometry),
+        reducer=ee.Reducer.mean().setOutputs(['LST']),
+        scale=1000  # Matching GEE script scale
+    )
+
+    features = []
+    for feature in stats.getInfo()['features']:
+        uc_id = feature['properties'].get('UC')
+        lst_value = feature['properties'].get('LST')
+        input_time = feature['properties'].get('input_time')
+        if lst_value is None or input_time is None:
             print(f"⚠️ No LST values calculated for {uc_id}")
-            return None
-
-        # Convert Kelvin to Celsius for storage
-        lst_celsius = lst_value.getInfo() - 273.15
-        print(f"✅ Success: {uc_id} LST = {lst_celsius:.2f}°C")
-
-        return uc_feature.set({
-            'LST': lst_celsius,
-            'uc_id': uc_id,
-            'start_date': start_date,
-            'end_date': end_date
+            continue
+        features.append({
+            "type": "Feature",
+            "geometry": feature.get('geometry'),
+            "properties": {
+                "uc_id": uc_id,
+                # Convert Kelvin to Celsius for storage
+                "LST": lst_value - 273.15,
+                "start_date": start_date,
+                "end_date": end_date,
+                "period": input_period(input_time)
+            }
         })
 
-    except ee.EEException as gee_error:
-        print(f"🌍 GEE API Error in {uc_id}: {str(gee_error)}")
-        return None
-    except Exception as generic_error:
-        print(f"🔥 Unexpected error processing {uc_id}: {str(generic_error)}")
-        return None
+    print(f"✅ LST computed for {len(features)} UCs ({start_date} to {end_date})")
+    return features
 
-def process_batch(batch):
-    """Process a batch of Union Councils for thermal analysis"""
-    cursor = None
+def save_results(db, features):
+    """Upsert the boundaries of the UCs, then all UC results of a thermal run in one transaction."""
     try:
-        cursor = db.cursor()
-        batch_start_time = datetime.now(UTC).strftime('%Y-%m-%d %H:%M:%S')
-        processed_count = 0
-
-        for uc in batch:
-            try:
-                ee_feature = ee.Feature(uc)
-                result = compute_thermal(ee_feature)
-                
-                if not result:
-                    continue
-
-                feature_info = result.getInfo()
-                
-                # Thermal-specific GeoJSON
-                valid_geojson = {
-                    "type": "Feature",
-                    "geometry": feature_info['geometry'],
-                    "properties": {
-                        "uc_id": feature_info['properties']['uc_id'],
-                        "LST": feature_info['properties']['LST'],
-                        "timestamp": batch_start_time
-                    }
-                }
-
-                cursor.execute(
-                    """INSERT INTO uc_analysis 
-                    (uc_id, analysis_type, result_geojson, analysis_date)
-                    VALUES (%s, %s, %s, %s)""",
-                    (
-                        valid_geojson['properties']['uc_id'],
-                        'thermal',
-                        json.dumps(valid_geojson),
-                        batch_start_time
-                    )
-                )
-                processed_count += 1
-
-            except Exception as uc_error:
-                print(f"⚠️ Failed UC {uc.get('id', 'unknown')}: {str(uc_error)}")
-                continue
-
-        db.commit()
-        print(f"✅ Successfully processed {processed_count}/{len(batch)} UCs in batch")
-        return processed_count
+        analysis_date = datetime.now(UTC).strftime('%Y-%m-%d %H:%M:%S')
+        upsert_uc_boundaries(db, {feature['properties']['uc_id']: feature['geometry'] for feature in features})
+        rows = [
+            result_row('thermal', feature['properties'], feature['properties']['period'], analysis_date)
+            for feature in features
+        ]
+        upsert_uc_results(db, rows)
+        print(f"✅ Successfully saved {len(rows)} UCs")
+        return len(rows)
 
     except Exception as batch_error:
         print(f"❌ Critical batch failure: {str(batch_error)}")
-        db.rollback()
         return 0
-        
-    finally:
-        if cursor:
-            cursor.close()
-
-# Batch processing setup
-uc_list = uc_collection.toList(uc_collection.size())
-total_ucs = uc_collection.size().getInfo()
-batch_size = 10  # Optimal for thermal processing
-
-for i in range(0, total_ucs, batch_size):
-    batch = uc_list.slice(i, min(i + batch_size, total_ucs))
-    process_batch(batch.getInfo())
 
 if __name__ == "__main__":
+    # GEE Authentication
+    initialize_ee()
+
+    # Database Configuration
+    db = connect_db()
     try:
-        print(f"Total UCs: {uc_collection.size().getInfo()}")
+        uc_collection = dissolve_ucs(ee.FeatureCollection(UC_ASSET))
+        save_results(db, compute_thermal(uc_collection))
     except Exception as e:
         print(f"Fatal error: {str(e)}")
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
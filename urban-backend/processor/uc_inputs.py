@@ -0,0 +1,46 @@
+"""
+The UC collection the indicators are computed over, and the newest input
+scene per UC, which identifies a UC indicator result.
+
+The UC asset has no unique id per feature and some UC names cover several
+polygons. A UC is identified by its name throughout (uc_analysis.uc_id,
+uc_boundaries.name), so the pieces of a name are dissolved into one feature
+and reduced once, rather than overwriting each other's results.
+
+uc_analysis rows are keyed by (uc_id, analysis_type, period), the period being
+the acquisition time of the newest scene the result was computed from. Reruns
+without new imagery therefore overwrite the same row, whatever day they run
+on, and history only grows when new scenes arrive.
+"""
+from datetime import datetime, UTC
+
+import ee
+
+
+def dissolve_ucs(uc_collection):
+    """One feature per UC name, its geometry the union of all pieces of that name."""
+    def dissolve(name):
+        pieces = uc_collection.filter(ee.Filter.eq('UC', name))
+        return ee.Feature(pieces.geometry(1), {'UC': name})
+
+    return ee.FeatureCollection(uc_collection.aggregate_array('UC').distinct().map(dissolve))
+
+
+def with_input_time(uc_collection, collections):
+    """
+    UC features with 'input_time' set to the system:time_start (ms) of the
+    newest scene in collections that covers each UC, or null if none does.
+    """
+    scenes = collections[0]
+    for collection in collections[1:]:
+        scenes = scenes.merge(collection)
+
+    def annotate(feature):
+        return feature.set('input_time', scenes.filterBounds(feature.geometry()).aggregate_max('system:time_start'))
+
+    return uc_collection.map(annotate)
+
+
+def input_period(input_time):
+    """uc_analysis.period for an input_time in ms: the scene time as a UTC ISO timestamp."""
+    return datetime.fromtimestamp(input_time / 1000, UTC).strftime('%Y-%m-%dT%H:%M:%SZ')
@@ -1,18 +1,11 @@
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
-from database import SessionLocal
+from database.database import get_db
 from models import Location
 from services.kml_converter import convert_geojson_to_kml
 
 router = APIRouter()
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 @router.post("/save-location/")
 def save_location(name: str, geojson: str, projection: str, db: Session = Depends(get_db)):
     if projection not in ["Pakistan", "UAE"]:
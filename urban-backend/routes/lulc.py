@@ -1,19 +1,29 @@
 import os
-import ee
 import json
 import asyncio
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Iterator, Tuple, Callable
 from datetime import datetime, timedelta
-from concurrent.futures import ThreadPoolExecutor
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import numpy as np
 import pandas as pd
 from fastapi import FastAPI, HTTPException, BackgroundTasks, APIRouter, Depends
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, field_validator
 import logging
 from functools import lru_cache
 import traceback
-from tensorflow.keras.models import load_model
-import tensorflow as tf
+from services.cache_service import DiskLRUCache, TieredCache, file_fingerprint, make_cache_key, polygon_fingerprint
+from services import pixel_features
+from services.job_service import Job, JobCancelled, JobManager
+from services.imagery_service import ImageryBackend, create_imagery_backend
+from services.fetch_scheduler import FetchCancelled, FetchScheduler
+from services.inference_engine import create_inference_engine
+from services.micro_batcher import MicroBatcher
+from services import tile_planner
+from services import raster_encoding
+from services.cell_store import ClassifiedCellStore, concat_pixels, empty_pixels
+from services.vector_tiles import PixelLayer
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -85,31 +95,76 @@ class GEEConfig:
         10: "Moss and lichen",
     }
 
-# Initialize GEE
-def initialize_gee():
-    """Initialize Google Earth Engine with service account authentication."""
-    try:
-            ee.Initialize(project=os.getenv("GEE_PROJECT_ID", "your-project-id"))
-            logger.info("GEE initialized with default credentials")
-            
-    except Exception as e:
-        logger.error(f"Failed to initialize GEE: {e}")
-        raise HTTPException(status_code=500, detail="Failed to initialize Google Earth Engine")
+# Trained model; ONNX/TFLite exports are looked up next to it
+MODEL_PATH = os.getenv(
+    "MODEL_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "models", "LSTM_model_64.keras")
+)
+
 
+# Extracted pixel stacks, reused across requests for the same polygon/year/scale
+pixel_cache = DiskLRUCache(
+    os.getenv("PIXEL_CACHE_DIR", "cache/pixel_stacks"),
+    int(os.getenv("PIXEL_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+)
+
+# Finished classifications, reused for identical requests until the model changes
+result_cache = TieredCache(
+    DiskLRUCache(
+        os.getenv("RESULT_CACHE_DIR", "cache/results"),
+        int(os.getenv("RESULT_CACHE_MAX_BYTES", str(512 * 1024 ** 2)))
+    ),
+    max_bytes=int(os.getenv("RESULT_CACHE_MEMORY_BYTES", str(128 * 1024 ** 2))),
+    ttl=float(os.getenv("RESULT_CACHE_TTL", str(7 * 24 * 3600)))
+)
+
+# Classified pixels per grid block, so overlapping polygons only classify new area
+cell_store = ClassifiedCellStore(DiskLRUCache(
+    os.getenv("CELL_STORE_DIR", "cache/classified_cells"),
+    int(os.getenv("CELL_STORE_MAX_BYTES", str(1024 ** 3)))
+))
+
+# Imagery requests from all extractions share one adaptive concurrency limit,
+# since Earth Engine quotas apply per project, not per request
+fetch_scheduler = FetchScheduler(
+    min_concurrency=int(os.getenv("FETCH_MIN_CONCURRENCY", "1")),
+    max_concurrency=int(os.getenv("FETCH_MAX_CONCURRENCY", "16")),
+    initial_concurrency=int(os.getenv("FETCH_INITIAL_CONCURRENCY", "8")),
+    max_retries=int(os.getenv("FETCH_MAX_RETRIES", "4")),
+    backoff_base=float(os.getenv("FETCH_BACKOFF_BASE", "1.0")),
+    backoff_max=float(os.getenv("FETCH_BACKOFF_MAX", "30"))
+)
 
 class SatelliteDataProcessor:
     """Handles satellite data extraction and processing."""
     
-    def __init__(self):
+    # Bump when the layout of cached extraction results changes
+    CACHE_VERSION = 2
+    # Per-pixel arrays of an extraction result
+    STACK_ARRAYS = ('features', 'latitude', 'longitude')
+
+    def __init__(self, backend: ImageryBackend, scheduler: FetchScheduler):
         self.config = GEEConfig()
+        self.backend = backend
+        self.scheduler = scheduler
     
-    def create_polygon_geometry(self, coordinates: List[PolygonCoordinate]) -> ee.Geometry:
-        """Convert polygon coordinates to GEE geometry."""
+    def stack_cache_key(self, coordinates: List[PolygonCoordinate], year: int, scale: int) -> str:
+        """Cache key for the extracted pixel stack of a polygon."""
+        return make_cache_key(
+            self.CACHE_VERSION,
+            polygon_fingerprint((coord.lon, coord.lat) for coord in coordinates),
+            year,
+            scale,
+            sorted(self.config.MODEL_BAND_ORDER)
+        )
+    
+    def create_polygon_geometry(self, coordinates: List[PolygonCoordinate]) -> Any:
+        """Convert polygon coordinates to a lon/lat shapely geometry."""
         coords = [[coord.lon, coord.lat] for coord in coordinates]
         # Ensure polygon is closed
         if coords[0] != coords[-1]:
             coords.append(coords[0])
-        return ee.Geometry.Polygon([coords])
+        return tile_planner.polygon_from_coordinates(coords)
     
     def get_date_ranges(self, year: int) -> List[tuple]:
         """Get monthly date ranges for the specified year."""
@@ -122,320 +177,304 @@ class SatelliteDataProcessor:
                 end_date = datetime(year, month + 1, 1) - timedelta(days=1)
             date_ranges.append((start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
         return date_ranges
-    # Cloud bit masking for sentinel-2
-    def mask_s2_scl(self, image):
-        scl = image.select('SCL')
-        valid_classes = ee.List([4, 5, 6, 7, 11])
-        mask = scl.remap(valid_classes, ee.List.repeat(1, valid_classes.length())).eq(1)
-        return image.updateMask(mask).copyProperties(image, ["system:time_start"])
-
-    def get_sentinel2_collection(self, geometry: ee.Geometry, start_date: str, end_date: str) -> ee.ImageCollection:
-        """Get filtered Sentinel-2 collection."""
-        return (ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
-                .filterBounds(geometry)
-                .filterDate(start_date, end_date)
-                .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
-                .map(self.mask_s2_scl)
-                .select(self.config.SENTINEL_2_BANDS))
+    def process_monthly_data(self, geometry: Any, year: int, scale: int) -> Any:
+        """Monthly composites for the entire year, from the configured imagery backend."""
+        return self.backend.annual_composite(geometry, year, self.get_date_ranges(year))
     
-    def get_sentinel1_collection(self, geometry: ee.Geometry, start_date: str, end_date: str) -> ee.ImageCollection:
-        """Get filtered Sentinel-1 collection."""
-        return (ee.ImageCollection('COPERNICUS/S1_GRD')
-                .filterBounds(geometry)
-                .filterDate(start_date, end_date)
-                .filter(ee.Filter.listContains('transmitterReceiverPolarisation', 'VV'))
-                .filter(ee.Filter.listContains('transmitterReceiverPolarisation', 'VH'))
-                .filter(ee.Filter.eq('instrumentMode', 'IW'))
-                .select(self.config.SENTINEL_1_BANDS))
-    
-    def calculate_indices(self, s2_image: ee.Image, s1_image: ee.Image) -> ee.Image:
-        """Calculate vegetation and water indices."""
-        # NDVI (Normalized Difference Vegetation Index)
-        ndvi = s2_image.normalizedDifference(['B8', 'B4']).rename('NDVI')
-        
-        # NDWI (Normalized Difference Water Index)
-        ndwi = s2_image.normalizedDifference(['B3', 'B8']).rename('NDWI')
+    def extract_pixel_data(self, geometry: Any, year: int, scale: int, max_pixels: int,
+                           cache_key: Optional[str] = None,
+                           progress: Optional[Callable[..., None]] = None) -> Dict[str, Any]:
+        cached = self.cached_stack(cache_key, max_pixels)
+        if cached is not None:
+            return cached
 
-        ndsi = s2_image.normalizedDifference(['B3', 'B11']).rename('NDSI')
+        result = self._fetch_pixel_data(geometry, year, scale, max_pixels, progress=progress)
+        # Never cache a stack with holes from failed tiles
+        if cache_key and not result['failed_tiles']:
+            pixel_cache.put(cache_key, result)
+        return self._limit_pixels(result, max_pixels)
 
-        ndmi = s2_image.normalizedDifference(['B8', 'B11']).rename('NDMI')
+    def cached_stack(self, cache_key: Optional[str], max_pixels: int) -> Optional[Dict[str, Any]]:
+        """Cached extraction result for cache_key, if it can serve max_pixels."""
+        if not cache_key:
+            return None
+        cached = pixel_cache.get(cache_key)
+        # A stack cut short by an earlier max_pixels can only serve smaller limits
+        if cached is not None and (cached['complete'] or cached['total_pixels'] >= max_pixels):
+            logger.info(f"Pixel cache hit for {cache_key[:12]} ({cached['total_pixels']} pixels)")
+            return self._limit_pixels(cached, max_pixels)
+        return None
 
-        ndbi = s2_image.normalizedDifference(['B11', 'B8']).rename('NDBI')
+    def _limit_pixels(self, result: Dict[str, Any], max_pixels: int) -> Dict[str, Any]:
+        """Apply the max_pixels limit to an extraction result."""
+        if result['total_pixels'] <= max_pixels:
+            return result
+        return {
+            **result,
+            **{name: result[name][:max_pixels] for name in self.STACK_ARRAYS},
+            'total_pixels': max_pixels
+        }
 
+    def band_columns(self, band_names: List[str]) -> List[tuple]:
+        """Map composite band names like 'NDVI_M03' to (band_name, month_idx, band_idx) stack columns."""
+        band_index = {band: i for i, band in enumerate(self.config.MODEL_BAND_ORDER)}
+        columns = []
+        for band_name in band_names:
+            base_name, _, month = band_name.rpartition('_M')
+            if base_name in band_index and month.isdigit() and 1 <= int(month) <= self.config.MONTHS_PER_YEAR:
+                columns.append((band_name, int(month) - 1, band_index[base_name]))
+        return columns
 
+    def empty_stack(self, n_pixels: int = 0) -> Dict[str, np.ndarray]:
+        """
+        Preallocated columnar pixel stack. Features are (pixels, months, bands) in
+        MODEL_BAND_ORDER, with NaN marking values missing from the composite.
+        """
+        return {
+            'features': np.full(
+                (n_pixels, self.config.MONTHS_PER_YEAR, len(self.config.MODEL_BAND_ORDER)),
+                np.nan, dtype=np.float32
+            ),
+            'latitude': np.empty(n_pixels, dtype=np.float64),
+            'longitude': np.empty(n_pixels, dtype=np.float64)
+        }
 
+    def features_to_stack(self, features: List[Dict], band_columns: List[tuple]) -> Dict[str, np.ndarray]:
+        """Write sampled GeoJSON features into a columnar pixel stack, one band column at a time."""
+        stack = self.empty_stack(len(features))
+        if not features:
+            return stack
         
-        # SAVI (Soil Adjusted Vegetation Index)
-        savi = s2_image.expression(
-            '((NIR - RED) / (NIR + RED + 0.5)) * 1.5',
-            {
-                'NIR': s2_image.select('B8'),
-                'RED': s2_image.select('B4')
-            }
-        ).rename('SAVI')
+        props = [feature['properties'] for feature in features]
+        for band_name, month_idx, band_idx in band_columns:
+            # None (masked) becomes NaN on conversion to float
+            stack['features'][:, month_idx, band_idx] = np.array(
+                [p.get(band_name) for p in props], dtype=np.float32
+            )
         
+        coords = np.array([feature['geometry']['coordinates'] for feature in features], dtype=np.float64)
+        stack['longitude'][:] = coords[:, 0]
+        stack['latitude'][:] = coords[:, 1]
+        return stack
+
+    def concat_stacks(self, stacks: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+        """Join per-tile stacks into one."""
+        stacks = [stack for stack in stacks if len(stack['latitude'])]
+        if not stacks:
+            return self.empty_stack()
+        if len(stacks) == 1:
+            return stacks[0]
+        return {name: np.concatenate([stack[name] for stack in stacks]) for name in self.STACK_ARRAYS}
+
+    def plan_extraction(self, geometry: Any, year: int, scale: int) -> Dict[str, Any]:
+        """Build the annual composite and the tile plan for a polygon."""
+        # Process monthly data
+        annual_composite = self.process_monthly_data(geometry, year, scale)
+        band_names = self.backend.band_names(annual_composite)
         
-        # MNDWI (Modified Normalized Difference Water Index)
-        mndwi = s2_image.normalizedDifference(['B3', 'B11']).rename('MNDWI')
+        # Precompute median dates for each month
+        date_ranges = self.get_date_ranges(year)
+        median_dates = []
+        for start, end in date_ranges:
+            start_dt = datetime.strptime(start, "%Y-%m-%d")
+            end_dt = datetime.strptime(end, "%Y-%m-%d")
+            median_dt = start_dt + (end_dt - start_dt) / 2
+            median_dates.append(median_dt.strftime("%Y-%m-%d"))
         
+        # Tile layout, intersections and areas are computed locally
+        tile_plan = tile_planner.plan_tiles(geometry, scale)
+        tiles = tile_plan['tiles']
         
-        return ee.Image.cat([ndvi, ndwi, savi, mndwi, ndsi, ndmi, ndbi])
+        logger.info(f"Created {len(tiles)} tiles for processing")
+        
+        return {
+            'geometry': geometry,
+            'year': year,
+            'scale': scale,
+            'composite': annual_composite,
+            'band_columns': self.band_columns(band_names),
+            'month_dates': median_dates,
+            'tiles': tiles,
+            'area': tile_plan['area'],
+            'tile_size': tile_plan['tile_size'],
+            'failed_tiles': [],
+            'complete': True,
+            # Set once the pixel budget is met (or the consumer goes away) so running tiles stop early
+            'cancel': threading.Event()
+        }
     
-    def process_monthly_data(self, geometry: ee.Geometry, year: int, scale: int) -> ee.Image:
-        """Process monthly composite data for the entire year."""
-        date_ranges = self.get_date_ranges(year)
-        monthly_composites = []
+    def process_tile(self, plan: Dict[str, Any], tile: Dict[str, Any], depth=0) -> Dict[str, np.ndarray]:
+        """Sample every pixel of one tile, splitting it when Earth Engine rejects it as too large."""
+        MAX_DEPTH = 3  # Maximum recursion depth
+        tile_id = tile['id']
+        tile_geom = tile['geometry']
+        scale = plan['scale']
         
-        for i, (start_date, end_date) in enumerate(date_ranges):
-            # Get Sentinel-2 monthly composite
-            s2_collection = self.get_sentinel2_collection(geometry, start_date, end_date)
-            s2_composite = s2_collection.median().clip(geometry)
-            
-            # Get Sentinel-1 monthly composite
-            s1_collection = self.get_sentinel1_collection(geometry, start_date, end_date)
-            s1_composite = s1_collection.median().clip(geometry)
-            
-            # Calculate indices
-            indices = self.calculate_indices(s2_composite, s1_composite)
-            
-            # Combine all bands
-            monthly_composite = ee.Image.cat([
-                s2_composite.select(self.config.SENTINEL_2_BANDS),
-                s1_composite.select(self.config.SENTINEL_1_BANDS),
-                indices
-            ])
-            
-            # Add month suffix to band names
-            month_suffix = f"_M{i+1:02d}"
-            band_names = monthly_composite.bandNames()
-            new_band_names = band_names.map(lambda name: ee.String(name).cat(month_suffix))
-            monthly_composite = monthly_composite.rename(new_band_names)
-            
-            monthly_composites.append(monthly_composite)
+        if plan['cancel'].is_set():
+            return self.empty_stack()
         
-        # Combine all monthly composites
-        return ee.Image.cat(monthly_composites)
-    
-    def extract_pixel_data(self, geometry: ee.Geometry, year: int, scale: int, max_pixels: int) -> Dict[str, Any]:
         try:
-            # Process monthly data
-            annual_composite = self.process_monthly_data(geometry, year, scale)
-            band_names = annual_composite.bandNames().getInfo()
+            start_time = datetime.now()
+            logger.info(f"Processing {tile_id} (depth {depth}) with {tile['expected_pixels']} pixels")
             
-            # Precompute median dates for each month
-            date_ranges = self.get_date_ranges(year)
-            median_dates = []
-            for start, end in date_ranges:
-                start_dt = datetime.strptime(start, "%Y-%m-%d")
-                end_dt = datetime.strptime(end, "%Y-%m-%d")
-                median_dt = start_dt + (end_dt - start_dt) / 2
-                median_dates.append(median_dt.strftime("%Y-%m-%d"))
+            # Get ALL pixels in tile; throttled and transient errors are retried by the scheduler
+            features = self.scheduler.call(
+                self.backend.sample, plan['composite'], tile_geom, scale, cancel_event=plan['cancel']
+            )
             
-            # Get polygon bounds
-            bounds = geometry.bounds()
-            coords = bounds.coordinates().get(0).getInfo()
-            min_lon, min_lat = coords[0]
-            max_lon, max_lat = coords[2]
-
-            # Calculate optimal grid size - more conservative approach
-            area = geometry.area(maxError=scale).getInfo()  # m²
-            total_pixels_estimate = area / (scale * scale)
+            # Process results straight into the columnar stack
+            pixels = self.features_to_stack(features, plan['band_columns'])
             
-            # Use smaller tiles
-            tiles_required = max(1, int(np.ceil(total_pixels_estimate / 1000)))
-            grid_size = int(np.ceil(np.sqrt(tiles_required * 1.5)))  # 50% more tiles
-            
-            # Generate grid
-            lon_steps = np.linspace(min_lon, max_lon, grid_size + 1)
-            lat_steps = np.linspace(min_lat, max_lat, grid_size + 1)
-            
-            # Create tile geometries
-            tiles = []
-            for i in range(grid_size):
-                for j in range(grid_size):
-                    tile = ee.Geometry.Rectangle([
-                        lon_steps[i], lat_steps[j],
-                        lon_steps[i+1], lat_steps[j+1]
-                    ])
-                    clipped_tile = tile.intersection(geometry)
-                    tile_area = clipped_tile.area(maxError=scale).getInfo()
-                    if tile_area > 0:  # Only include non-empty tiles
-                        expected_pixels = tile_area / (scale * scale)
-                        tiles.append({
-                            'geometry': clipped_tile,
-                            'id': f"tile_{i+1}_{j+1}",
-                            'expected_pixels': expected_pixels
-                        })
-            
-            logger.info(f"Created {len(tiles)} tiles for processing")
-            
-            # Tile processing function with recursive splitting
-            def process_tile(tile: Dict[str, Any], depth=0) -> List[Dict]:
-                MAX_DEPTH = 3  # Maximum recursion depth
-                tile_id = tile['id']
-                tile_geom = tile['geometry']
-                
-                try:
-                    start_time = datetime.now()
-                    logger.info(f"Processing {tile_id} (depth {depth}) with ~{tile['expected_pixels']:.0f} pixels")
-                    
-                    # Get ALL pixels in tile
-                    tile_img = annual_composite.addBands(ee.Image.pixelLonLat())
-                    samples = tile_img.sample(
-                        region=tile_geom,
-                        scale=scale,
-                        dropNulls=False,
-                        geometries=True
-                    )
-                    
-                    # Process results
-                    tile_data = samples.getInfo()
-                    pixels = []
-                    for feature in tile_data['features']:
-                        props = feature['properties']
-                        coords = feature['geometry']['coordinates']
-                        
-                        monthly_features = []
-                        for month in range(1, 13):
-                            month_suffix = f"_M{month:02d}"
-                            month_data = {}
-                            
-                            # Extract all bands for this month
-                            for band_name in band_names:
-                                if band_name.endswith(month_suffix):
-                                    # Remove suffix to get base band name
-                                    base_name = band_name.replace(month_suffix, "")
-                                    value = props.get(band_name)
-                                    if value is not None:
-                                        month_data[base_name] = float(value)
-                            
-                            # Only add if we have data for this month
-                            if month_data:
-                                monthly_features.append({
-                                    'month': median_dates[month-1],
-                                    'features': month_data
-                                })
-                        
-                        pixels.append({
-                            'latitude': coords[1],
-                            'longitude': coords[0],
-                            'monthly_data': monthly_features
-                        })
-                    
-                    duration = (datetime.now() - start_time).total_seconds()
-                    logger.info(f"Completed {tile_id} in {duration:.2f}s - {len(pixels)} pixels extracted")
-                    return pixels
+            duration = (datetime.now() - start_time).total_seconds()
+            logger.info(f"Completed {tile_id} in {duration:.2f}s - {len(pixels['latitude'])} pixels extracted")
+            return pixels
+        
+        except FetchCancelled:
+            return self.empty_stack()
+        except Exception as e:
+            if "over 5000 elements" in str(e) and depth < MAX_DEPTH:
+                logger.warning(f"Tile {tile_id} too large, splitting into subtiles (depth {depth+1})")
                 
-                except Exception as e:
-                    if "over 5000 elements" in str(e) and depth < MAX_DEPTH:
-                        logger.warning(f"Tile {tile_id} too large, splitting into subtiles (depth {depth+1})")
-                        
-                        # Split tile into 4 smaller tiles
-                        bounds = tile_geom.bounds()
-                        coords = bounds.coordinates().get(0).getInfo()
-                        min_lon, min_lat = coords[0]
-                        max_lon, max_lat = coords[2]
-                        mid_lon = (min_lon + max_lon) / 2
-                        mid_lat = (min_lat + max_lat) / 2
-                        
-                        subtiles = [
-                            [min_lon, min_lat, mid_lon, mid_lat],
-                            [min_lon, mid_lat, mid_lon, max_lat],
-                            [mid_lon, min_lat, max_lon, mid_lat],
-                            [mid_lon, mid_lat, max_lon, max_lat]
-                        ]
-                        
-                        all_pixels = []
-                        for k, st in enumerate(subtiles):
-                            subtile_geom = ee.Geometry.Rectangle(st)
-                            clipped_subtile = subtile_geom.intersection(geometry)
-                            sub_area = clipped_subtile.area(maxError=scale).getInfo()
-                            
-                            if sub_area > 0:
-                                sub_expected = sub_area / (scale * scale)
-                                subtile = {
-                                    'geometry': clipped_subtile,
-                                    'id': f"{tile_id}_sub{k+1}",
-                                    'expected_pixels': sub_expected
-                                }
-                                all_pixels.extend(process_tile(subtile, depth+1))
-                        
-                        return all_pixels
-                    else:
-                        logger.error(f"Failed processing {tile_id}: {str(e)}")
-                        logger.error(traceback.format_exc())
-                        return []
-            
-            # Parallel processing with ThreadPoolExecutor
-            all_pixels = []
-            total_tiles = len(tiles)
-            completed_tiles = 0
-            
-            # Use ThreadPoolExecutor for parallel tile processing
-            with ThreadPoolExecutor(max_workers=8) as executor:
-                futures = []
-                for tile in tiles:
-                    futures.append(executor.submit(process_tile, tile))
+                # Split tile into 4 smaller tiles
+                subtiles = tile_planner.split_tile(tile, scale)
+                sub_stacks = [self.process_tile(plan, subtile, depth+1) for subtile in subtiles]
                 
-                for future in futures:
+                return self.concat_stacks(sub_stacks)
+            else:
+                logger.error(f"Failed processing {tile_id}: {str(e)}")
+                logger.error(traceback.format_exc())
+                self.record_failed_tile(plan, tile, e)
+                return self.empty_stack()
+    
+    def record_failed_tile(self, plan: Dict[str, Any], tile: Dict[str, Any], error: Exception):
+        """Note a tile whose pixels are missing from the result, for the response metadata."""
+        plan['failed_tiles'].append({
+            'id': tile['id'],
+            'error': str(error),
+            'expected_pixels': tile['expected_pixels']
+        })
+    
+    def iter_tile_stacks(self, plan: Dict[str, Any], max_pixels: int, max_workers: Optional[int] = None,
+                         progress: Optional[Callable[..., None]] = None
+                         ) -> Iterator[Tuple[Dict[str, Any], Dict[str, np.ndarray]]]:
+        """
+        Fetch the planned tiles in parallel and yield (tile, stack) pairs as they complete.
+
+        Tiles are started largest first, and no new tile is started once the
+        pixels already yielded plus those expected from tiles in flight cover
+        max_pixels, so a capped request finishes as soon as its budget is met.
+        Only a small window of tiles is in flight at once, so a slow consumer
+        (e.g. a streaming response) keeps server memory bounded.
+        plan['complete'] records whether every tile was read.
+        progress, if given, is called with the tile/pixel counters after every tile
+        and may raise to abort the extraction.
+        Requests in flight are capped by the fetch scheduler's adaptive limit;
+        max_workers defaults to its ceiling.
+        """
+        max_workers = max_workers or self.scheduler.max_concurrency
+        tiles = plan['tiles']
+        total_tiles = len(tiles)
+        completed_tiles = 0
+        current_pixels = 0
+        window = max_workers * 2
+        
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        in_flight = {}  # future -> tile
+        remaining = iter(sorted(tiles, key=lambda tile: tile['expected_pixels'], reverse=True))
+        
+        def fill_window():
+            expected = current_pixels + sum(tile['expected_pixels'] for tile in in_flight.values())
+            while len(in_flight) < window and expected < max_pixels:
+                tile = next(remaining, None)
+                if tile is None:
+                    return
+                in_flight[executor.submit(self.process_tile, plan, tile)] = tile
+                expected += tile['expected_pixels']
+        
+        try:
+            fill_window()
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    tile = in_flight.pop(future)
                     try:
                         pixels = future.result()
-                        all_pixels.extend(pixels)
-                        completed_tiles += 1
-                        
-                        # Progress logging
-                        progress = completed_tiles / total_tiles * 100
-                        current_pixels = len(all_pixels)
-                        logger.info(f"Progress: {progress:.1f}% - Completed tiles: {completed_tiles}/{total_tiles} - Total pixels: {current_pixels}")
-                        
-                        # Check max_pixels limit
-                        if current_pixels >= max_pixels:
-                            logger.warning(f"Reached max_pixels limit ({max_pixels}), terminating early")
-                            # Cancel remaining tasks
-                            for f in futures:
-                                if not f.done():
-                                    f.cancel()
-                            break
                     except Exception as e:
                         logger.error(f"Tile processing failed: {str(e)}")
+                        self.record_failed_tile(plan, tile, e)
+                        pixels = self.empty_stack()
+                    completed_tiles += 1
+                    
+                    # Progress logging
+                    percent = completed_tiles / total_tiles * 100
+                    current_pixels += len(pixels['latitude'])
+                    logger.info(f"Progress: {percent:.1f}% - Completed tiles: {completed_tiles}/{total_tiles} - Total pixels: {current_pixels} - Concurrency: {self.scheduler.limit}")
+                    if progress:
+                        progress(stage='extracting', completed_tiles=completed_tiles,
+                                 total_tiles=total_tiles, pixels=current_pixels)
+                    
+                    yield tile, pixels
+                
+                # Check max_pixels limit
+                if current_pixels >= max_pixels:
+                    logger.warning(f"Reached max_pixels limit ({max_pixels}), terminating early")
+                    plan['complete'] = completed_tiles == total_tiles
+                    break
+                # Top up the window; tiles that came back short may need more tiles started
+                fill_window()
+        finally:
+            # Also runs when a streaming client disconnects: drop tiles that haven't
+            # started and stop running ones before their next request
+            plan['cancel'].set()
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def stack_metadata(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        """Non-array fields of an extraction result."""
+        return {
+            'bands_per_month': self.config.TOTAL_FEATURES,
+            'months': self.config.MONTHS_PER_YEAR,
+            'year': plan['year'],
+            'month_dates': plan['month_dates'],
+            'feature_bands': list(self.config.MODEL_BAND_ORDER),
+            'complete': plan['complete'],
+            'failed_tiles': plan['failed_tiles']
+        }
+    
+    def _fetch_pixel_data(self, geometry: Any, year: int, scale: int, max_pixels: int,
+                          progress: Optional[Callable[..., None]] = None) -> Dict[str, Any]:
+        try:
+            plan = self.plan_extraction(geometry, year, scale)
+            tile_stacks = [pixels for _, pixels in self.iter_tile_stacks(plan, max_pixels, progress=progress)]
+            current_pixels = sum(len(pixels['latitude']) for pixels in tile_stacks)
             
             # Final status
-            if not all_pixels:
+            if not current_pixels:
                 raise ValueError("No data points found in the specified geometry")
             
-            # Apply max_pixels limit
-            if len(all_pixels) > max_pixels:
-                all_pixels = all_pixels[:max_pixels]
-            
-            # Get base band names (without month suffixes)
-            base_bands = set()
-            for band_name in band_names:
-                # Remove month suffix (last 4 characters: _M##)
-                base_name = band_name[:-4] if band_name.endswith(("_M01", "_M12")) else band_name
-                base_bands.add(base_name)
+            stack = self.concat_stacks(tile_stacks)
+            del tile_stacks
             
             return {
-                'pixel_data': all_pixels,
-                'total_pixels': len(all_pixels),
-                'bands_per_month': self.config.TOTAL_FEATURES,
-                'months': self.config.MONTHS_PER_YEAR,
-                'year': year,
-                'feature_bands': sorted(list(base_bands))  
+                **stack,
+                **self.stack_metadata(plan),
+                'total_pixels': current_pixels
             }
             
+        except JobCancelled:
+            raise
         except Exception as e:
             logger.error(f"Error extracting pixel data: {e}")
             logger.error(traceback.format_exc())
             raise HTTPException(status_code=500, detail=f"Error extracting satellite data: {str(e)}")
 
 # Initialize processor
-processor = SatelliteDataProcessor()
+imagery_backend = create_imagery_backend(GEEConfig)
+processor = SatelliteDataProcessor(imagery_backend, fetch_scheduler)
 
 # Add Land Cover Classifier
 class LandCoverClassifier:
-    def __init__(self, model_path: str = "C:/Users/HF/Documents/GitHub/urban-mapping/urban-backend/models/LSTM_model_64.keras"):
+    def __init__(self, model_path: str = MODEL_PATH):
         model_path = os.path.abspath(model_path)
-        print("Current working directory:", os.getcwd())
         logger.info(f"Loading model from: {model_path}")
         
         # Verify file exists
@@ -446,143 +485,498 @@ class LandCoverClassifier:
             raise FileNotFoundError(f"Model file not found: {model_path}")
         
         try:
-            # Load the trained model
-            self.model = load_model(model_path)
+            # Load the trained model (or its ONNX/TFLite export) with the configured engine
+            self.engine = create_inference_engine(
+                model_path,
+                input_shape=(GEEConfig.MONTHS_PER_YEAR, len(GEEConfig.MODEL_BAND_ORDER)),
+                n_classes=len(GEEConfig.CLASS_NAMES)
+            )
+            logger.info(f"Land cover classifier loaded successfully ({self.engine.name} engine)")
+            # Identifies the loaded weights (Keras model or its export) and their
+            # quantization in result cache and cell store keys
+            self.fingerprint = make_cache_key(file_fingerprint(self.engine.model_path), self.engine.quantization)
             
-            # Check for GPU acceleration
-            gpu_devices = tf.config.list_physical_devices('GPU')
-            if gpu_devices:
-                tf.config.experimental.set_memory_growth(gpu_devices[0], True)
-                logger.info("Using GPU acceleration for model inference")
-            else:
-                logger.info("Using CPU for model inference")
-                
-            logger.info("Land cover classifier loaded successfully")
+            # Rows per model call; with micro-batching, small calls from concurrent requests share one
+            self.batch_size = int(os.getenv("LULC_BATCH_SIZE", str(self.engine.preferred_batch_size or 1000)))
+            self.batcher = None
+            if os.getenv("LULC_MICROBATCH", "1") == "1":
+                self.batcher = MicroBatcher(
+                    self.engine.predict,
+                    max_batch_size=self.batch_size,
+                    max_wait=float(os.getenv("LULC_MICROBATCH_MAX_WAIT_MS", "5")) / 1000
+                )
         except Exception as e:
             logger.error(f"Failed to load classification model: {str(e)}")
             raise RuntimeError("Could not initialize land cover classifier")
 
+    def warm_up(self):
+        """Run a dummy batch so graph tracing and allocation happen before the first request."""
+        start = datetime.now()
+        self.engine.warm_up((GEEConfig.MONTHS_PER_YEAR, len(GEEConfig.MODEL_BAND_ORDER)))
+        logger.info(f"Classifier warmed up in {(datetime.now() - start).total_seconds():.2f}s")
+
     def preprocess_pixel(self, pixel: Dict) -> np.ndarray:
         """Convert pixel data to model input format (12 months × 18 features)"""
-        # Initialize array with zeros (handles missing data)
-        features = np.zeros((12, len(GEEConfig.MODEL_BAND_ORDER)), dtype=np.float32)
-        
-        for monthly_data in pixel["monthly_data"]:
-            try:
-                # Extract month index from timestamp (e.g., "2023-03-15" -> 2)
-                month_idx = int(monthly_data["month"].split("-")[1]) - 1
-                if 0 <= month_idx < 12:
-                    for band in GEEConfig.MODEL_BAND_ORDER:
-                        # Get value if available, else keep 0
-                        value = monthly_data["features"].get(band)
-                        if value is not None:
-                            band_idx = GEEConfig.MODEL_BAND_ORDER.index(band)
-                            features[month_idx, band_idx] = float(value)
-            except Exception as e:
-                logger.warning(f"Error processing monthly data: {str(e)}")
-        
-        # Return 2D array (12, 18) - DO NOT FLATTEN
-        return features
+        return pixel_features.preprocess_pixel(pixel, GEEConfig.MODEL_BAND_ORDER)
+    
+    def preprocess_batch(self, stack: Dict[str, Any], start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """
+        Convert rows [start:stop] of a columnar extraction result to model input
+        (samples, 12 months, 18 features) in one NumPy copy. Missing data is zero-filled.
+        """
+        return pixel_features.assemble_batch(
+            stack['features'],
+            stack.get('feature_bands', GEEConfig.MODEL_BAND_ORDER),
+            GEEConfig.MODEL_BAND_ORDER,
+            month_dates=stack.get('month_dates'),
+            start=start,
+            stop=stop
+        )
+    
+    def predict(self, stack: Dict[str, Any],
+                progress: Optional[Callable[..., None]] = None) -> List[ClassificationResult]:
+        """Predict land cover classes for all pixels of a columnar extraction result"""
+        class_ids, confidences = self.predict_arrays(stack, progress=progress)
+        return [
+            ClassificationResult(
+                latitude=latitude,
+                longitude=longitude,
+                predicted_class=GEEConfig.CLASS_NAMES[class_id],
+                confidence=confidence
+            )
+            for latitude, longitude, class_id, confidence in zip(
+                stack['latitude'].tolist(), stack['longitude'].tolist(),
+                class_ids.tolist(), confidences.tolist()
+            )
+        ]
     
-    def predict(self, pixels: List[Dict]) -> List[ClassificationResult]:
-        """Predict land cover classes for all pixels"""
-        if not pixels:
-            return []
+    def predict_arrays(self, stack: Dict[str, Any],
+                       progress: Optional[Callable[..., None]] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Class ids (uint8) and confidences (float32) for all pixels of a columnar extraction result"""
+        total = len(stack['latitude'])
+        class_ids = np.empty(total, dtype=np.uint8)
+        confidences = np.empty(total, dtype=np.float32)
+        if not total:
+            return class_ids, confidences
             
-        logger.info(f"Starting classification for {len(pixels)} pixels")
-        
-        # Preprocess all pixels to 3D array (samples, months, features)
-        X = np.array([self.preprocess_pixel(p) for p in pixels])
+        logger.info(f"Starting classification for {total} pixels")
         
         # Predict in batches to manage memory
-        batch_size = 1000
-        results = []
-        total_batches = (len(X) + batch_size - 1) // batch_size
+        batch_size = self.batch_size
+        total_batches = (total + batch_size - 1) // batch_size
         
         for batch_idx in range(total_batches):
             start_idx = batch_idx * batch_size
-            end_idx = min((batch_idx + 1) * batch_size, len(X))
-            batch = X[start_idx:end_idx]
+            end_idx = min((batch_idx + 1) * batch_size, total)
+            # Assemble model input per batch so the full stack is never copied at once
+            batch = self.preprocess_batch(stack, start_idx, end_idx)
             
             logger.info(f"Processing batch {batch_idx+1}/{total_batches} ({len(batch)} pixels)")
             
             # Run model prediction - input shape (batch_size, 12, 18)
-            predictions = self.model.predict(batch, verbose=0)
-            class_ids = np.argmax(predictions, axis=1)
-            confidences = np.max(predictions, axis=1)
+            predictions = self.batcher.predict(batch) if self.batcher else self.engine.predict(batch)
+            class_ids[start_idx:end_idx] = np.argmax(predictions, axis=1)
+            confidences[start_idx:end_idx] = np.max(predictions, axis=1)
             
-            # Create results
-            for i in range(len(batch)):
-                global_idx = start_idx + i
-                results.append(ClassificationResult(
-                    latitude=pixels[global_idx]["latitude"],
-                    longitude=pixels[global_idx]["longitude"],
-                    predicted_class=GEEConfig.CLASS_NAMES[class_ids[i]],
-                    confidence=float(confidences[i])
-                ))
+            if progress:
+                progress(stage='classifying', classified_pixels=end_idx, total_pixels=total)
         
-        logger.info(f"Completed classification for {len(pixels)} pixels")
-        return results
+        logger.info(f"Completed classification for {total} pixels")
+        return class_ids, confidences
 
-# Initialize classifier during startup
-classifier = LandCoverClassifier()
+# Heavy resources are created on first use (or by warm_up_resources at startup),
+# so importing this module stays cheap for workers that never classify
+_classifier: Optional[LandCoverClassifier] = None
+_classifier_lock = threading.Lock()
+_imagery_ready = False
+_imagery_lock = threading.Lock()
+_warmup_error: Optional[str] = None
 
-@router.post("/classify-polygon", response_model=APIResponse)
-async def classify_polygon(request: PolygonRequest):
+def get_classifier() -> LandCoverClassifier:
+    """The shared classifier, loaded and warmed up on first call."""
+    global _classifier
+    if _classifier is None:
+        with _classifier_lock:
+            if _classifier is None:
+                classifier = LandCoverClassifier()
+                classifier.warm_up()
+                _classifier = classifier
+    return _classifier
+
+def init_gee_once():
+    """Initialize the imagery backend once per process; offline backends are no-ops."""
+    global _imagery_ready
+    if not _imagery_ready:
+        with _imagery_lock:
+            if not _imagery_ready:
+                imagery_backend.initialize()
+                _imagery_ready = True
+
+def warm_up_resources():
+    """Initialize the imagery backend and load and warm up the classifier. Blocking."""
+    global _warmup_error
+    try:
+        init_gee_once()
+        get_classifier()
+        _warmup_error = None
+    except Exception as e:
+        _warmup_error = str(e)
+        logger.error(f"Warm-up failed: {str(e)}")
+        logger.error(traceback.format_exc())
+
+def start_warmup():
+    """Warm up in a background thread when LULC_PRELOAD=1 (the default), so startup isn't blocked."""
+    if os.getenv("LULC_PRELOAD", "1") == "1":
+        threading.Thread(target=warm_up_resources, name="lulc-warmup", daemon=True).start()
+
+def classify_request(request: PolygonRequest,
+                     progress: Optional[Callable[..., None]] = None) -> Dict[str, Any]:
     """
-    End-to-end land cover classification for a polygon
+    Extract and classify a polygon into per-pixel class id and confidence arrays,
+    plus the response metadata. Blocking; call from a worker thread.
     """
-    try:
-        logger.info(f"Classification request for polygon with {len(request.polygon)} vertices")
-        
-        # Create GEE geometry
-        geometry = processor.create_polygon_geometry(request.polygon)
-        
+    logger.info(f"Classification request for polygon with {len(request.polygon)} vertices")
+    
+    init_gee_once()
+    classifier = get_classifier()
+    
+    cache_key = make_cache_key(
+        polygon_fingerprint((coord.lon, coord.lat) for coord in request.polygon),
+        request.year, request.scale, request.max_pixels, classifier.fingerprint
+    )
+    cached = result_cache.get(cache_key)
+    if cached is not None:
+        logger.info(f"Result cache hit for {cache_key[:12]} ({cached['metadata']['total_pixels']} pixels)")
+        return {**cached, 'metadata': {**cached['metadata'], 'cached': True}}
+    
+    # Create GEE geometry
+    geometry = processor.create_polygon_geometry(request.polygon)
+    
+    # Pixels classified for earlier overlapping polygons; only the rest is fetched
+    reused = cell_store.lookup(geometry, request.year, request.scale, classifier.fingerprint)
+    missing = reused['missing']
+    reused_pixels = len(reused['class_ids'])
+    budget = request.max_pixels - reused_pixels
+    
+    start_extract = datetime.now()
+    extract_duration = classify_duration = 0.0
+    fetched = empty_pixels()
+    complete, failed_tiles = reused_pixels <= request.max_pixels, []
+    # Slivers left between stored blocks may hold no pixel centre at all; the
+    # tile plan counts them per block rather than over the whole bounding box
+    needs_fetch = not missing.is_empty and (
+        missing is geometry or bool(tile_planner.plan_tiles(missing, request.scale)['tiles'])
+    )
+    if budget > 0 and needs_fetch:
         # Extract pixel data
-        start_extract = datetime.now()
         extraction_result = processor.extract_pixel_data(
-            geometry, request.year, request.scale, request.max_pixels
+            missing, request.year, request.scale, budget,
+            cache_key=processor.stack_cache_key(request.polygon, request.year, request.scale) if missing is geometry else None,
+            progress=progress
         )
         extract_duration = (datetime.now() - start_extract).total_seconds()
         
-        pixel_data = extraction_result['pixel_data']
-        logger.info(f"Extracted {len(pixel_data)} pixels in {extract_duration:.2f}s")
+        logger.info(f"Extracted {extraction_result['total_pixels']} pixels in {extract_duration:.2f}s")
         
         # Run classification
         start_classify = datetime.now()
-        predictions = classifier.predict(pixel_data)
+        class_ids, confidences = classifier.predict_arrays(extraction_result, progress=progress)
         classify_duration = (datetime.now() - start_classify).total_seconds()
         
-        logger.info(f"Classified {len(predictions)} pixels in {classify_duration:.2f}s")
+        logger.info(f"Classified {len(class_ids)} pixels in {classify_duration:.2f}s")
         
-        return APIResponse(
-            success=True,
-            message=f"Classified {len(predictions)} pixels",
-            data=[p.dict() for p in predictions],
-            metadata={
-                'total_pixels': len(predictions),
-                'extraction_time': extract_duration,
-                'classification_time': classify_duration,
-                'total_time': extract_duration + classify_duration,
-                'year': request.year,
-                'scale': request.scale
-            }
+        fetched = {
+            'latitude': extraction_result['latitude'],
+            'longitude': extraction_result['longitude'],
+            'class_ids': class_ids,
+            'confidences': confidences
+        }
+        complete, failed_tiles = extraction_result['complete'], extraction_result['failed_tiles']
+        # Only an extraction that read all of the missing area says which cells it covered
+        if complete and not failed_tiles:
+            cell_store.update(missing, request.year, request.scale, classifier.fingerprint, fetched)
+    
+    pixels = concat_pixels([reused, fetched])
+    pixels = {name: values[:request.max_pixels] for name, values in pixels.items()}
+    if not len(pixels['class_ids']):
+        raise ValueError("No data points found in the specified geometry")
+    
+    message = f"Classified {len(fetched['class_ids'])} pixels"
+    if reused_pixels:
+        message += f", reused {min(reused_pixels, request.max_pixels)} previously classified pixels"
+    if failed_tiles:
+        message += f"; {len(failed_tiles)} tiles could not be fetched and are missing"
+    
+    result = {
+        # Only pixel positions are needed past this point
+        'stack': {'latitude': pixels['latitude'], 'longitude': pixels['longitude']},
+        'class_ids': pixels['class_ids'],
+        'confidences': pixels['confidences'],
+        'message': message,
+        'metadata': {
+            'total_pixels': len(pixels['class_ids']),
+            'reused_pixels': min(reused_pixels, request.max_pixels),
+            'extraction_time': extract_duration,
+            'classification_time': classify_duration,
+            'total_time': extract_duration + classify_duration,
+            'year': request.year,
+            'scale': request.scale,
+            'complete': complete,
+            'failed_tiles': failed_tiles,
+            'cached': False
+        }
+    }
+    # Results with holes from failed tiles are worth retrying, so they are not cached
+    if not failed_tiles:
+        result_cache.put(cache_key, result)
+    return result
+
+def classification_response(result: Dict[str, Any]) -> APIResponse:
+    """APIResponse for a classify_request() result, one JSON object per pixel."""
+    stack = result['stack']
+    data = [
+        {
+            'latitude': latitude,
+            'longitude': longitude,
+            'predicted_class': GEEConfig.CLASS_NAMES[class_id],
+            'confidence': confidence
+        }
+        for latitude, longitude, class_id, confidence in zip(
+            stack['latitude'].tolist(), stack['longitude'].tolist(),
+            result['class_ids'].tolist(), result['confidences'].tolist()
         )
-        
+    ]
+    return APIResponse(success=True, message=result['message'], data=data, metadata=result['metadata'])
+
+def run_classification(request: PolygonRequest,
+                       progress: Optional[Callable[..., None]] = None) -> APIResponse:
+    """Extract and classify a polygon, one JSON object per pixel. Blocking; call from a worker thread."""
+    return classification_response(classify_request(request, progress=progress))
+
+def run_raster_classification(request: PolygonRequest, confidence_dtype: str = 'uint8',
+                              progress: Optional[Callable[..., None]] = None) -> Dict[str, Any]:
+    """Extract and classify a polygon into class and confidence grids on the sample pixel grid."""
+    result = classify_request(request, progress=progress)
+    stack = result['stack']
+    if not len(result['class_ids']):
+        raise ValueError("No pixels classified")
+    raster = raster_encoding.rasterize(
+        stack['latitude'], stack['longitude'], result['class_ids'], result['confidences'],
+        tile_planner.pixel_step(request.scale), confidence_dtype
+    )
+    return {**result, 'raster': raster}
+
+@router.post("/classify-polygon", response_model=APIResponse)
+def classify_polygon(request: PolygonRequest):
+    """
+    End-to-end land cover classification for a polygon.
+    Declared sync so FastAPI runs it in its threadpool instead of blocking the event loop.
+    """
+    try:
+        return run_classification(request)
     except Exception as e:
         logger.error(f"Classification error: {str(e)}")
         logger.error(traceback.format_exc())
         raise HTTPException(status_code=500, detail=str(e))
 
+RASTER_FORMATS = ('json', 'geotiff')
 
-# Export the router to be included in main.py
-def init_gee_once():
+@router.post("/classify-polygon/raster")
+def classify_polygon_raster(request: PolygonRequest, format: str = 'json', confidence: str = 'uint8'):
+    """
+    Land cover classification as a raster on the sample pixel grid instead of one object per pixel.
+    format=json returns zlib+base64 uint8 class and confidence grids (confidence=uint8|float16)
+    with a geotransform and class lookup table; format=geotiff returns a two-band GeoTIFF.
+    """
+    if format not in RASTER_FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported raster format: {format}")
+    if confidence not in ('uint8', 'float16'):
+        raise HTTPException(status_code=400, detail=f"Unsupported confidence dtype: {confidence}")
+    try:
+        result = run_raster_classification(request, confidence)
+        if format == 'geotiff':
+            return Response(
+                content=raster_encoding.to_geotiff(result['raster'], GEEConfig.CLASS_NAMES),
+                media_type='image/tiff',
+                headers={'X-Classification-Message': result['message']}
+            )
+        return {
+            'success': True,
+            'message': result['message'],
+            'raster': raster_encoding.raster_payload(result['raster'], GEEConfig.CLASS_NAMES),
+            'metadata': result['metadata']
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Raster classification error: {str(e)}")
+        logger.error(traceback.format_exc())
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Background classification jobs; status, results and tile layers are kept in a disk store
+# shared by all workers on the same cache directory, so any worker can answer for a job
+job_manager = JobManager(
+    max_workers=int(os.getenv("CLASSIFY_JOB_WORKERS", "2")),
+    result_ttl=float(os.getenv("CLASSIFY_JOB_RESULT_TTL", "3600")),
+    store=DiskLRUCache(
+        os.getenv("CLASSIFY_JOB_RESULT_DIR", "cache/job_results"),
+        int(os.getenv("CLASSIFY_JOB_RESULT_MAX_BYTES", str(1024 ** 3)))
+    )
+)
+
+def classification_job(job: Job, request: PolygonRequest) -> APIResponse:
+    result = classify_request(request, progress=job.update_progress)
+    stack = result['stack']
+    # Served as vector tiles by /tiles/classification-{job_id}/{z}/{x}/{y}.pbf
+    job.artifacts['pixel_layer'] = PixelLayer(
+        stack['latitude'], stack['longitude'], result['class_ids'],
+        tile_planner.pixel_step(request.scale), GEEConfig.CLASS_NAMES
+    )
+    return classification_response(result)
+
+def get_job_or_404(job_id: str) -> Job:
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.post("/classify-jobs", status_code=202)
+def create_classification_job(request: PolygonRequest):
+    """Start a polygon classification in the background and return its job id."""
+    job = job_manager.submit("classify-polygon", classification_job, request)
+    return job.to_dict()
+
+@router.get("/classify-jobs/{job_id}")
+def get_classification_job(job_id: str):
+    """Status and progress (tiles fetched, pixels classified) of a classification job."""
+    return get_job_or_404(job_id).to_dict()
+
+@router.get("/classify-jobs/{job_id}/result", response_model=APIResponse)
+def get_classification_job_result(job_id: str):
+    job = get_job_or_404(job_id)
+    if job.status == "succeeded":
+        outputs = job_manager.outputs(job)
+        if outputs is None:
+            raise HTTPException(status_code=410, detail="Job result has expired")
+        return outputs['result']
+    if job.status == "failed":
+        raise HTTPException(status_code=500, detail=job.error)
+    if job.status == "cancelled":
+        raise HTTPException(status_code=410, detail="Job was cancelled")
+    raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+
+@router.delete("/classify-jobs/{job_id}")
+def cancel_classification_job(job_id: str):
+    """Cancel a queued or running classification job."""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+STREAM_MEDIA_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'sse': 'text/event-stream'
+}
+# Pixels per event when replaying a cached stack
+STREAM_CHUNK_PIXELS = 5000
+
+def format_stream_event(stream_format: str, event: str, payload: Dict[str, Any]) -> str:
+    """Serialize one stream event as an NDJSON line or a server-sent event."""
+    if stream_format == 'sse':
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+    return json.dumps({'event': event, **payload}) + "\n"
+
+def stream_classification(request: PolygonRequest, stream_format: str) -> Iterator[str]:
+    """
+    Extract and classify tile by tile, emitting each tile's pixels as soon as it is classified.
+    Runs in Starlette's threadpool, so the blocking Earth Engine and model calls stay off the event loop.
+    """
+    start_time = datetime.now()
+    emitted = 0
     try:
-        ee.Initialize(project=os.getenv("GEE_PROJECT_ID", "your-project-id"))
-        logger.info("GEE initialized with default credentials")
+        init_gee_once()
+        classifier = get_classifier()
+        cached = processor.cached_stack(
+            processor.stack_cache_key(request.polygon, request.year, request.scale), request.max_pixels
+        )
+        if cached is not None:
+            total = cached['total_pixels']
+            tiles = (
+                ({'id': f"cached_{i // STREAM_CHUNK_PIXELS + 1}"},
+                 {name: cached[name][i:i + STREAM_CHUNK_PIXELS] for name in processor.STACK_ARRAYS})
+                for i in range(0, total, STREAM_CHUNK_PIXELS)
+            )
+            plan = {'failed_tiles': cached['failed_tiles'], 'complete': cached['complete']}
+            yield format_stream_event(stream_format, 'start', {'tiles': -(-total // STREAM_CHUNK_PIXELS), 'cached': True})
+        else:
+            geometry = processor.create_polygon_geometry(request.polygon)
+            plan = processor.plan_extraction(geometry, request.year, request.scale)
+            tiles = processor.iter_tile_stacks(plan, request.max_pixels)
+            yield format_stream_event(stream_format, 'start', {'tiles': len(plan['tiles']), 'cached': False})
+        
+        for tile, pixels in tiles:
+            # The last tile may overshoot the pixel budget
+            budget = request.max_pixels - emitted
+            if len(pixels['latitude']) > budget:
+                pixels = {name: pixels[name][:budget] for name in processor.STACK_ARRAYS}
+            if not len(pixels['latitude']):
+                continue
+            
+            predictions = classifier.predict(pixels)
+            emitted += len(predictions)
+            yield format_stream_event(stream_format, 'tile', {
+                'tile': tile['id'],
+                'pixels': [p.dict() for p in predictions]
+            })
+            if emitted >= request.max_pixels:
+                break
+        
+        yield format_stream_event(stream_format, 'done', {
+            'total_pixels': emitted,
+            'total_time': (datetime.now() - start_time).total_seconds(),
+            'failed_tiles': plan['failed_tiles'],
+            'year': request.year,
+            'scale': request.scale
+        })
+    
     except Exception as e:
-        logger.error(f"Failed to initialize GEE: {e}")
-        raise RuntimeError("Failed to initialize GEE")
+        # Headers are already sent, so errors are reported in-band
+        logger.error(f"Streaming classification error: {str(e)}")
+        logger.error(traceback.format_exc())
+        yield format_stream_event(stream_format, 'error', {'detail': str(e), 'total_pixels': emitted})
 
-# Initialize on import
-init_gee_once()
+@router.post("/classify-polygon/stream")
+def classify_polygon_stream(request: PolygonRequest, format: str = 'ndjson'):
+    """
+    Streaming land cover classification for a polygon.
+    format=ndjson emits one JSON object per line, format=sse emits server-sent events;
+    both send 'start', one 'tile' per classified tile, then 'done' (or 'error').
+    """
+    if format not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported stream format: {format}")
+    
+    logger.info(f"Streaming classification request for polygon with {len(request.polygon)} vertices")
+    return StreamingResponse(
+        stream_classification(request, format),
+        media_type=STREAM_MEDIA_TYPES[format],
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@router.get("/lulc/cache")
+def lulc_cache_stats():
+    """Hit/miss counters and sizes of the classification result cache and the pixel stack cache."""
+    return {'result_cache': result_cache.stats(), 'pixel_cache': pixel_cache.stats()}
+
+@router.get("/lulc/ready")
+def lulc_ready():
+    """Readiness probe: 200 once the imagery backend is initialized and the classifier is warm, 503 before."""
+    status = {
+        'imagery_backend': imagery_backend.name,
+        'imagery_initialized': _imagery_ready,
+        'classifier_loaded': _classifier is not None,
+        'inference_engine': _classifier.engine.name if _classifier is not None else None,
+        'micro_batching': _classifier.batcher.snapshot() if _classifier is not None and _classifier.batcher else None,
+        'error': _warmup_error
+    }
+    ready = _imagery_ready and _classifier is not None
+    return JSONResponse(status_code=200 if ready else 503, content={'ready': ready, **status})
@@ -0,0 +1,105 @@
+import json
+import logging
+import os
+import threading
+import time
+import traceback
+from typing import Dict, Tuple
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import Response
+
+from database.connect_db import connect_db
+from database.uc_results import latest_uc_features
+from routes.lulc import job_manager
+from services.vector_tiles import PolygonLayer, render_tile
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+MVT_MEDIA_TYPE = "application/vnd.mapbox-vector-tile"
+MAX_ZOOM = 22
+# UC indicator layers are rebuilt from the database at most this often (seconds)
+TILE_LAYER_TTL = float(os.getenv("TILE_LAYER_TTL", "600"))
+UC_BOUNDARIES_PATH = os.path.join("data", "lahore_ucs.geojson")
+# Tile layer name -> uc_analysis.analysis_type
+UC_ANALYSIS_LAYERS = {
+    "ndvi": "ndvi",
+    "thermal": "thermal",
+    "air_quality": "air_quality",
+}
+CLASSIFICATION_PREFIX = "classification-"
+
+_uc_layers: Dict[str, Tuple[float, PolygonLayer]] = {}
+_uc_layers_lock = threading.Lock()
+
+
+def load_uc_analysis_features(analysis_type: str) -> list:
+    """Latest uc_analysis result per UC for an analysis type, as GeoJSON features."""
+    db_connection = connect_db()
+    try:
+        return latest_uc_features(db_connection, analysis_type)
+    finally:
+        db_connection.close()
+
+
+def load_uc_layer(name: str) -> PolygonLayer:
+    if name == "ucs":
+        with open(UC_BOUNDARIES_PATH) as f:
+            return PolygonLayer.from_features(json.load(f)["features"])
+    return PolygonLayer.from_features(load_uc_analysis_features(UC_ANALYSIS_LAYERS[name]))
+
+
+def get_uc_layer(name: str) -> PolygonLayer:
+    """UC layer built once and reused for TILE_LAYER_TTL seconds."""
+    with _uc_layers_lock:
+        cached = _uc_layers.get(name)
+        if cached and time.time() - cached[0] < TILE_LAYER_TTL:
+            return cached[1]
+        layer = load_uc_layer(name)
+        _uc_layers[name] = (time.time(), layer)
+        logger.info(f"Built {name} tile layer with {len(layer.properties)} polygons")
+        return layer
+
+
+def get_classification_layer(job_id: str):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.status != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    outputs = job_manager.outputs(job)
+    if outputs is None:
+        raise HTTPException(status_code=410, detail="Job result has expired")
+    return outputs["artifacts"]["pixel_layer"]
+
+
+@router.get("/tiles/{layer}/{z}/{x}/{y}.pbf")
+def get_tile(layer: str, z: int, x: int, y: int):
+    """
+    Mapbox Vector Tile for a layer: ucs (boundaries), ndvi, thermal, air_quality
+    or classification-{job_id} for a finished classification job. 204 if the tile is empty.
+    """
+    if not 0 <= z <= MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=400, detail=f"Invalid tile {z}/{x}/{y}")
+
+    if layer.startswith(CLASSIFICATION_PREFIX):
+        layers = {"classification": get_classification_layer(layer[len(CLASSIFICATION_PREFIX):])}
+        # A finished job's pixels never change, but the job itself expires
+        cache_control = "private, max-age=3600"
+    elif layer == "ucs" or layer in UC_ANALYSIS_LAYERS:
+        try:
+            layers = {layer: get_uc_layer(layer)}
+        except Exception as e:
+            logger.error(f"Failed to build {layer} tile layer: {str(e)}")
+            logger.error(traceback.format_exc())
+            raise HTTPException(status_code=500, detail=str(e))
+        cache_control = f"public, max-age={int(TILE_LAYER_TTL)}"
+    else:
+        raise HTTPException(status_code=404, detail=f"Unknown tile layer: {layer}")
+
+    content = render_tile(layers, z, x, y)
+    if content is None:
+        return Response(status_code=204, headers={"Cache-Control": cache_control})
+    return Response(content=content, media_type=MVT_MEDIA_TYPE, headers={"Cache-Control": cache_control})
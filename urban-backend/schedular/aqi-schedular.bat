@@ -1,5 +0,0 @@
-@echo off
-echo Running AQI Analysis...
-python "C:\Users\HF\Desktop\FYP\urban-mapping\urban-backend\processor\batch_aqi_processor.py"
-echo AQI Analysis completed at %date% %time%
-pause
\ No newline at end of file
@@ -0,0 +1,6 @@
+@echo off
+rem Nightly NDVI, thermal and AQI refresh for all UCs in one run
+cd /d "%~dp0.."
+echo Running UC indicator analysis...
+python -m processor.batch_runner %*
+echo UC indicator analysis completed at %date% %time%
@@ -1,5 +0,0 @@
-@echo off
-echo Running NDVI Analysis...
-python "C:\Users\HF\Desktop\FYP\urban-mapping\urban-backend\processor\batch_ndvi_processor.py"
-echo NDVI Analysis completed at %date% %time%
-pause
\ No newline at end of file
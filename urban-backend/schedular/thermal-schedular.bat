@@ -1,5 +0,0 @@
-@echo off
-echo Running Thermal Analysis...
-python "C:\Users\HF\Desktop\FYP\urban-mapping\urban-backend\processor\batch_thermal_processor.py"
-echo Thermal Analysis completed at %date% %time%
-pause
\ No newline at end of file
@@ -0,0 +1,315 @@
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sys
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+import numpy as np
+from cachetools import TTLCache
+from filelock import FileLock
+
+logger = logging.getLogger(__name__)
+
+# Coordinates are rounded to ~1 cm before hashing so that float noise from the
+# frontend does not produce distinct keys for the same drawn polygon.
+COORDINATE_PRECISION = 7
+
+
+def normalize_ring(coordinates: Iterable[Sequence[float]]) -> list:
+    """
+    Canonical form of a polygon ring given as (lon, lat) pairs: rounded, open,
+    without repeated vertices, counter-clockwise and starting at the smallest vertex.
+    """
+    ring = []
+    for lon, lat in coordinates:
+        point = (round(float(lon), COORDINATE_PRECISION), round(float(lat), COORDINATE_PRECISION))
+        if not ring or ring[-1] != point:
+            ring.append(point)
+    if len(ring) > 1 and ring[0] == ring[-1]:
+        ring.pop()
+
+    # Shoelace sum is negative for clockwise rings
+    signed_area = sum(
+        x1 * y2 - x2 * y1
+        for (x1, y1), (x2, y2) in zip(ring, ring[1:] + ring[:1])
+    )
+    if signed_area < 0:
+        ring.reverse()
+
+    start = ring.index(min(ring))
+    return ring[start:] + ring[:start]
+
+
+def polygon_fingerprint(coordinates: Iterable[Sequence[float]]) -> str:
+    """Stable hash of a polygon ring, independent of vertex order and closing point."""
+    payload = json.dumps(normalize_ring(coordinates), separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def make_cache_key(*parts: Any) -> str:
+    """Hash arbitrary JSON-serialisable key parts into a filesystem-safe key."""
+    payload = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def file_fingerprint(path: str) -> str:
+    """SHA-256 of a file's contents, e.g. to tie cached results to a model version."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def value_nbytes(value: Any) -> int:
+    """Approximate memory held by a value: array buffers plus the containers around them."""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(value_nbytes(k) + value_nbytes(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(value_nbytes(item) for item in value)
+    return sys.getsizeof(value)
+
+
+class DiskLRUCache:
+    """
+    Size-bounded on-disk cache with least-recently-used eviction, safe to share
+    between processes (e.g. uvicorn workers) using the same directory.
+
+    Values are pickled one file per key and recency is the file mtime. The
+    total size lives in a small index file next to the entries, updated under
+    a file lock by every process, so max_bytes bounds the directory as a whole.
+    Only when that total goes over the limit is the directory scanned, and
+    least recently used entries evicted down to LOW_WATERMARK of it.
+    """
+
+    INDEX_FILE = "index.json"
+    LOCK_FILE = "index.lock"
+    # Eviction frees a little more than needed, so the next puts don't rescan at once
+    LOW_WATERMARK = 0.9
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        if self.enabled:
+            os.makedirs(self.directory, exist_ok=True)
+            self._file_lock = FileLock(os.path.join(self.directory, self.LOCK_FILE))
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.pkl")
+
+    def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cache entry {key}: {e}")
+            self.delete(key)
+            return None
+        return value
+
+    def put(self, key: str, value: Any):
+        if not self.enabled:
+            return
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            size = os.path.getsize(tmp_path)
+            if size > self.max_bytes:
+                logger.warning(f"Not caching {key}: {size} bytes exceeds cache size limit")
+                os.remove(tmp_path)
+                return
+            with self._file_lock:
+                index = self._read_index()
+                old_size = self._size(path)
+                os.replace(tmp_path, path)
+                index["bytes"] += size - (old_size or 0)
+                if old_size is None:
+                    index["entries"] += 1
+                if index["bytes"] > self.max_bytes:
+                    index = self._evict()
+                self._write_index(index)
+        except Exception as e:
+            logger.warning(f"Failed to write cache entry {key}: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def delete(self, key: str):
+        if not self.enabled:
+            return
+        path = self._path(key)
+        with self._file_lock:
+            size = self._size(path)
+            if size is None:
+                return
+            index = self._read_index()
+            os.remove(path)
+            index["bytes"] -= size
+            index["entries"] -= 1
+            self._write_index(index)
+
+    def stats(self) -> Dict[str, int]:
+        if not self.enabled:
+            return {"entries": 0, "bytes": 0}
+        with self._file_lock:
+            return self._read_index()
+
+    @staticmethod
+    def _size(path: str) -> Optional[int]:
+        try:
+            return os.path.getsize(path)
+        except FileNotFoundError:
+            return None
+
+    def _scan(self):
+        """(mtime, size, path) of every entry on disk, least recently used first."""
+        found = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".pkl"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                found.append((stat.st_mtime, stat.st_size, path))
+        return sorted(found)
+
+    def _read_index(self) -> Dict[str, int]:
+        """Shared totals; rebuilt from a directory scan if missing or unreadable. Caller holds the file lock."""
+        try:
+            with open(os.path.join(self.directory, self.INDEX_FILE)) as f:
+                index = json.load(f)
+            return {"entries": int(index["entries"]), "bytes": int(index["bytes"])}
+        except (FileNotFoundError, ValueError, KeyError, TypeError):
+            entries = self._scan()
+            index = {"entries": len(entries), "bytes": sum(size for _, size, _ in entries)}
+            logger.info(f"Disk cache at {self.directory}: {index['entries']} entries, {index['bytes'] / 1e6:.1f} MB")
+            return index
+
+    def _write_index(self, index: Dict[str, int]):
+        path = os.path.join(self.directory, self.INDEX_FILE)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, path)
+
+    def _evict(self) -> Dict[str, int]:
+        """
+        Remove least recently used entries until the directory is under the low
+        watermark, recounting from disk. Caller holds the file lock.
+        """
+        entries = self._scan()
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * self.LOW_WATERMARK
+        evicted = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            evicted += 1
+        logger.info(f"Evicted {evicted} cache entries from {self.directory} ({total / 1e6:.1f} MB left)")
+        return {"entries": len(entries) - evicted, "bytes": total}
+
+
+class TieredCache:
+    """
+    In-memory TTL/LRU cache of at most max_bytes in front of a DiskLRUCache,
+    with hit/miss counters.
+
+    Entries carry their creation time, so the TTL still applies to disk entries
+    written by a previous process. Disk hits are promoted to memory; entries
+    larger than the whole memory tier stay on disk only.
+    """
+
+    def __init__(self, disk: DiskLRUCache, max_bytes: int, ttl: float):
+        self.disk = disk
+        self.ttl = ttl
+        self.memory = TTLCache(maxsize=max_bytes, ttl=ttl, getsizeof=self._entry_size) if max_bytes > 0 else None
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "expired": 0, "puts": 0}
+
+    @staticmethod
+    def _entry_size(entry: Dict[str, Any]) -> int:
+        if "size" not in entry:
+            entry["size"] = value_nbytes(entry["value"])
+        return entry["size"]
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        if self.memory is None or self._entry_size(entry) > self.memory.maxsize:
+            return
+        with self._lock:
+            self.memory[key] = entry
+
+    def _fresh(self, entry: Optional[Dict[str, Any]]) -> bool:
+        return entry is not None and time.time() - entry["created_at"] < self.ttl
+
+    def _count(self, name: str):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        if self.memory is not None:
+            with self._lock:
+                entry = self.memory.get(key)
+            if self._fresh(entry):
+                self._count("memory_hits")
+                return entry["value"]
+
+        entry = self.disk.get(key)
+        if entry is not None and not self._fresh(entry):
+            self.disk.delete(key)
+            self._count("expired")
+            entry = None
+        if entry is None:
+            self._count("misses")
+            return None
+
+        self._count("disk_hits")
+        self._remember(key, entry)
+        return entry["value"]
+
+    def put(self, key: str, value: Any):
+        entry = {"created_at": time.time(), "value": value, "size": value_nbytes(value)}
+        self._remember(key, entry)
+        self.disk.put(key, entry)
+        self._count("puts")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            memory_entries = len(self.memory) if self.memory is not None else 0
+            memory_bytes = self.memory.currsize if self.memory is not None else 0
+        disk = self.disk.stats()
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        return {
+            **stats,
+            "hit_rate": (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else None,
+            "memory_entries": memory_entries,
+            "memory_bytes": memory_bytes,
+            "disk_entries": disk["entries"],
+            "disk_bytes": disk["bytes"],
+        }
@@ -0,0 +1,126 @@
+"""
+Classified pixels stored per block of the global sample grid, so overlapping
+polygons only fetch and classify the area no earlier request has covered.
+
+Blocks are the grid-aligned squares services.tile_planner plans requests in,
+keyed by year, scale, model fingerprint and block column/row. Each entry holds
+the pixels classified inside the block and the part of the block they cover,
+so a pixel that was never sampled is not mistaken for one with no data.
+"""
+import logging
+import threading
+from typing import Any, Dict
+
+import numpy as np
+import shapely
+from shapely.geometry.base import BaseGeometry
+
+from services import tile_planner
+from services.cache_service import DiskLRUCache, make_cache_key
+
+logger = logging.getLogger(__name__)
+
+PIXEL_ARRAYS = ('latitude', 'longitude', 'class_ids', 'confidences')
+
+
+def empty_pixels() -> Dict[str, np.ndarray]:
+    return {
+        'latitude': np.empty(0, dtype=np.float64),
+        'longitude': np.empty(0, dtype=np.float64),
+        'class_ids': np.empty(0, dtype=np.uint8),
+        'confidences': np.empty(0, dtype=np.float32),
+    }
+
+
+def concat_pixels(parts) -> Dict[str, np.ndarray]:
+    parts = [part for part in parts if len(part['latitude'])]
+    if not parts:
+        return empty_pixels()
+    return {name: np.concatenate([part[name] for part in parts]) for name in PIXEL_ARRAYS}
+
+
+class ClassifiedCellStore:
+    """Per-block classified pixels on disk, looked up and extended one polygon at a time."""
+
+    # Bump when the layout of stored blocks changes
+    VERSION = 1
+
+    def __init__(self, cache: DiskLRUCache):
+        self.cache = cache
+        # Serializes read-modify-write of blocks shared by concurrent requests
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.cache.enabled
+
+    def _key(self, year: int, scale: int, model: str, col: int, row: int) -> str:
+        return make_cache_key('cells', self.VERSION, year, scale, model, col, row)
+
+    def _blocks(self, region: BaseGeometry, scale: int):
+        tile_size = tile_planner.block_size() * tile_planner.pixel_step(scale)
+        return tile_size, tile_planner.grid_blocks(region, tile_size)
+
+    def lookup(self, region: BaseGeometry, year: int, scale: int, model: str) -> Dict[str, Any]:
+        """
+        Stored pixels inside region, and the part of region ('missing') that no
+        earlier request covered. 'missing' is region itself when nothing is stored.
+        """
+        if not self.enabled or region.is_empty:
+            return {**empty_pixels(), 'missing': region}
+
+        _, (cols, rows, _) = self._blocks(region, scale)
+        coverages, parts = [], []
+        for col, row in zip(cols.tolist(), rows.tolist()):
+            entry = self.cache.get(self._key(year, scale, model, col, row))
+            if entry is None:
+                continue
+            coverages.append(shapely.from_wkb(entry['coverage']))
+            inside = shapely.contains_xy(region, entry['longitude'], entry['latitude'])
+            parts.append({name: entry[name][inside] for name in PIXEL_ARRAYS})
+
+        if not coverages:
+            return {**empty_pixels(), 'missing': region}
+        covered = shapely.union_all(coverages)
+        missing = tile_planner.polygonal(shapely.difference(region, covered))
+        pixels = concat_pixels(parts)
+        logger.info(f"Reusing {len(pixels['latitude'])} classified pixels from {len(coverages)} stored blocks")
+        return {**pixels, 'missing': missing}
+
+    def update(self, region: BaseGeometry, year: int, scale: int, model: str, pixels: Dict[str, np.ndarray]):
+        """Record pixels classified over the whole of region (a complete extraction, no failed tiles)."""
+        if not self.enabled or region.is_empty:
+            return
+
+        tile_size, (cols, rows, boxes) = self._blocks(region, scale)
+        step = tile_planner.pixel_step(scale)
+        # Blocks are aligned to pixel edges, so every pixel centre falls in exactly one block
+        pixel_cols = np.floor(pixels['longitude'] / tile_size).astype(np.int64)
+        pixel_rows = np.floor(pixels['latitude'] / tile_size).astype(np.int64)
+
+        with self._lock:
+            for col, row, box in zip(cols.tolist(), rows.tolist(), boxes):
+                key = self._key(year, scale, model, col, row)
+                in_block = (pixel_cols == col) & (pixel_rows == row)
+                new = {name: pixels[name][in_block] for name in PIXEL_ARRAYS}
+                coverage = tile_planner.polygonal(shapely.intersection(box, region))
+
+                entry = self.cache.get(key)
+                if entry is None and coverage.is_empty:
+                    continue
+                if entry is not None:
+                    old_coverage = shapely.from_wkb(entry['coverage'])
+                    # Pixels sampled again this time replace the stored ones
+                    seen = set(self._cells(new, step))
+                    keep = np.array([cell not in seen for cell in self._cells(entry, step)], dtype=bool)
+                    new = concat_pixels([{name: entry[name][keep] for name in PIXEL_ARRAYS}, new])
+                    coverage = tile_planner.polygonal(shapely.union(old_coverage, coverage))
+
+                self.cache.put(key, {'coverage': shapely.to_wkb(coverage), **new})
+
+    @staticmethod
+    def _cells(pixels: Dict[str, np.ndarray], step: float):
+        """Global (col, row) grid cell of each pixel centre."""
+        cols = np.round(pixels['longitude'] / step - 0.5).astype(np.int64)
+        rows = np.round(pixels['latitude'] / step - 0.5).astype(np.int64)
+        return zip(cols.tolist(), rows.tolist())
@@ -0,0 +1,158 @@
+import logging
+import random
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Substrings of Earth Engine / HTTP errors that mean "slow down"
+THROTTLE_MARKERS = (
+    "too many concurrent",
+    "quota",
+    "rate limit",
+    "429",
+    "resource_exhausted",
+)
+# Substrings of errors that are worth retrying as-is
+TRANSIENT_MARKERS = (
+    "timed out",
+    "timeout",
+    "deadline exceeded",
+    "internal error",
+    "service unavailable",
+    "backend error",
+    "connection",
+)
+# Retryable HTTP status codes, matched as whole numbers ("over 5000 elements" is not a 500)
+TRANSIENT_STATUS = re.compile(r"\b(500|502|503|504)\b")
+
+
+class FetchCancelled(Exception):
+    """Raised by FetchScheduler.call when its cancel event is set before the request starts."""
+
+
+def classify_error(error: Exception) -> Optional[str]:
+    """'throttled', 'transient', or None for errors that will fail the same way again."""
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return "transient"
+    message = str(error).lower()
+    if any(marker in message for marker in THROTTLE_MARKERS):
+        return "throttled"
+    if any(marker in message for marker in TRANSIENT_MARKERS) or TRANSIENT_STATUS.search(message):
+        return "transient"
+    return None
+
+
+class FetchScheduler:
+    """
+    Concurrency limit and retries for imagery requests, shared by all extractions.
+
+    The number of requests in flight adapts AIMD style: it grows by one per
+    window of fast successes, is cut by decrease_factor when the server
+    throttles us, and eases off when latency climbs well above its running
+    baseline. Throttled and transient errors are retried with jittered
+    exponential backoff; anything else is raised straight away.
+    """
+
+    def __init__(self, min_concurrency: int = 1, max_concurrency: int = 16,
+                 initial_concurrency: int = 8, max_retries: int = 4,
+                 backoff_base: float = 1.0, backoff_max: float = 30.0,
+                 decrease_factor: float = 0.5, slow_factor: float = 2.0):
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.decrease_factor = decrease_factor
+        self.slow_factor = slow_factor
+
+        self._limit = float(min(max(initial_concurrency, min_concurrency), max_concurrency))
+        self._in_flight = 0
+        self._baseline: Optional[float] = None  # smoothed latency of healthy requests, seconds
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+        self.stats = {"requests": 0, "retries": 0, "throttled": 0, "failed": 0}
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def acquire(self, cancel_event: Optional[threading.Event] = None):
+        with self._condition:
+            while self._in_flight >= int(self._limit):
+                if cancel_event is not None and cancel_event.is_set():
+                    raise FetchCancelled("Fetch cancelled while waiting for a slot")
+                # Wake up now and then to notice cancellation
+                self._condition.wait(timeout=0.5 if cancel_event is not None else None)
+            self._in_flight += 1
+
+    def release(self, latency: float, throttled: bool = False):
+        """Free a slot and adjust the limit from how the request went."""
+        with self._condition:
+            self._in_flight -= 1
+            now = time.monotonic()
+            if throttled:
+                # One cut per burst: requests already in flight will see the same throttle
+                if now - self._last_decrease > (self._baseline or 1.0):
+                    self._decrease(self.decrease_factor, now)
+            elif self._baseline is not None and latency > self.slow_factor * self._baseline:
+                self._decrease(0.9, now)
+            else:
+                self._limit = min(self.max_concurrency, self._limit + 1 / self._limit)
+            if not throttled:
+                self._baseline = latency if self._baseline is None else 0.9 * self._baseline + 0.1 * latency
+            self._condition.notify_all()
+
+    def _decrease(self, factor: float, now: float):
+        old = int(self._limit)
+        self._limit = max(self.min_concurrency, self._limit * factor)
+        self._last_decrease = now
+        if int(self._limit) != old:
+            logger.info(f"Fetch concurrency {old} -> {int(self._limit)}")
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff delay for a retry attempt (0-based)."""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def call(self, fn: Callable[..., Any], *args,
+             cancel_event: Optional[threading.Event] = None, **kwargs) -> Any:
+        """
+        Run fn under the concurrency limit, retrying throttled and transient failures.
+        If cancel_event is set, no further attempt is started and FetchCancelled is raised.
+        """
+        for attempt in range(self.max_retries + 1):
+            if cancel_event is not None and cancel_event.is_set():
+                raise FetchCancelled("Fetch cancelled")
+            self.acquire(cancel_event)
+            start = time.monotonic()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                kind = classify_error(e)
+                self.release(time.monotonic() - start, throttled=kind == "throttled")
+                with self._condition:
+                    self.stats["requests"] += 1
+                    self.stats["throttled"] += kind == "throttled"
+                if kind is None or attempt == self.max_retries:
+                    with self._condition:
+                        self.stats["failed"] += 1
+                    raise
+                delay = self.backoff(attempt)
+                with self._condition:
+                    self.stats["retries"] += 1
+                logger.warning(f"{kind.capitalize()} error ({e}), retry {attempt + 1}/{self.max_retries} in {delay:.1f}s")
+                if cancel_event is not None:
+                    cancel_event.wait(delay)
+                else:
+                    time.sleep(delay)
+            else:
+                self.release(time.monotonic() - start)
+                with self._condition:
+                    self.stats["requests"] += 1
+                return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._condition:
+            return {"limit": int(self._limit), "in_flight": self._in_flight, **self.stats}
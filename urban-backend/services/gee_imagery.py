@@ -0,0 +1,132 @@
+import logging
+from typing import Any, Dict, List
+
+import ee
+from shapely.geometry import mapping
+from shapely.geometry.base import BaseGeometry
+
+from services.gee_project import initialize_ee
+from services.imagery_service import ImageryBackend
+
+logger = logging.getLogger(__name__)
+
+
+class EarthEngineBackend(ImageryBackend):
+    """Sentinel-1/2 monthly composites computed on Google Earth Engine."""
+
+    name = "earthengine"
+
+    def initialize(self):
+        try:
+            initialize_ee()
+            logger.info("GEE initialized with default credentials")
+        except Exception as e:
+            logger.error(f"Failed to initialize GEE: {e}")
+            raise RuntimeError(f"Failed to initialize GEE: {e}")
+
+    def to_ee_geometry(self, geometry: BaseGeometry) -> ee.Geometry:
+        """Planar lon/lat shapely geometry -> ee.Geometry, with edges matching the local clipping."""
+        return ee.Geometry(mapping(geometry), opt_geodesic=False)
+
+    # Cloud bit masking for sentinel-2
+    def mask_s2_scl(self, image):
+        scl = image.select('SCL')
+        valid_classes = ee.List([4, 5, 6, 7, 11])
+        mask = scl.remap(valid_classes, ee.List.repeat(1, valid_classes.length())).eq(1)
+        return image.updateMask(mask).copyProperties(image, ["system:time_start"])
+
+    def get_sentinel2_collection(self, geometry: ee.Geometry, start_date: str, end_date: str) -> ee.ImageCollection:
+        """Get filtered Sentinel-2 collection."""
+        return (ee.ImageCollection('COPERNICUS/S2_SR_HARMONIZED')
+                .filterBounds(geometry)
+                .filterDate(start_date, end_date)
+                .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
+                .map(self.mask_s2_scl)
+                .select(self.config.SENTINEL_2_BANDS))
+
+    def get_sentinel1_collection(self, geometry: ee.Geometry, start_date: str, end_date: str) -> ee.ImageCollection:
+        """Get filtered Sentinel-1 collection."""
+        return (ee.ImageCollection('COPERNICUS/S1_GRD')
+                .filterBounds(geometry)
+                .filterDate(start_date, end_date)
+                .filter(ee.Filter.listContains('transmitterReceiverPolarisation', 'VV'))
+                .filter(ee.Filter.listContains('transmitterReceiverPolarisation', 'VH'))
+                .filter(ee.Filter.eq('instrumentMode', 'IW'))
+                .select(self.config.SENTINEL_1_BANDS))
+
+    def calculate_indices(self, s2_image: ee.Image, s1_image: ee.Image) -> ee.Image:
+        """Calculate vegetation and water indices."""
+        # NDVI (Normalized Difference Vegetation Index)
+        ndvi = s2_image.normalizedDifference(['B8', 'B4']).rename('NDVI')
+
+        # NDWI (Normalized Difference Water Index)
+        ndwi = s2_image.normalizedDifference(['B3', 'B8']).rename('NDWI')
+
+        ndsi = s2_image.normalizedDifference(['B3', 'B11']).rename('NDSI')
+
+        ndmi = s2_image.normalizedDifference(['B8', 'B11']).rename('NDMI')
+
+        ndbi = s2_image.normalizedDifference(['B11', 'B8']).rename('NDBI')
+
+        # SAVI (Soil Adjusted Vegetation Index)
+        savi = s2_image.expression(
+            '((NIR - RED) / (NIR + RED + 0.5)) * 1.5',
+            {
+                'NIR': s2_image.select('B8'),
+                'RED': s2_image.select('B4')
+            }
+        ).rename('SAVI')
+
+        # MNDWI (Modified Normalized Difference Water Index)
+        mndwi = s2_image.normalizedDifference(['B3', 'B11']).rename('MNDWI')
+
+        return ee.Image.cat([ndvi, ndwi, savi, mndwi, ndsi, ndmi, ndbi])
+
+    # Imagery
+    def annual_composite(self, region: BaseGeometry, year: int, date_ranges: List[tuple]) -> ee.Image:
+        """Process monthly composite data for the entire year."""
+        geometry = self.to_ee_geometry(region)
+        monthly_composites = []
+
+        for i, (start_date, end_date) in enumerate(date_ranges):
+            # Get Sentinel-2 monthly composite
+            s2_collection = self.get_sentinel2_collection(geometry, start_date, end_date)
+            s2_composite = s2_collection.median().clip(geometry)
+
+            # Get Sentinel-1 monthly composite
+            s1_collection = self.get_sentinel1_collection(geometry, start_date, end_date)
+            s1_composite = s1_collection.median().clip(geometry)
+
+            # Calculate indices
+            indices = self.calculate_indices(s2_composite, s1_composite)
+
+            # Combine all bands
+            monthly_composite = ee.Image.cat([
+                s2_composite.select(self.config.SENTINEL_2_BANDS),
+                s1_composite.select(self.config.SENTINEL_1_BANDS),
+                indices
+            ])
+
+            # Add month suffix to band names
+            month_suffix = f"_M{i+1:02d}"
+            band_names = monthly_composite.bandNames()
+            new_band_names = band_names.map(lambda name: ee.String(name).cat(month_suffix))
+            monthly_composite = monthly_composite.rename(new_band_names)
+
+            monthly_composites.append(monthly_composite)
+
+        # Combine all monthly composites
+        return ee.Image.cat(monthly_composites)
+
+    def band_names(self, composite: ee.Image) -> List[str]:
+        return composite.bandNames().getInfo()
+
+    def sample(self, composite: ee.Image, region: BaseGeometry, scale: int) -> List[Dict[str, Any]]:
+        # Get ALL pixels in region
+        samples = composite.addBands(ee.Image.pixelLonLat()).sample(
+            region=self.to_ee_geometry(region),
+            scale=scale,
+            dropNulls=False,
+            geometries=True
+        )
+        return samples.getInfo()['features']
@@ -0,0 +1,16 @@
+"""Earth Engine project setting shared by the API and the batch processors."""
+import os
+
+import ee
+
+
+def gee_project() -> str:
+    """Google Cloud project for Earth Engine requests, from GEE_PROJECT_ID."""
+    project = os.getenv("GEE_PROJECT_ID")
+    if not project:
+        raise RuntimeError("GEE_PROJECT_ID is not set; set it to the Google Cloud project registered for Earth Engine")
+    return project
+
+
+def initialize_ee():
+    ee.Initialize(project=gee_project())
@@ -0,0 +1,73 @@
+import logging
+import os
+from typing import Any, Dict, List
+
+from shapely.geometry.base import BaseGeometry
+
+logger = logging.getLogger(__name__)
+
+# Earth Engine refuses to return more than this many features from one getInfo
+MAX_SAMPLE_ELEMENTS = 5000
+# Metres per degree used by Earth Engine when a scale is applied to EPSG:4326,
+# which is the grid sample() uses for our composites
+METERS_PER_DEGREE = 111319.49079327357
+
+
+class ImageryBackend:
+    """
+    Source of monthly composites for SatelliteDataProcessor.
+
+    Regions are shapely geometries in lon/lat; tile planning happens locally in
+    services.tile_planner, so backends only fetch imagery. sample() returns
+    GeoJSON point features shaped like Earth Engine's FeatureCollection.getInfo()
+    output: one feature per pixel, with a "<band>_M<month>" property per band and month.
+    """
+
+    name = "base"
+
+    def __init__(self, config):
+        self.config = config
+
+    def initialize(self):
+        """Connect to the imagery source. Called once before the first request."""
+
+    def annual_composite(self, geometry: BaseGeometry, year: int, date_ranges: List[tuple]) -> Any:
+        """Handle to the stacked monthly composites for a region and year."""
+        raise NotImplementedError
+
+    def band_names(self, composite: Any) -> List[str]:
+        raise NotImplementedError
+
+    def sample(self, composite: Any, region: BaseGeometry, scale: int) -> List[Dict[str, Any]]:
+        """Every pixel of the composite inside region, at scale metres."""
+        raise NotImplementedError
+
+
+def create_imagery_backend(config) -> ImageryBackend:
+    """
+    Build the backend selected by IMAGERY_BACKEND:
+      earthengine (default) - live Google Earth Engine
+      geotiff               - monthly composite GeoTIFFs under IMAGERY_FIXTURE_DIR
+      replay                - sample responses recorded under IMAGERY_FIXTURE_DIR
+    With IMAGERY_RECORD=1, Earth Engine sample responses are also recorded for replay.
+    """
+    kind = os.getenv("IMAGERY_BACKEND", "earthengine").lower()
+    fixture_dir = os.getenv("IMAGERY_FIXTURE_DIR", "fixtures/imagery")
+
+    if kind == "earthengine":
+        from services.gee_imagery import EarthEngineBackend
+        backend = EarthEngineBackend(config)
+        if os.getenv("IMAGERY_RECORD", "0") == "1":
+            from services.offline_imagery import RecordingBackend
+            backend = RecordingBackend(backend, fixture_dir)
+    elif kind == "geotiff":
+        from services.offline_imagery import GeoTiffBackend
+        backend = GeoTiffBackend(config, fixture_dir)
+    elif kind == "replay":
+        from services.offline_imagery import ReplayBackend
+        backend = ReplayBackend(config, fixture_dir)
+    else:
+        raise ValueError(f"Unknown IMAGERY_BACKEND: {kind}")
+
+    logger.info(f"Using {backend.name} imagery backend")
+    return backend
@@ -0,0 +1,234 @@
+"""
+Runtimes for the land cover model. The Keras model is the reference; ONNX and
+TFLite exports of it (see services.model_export) run on CPU without loading
+full TensorFlow, optionally with float16 or int8 weights.
+
+onnxruntime and tflite-runtime are optional and only imported when selected.
+"""
+import logging
+import os
+import threading
+from typing import Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+ENGINES = ("keras", "onnx", "tflite")
+QUANTIZATIONS = ("none", "float16", "int8")
+EXPORT_EXTENSIONS = {"onnx": ".onnx", "tflite": ".tflite"}
+
+
+def exported_model_path(model_path: str, engine: str, quantization: str = "none") -> str:
+    """Where services.model_export writes the export of a Keras model, e.g. models/LSTM_model_64.int8.onnx."""
+    base, _ = os.path.splitext(model_path)
+    suffix = "" if quantization == "none" else f".{quantization}"
+    return f"{base}{suffix}{EXPORT_EXTENSIONS[engine]}"
+
+
+def engine_model_path(model_path: str, engine: str, quantization: str = "none") -> str:
+    """
+    File an engine loads for a Keras model path: the model itself for keras,
+    otherwise LULC_INFERENCE_MODEL or the export next to it.
+    """
+    if engine == "keras":
+        return model_path
+    path = os.getenv("LULC_INFERENCE_MODEL") or exported_model_path(model_path, engine, quantization)
+    if not os.path.exists(path):
+        raise FileNotFoundError(
+            f"Exported model not found: {path} "
+            f"(create it with python -m services.model_export --engine {engine} --quantization {quantization})"
+        )
+    return path
+
+
+class InferenceEngine:
+    """Maps a float32 (samples, months, bands) batch to class probabilities."""
+
+    name = "base"
+    # Rows per predict call that make full use of the engine, if it has a preference
+    preferred_batch_size: Optional[int] = None
+
+    def __init__(self, model_path: str, quantization: str = "none"):
+        # The model file whose weights produce the predictions, and how they are quantized
+        self.model_path = model_path
+        self.quantization = quantization
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def warm_up(self, input_shape: Tuple[int, ...]):
+        """Run dummy input through the engine so the first real batch doesn't pay setup costs."""
+        self.predict(np.zeros((1, *input_shape), dtype=np.float32))
+
+
+def batch_buckets(value: str) -> Tuple[int, ...]:
+    """Parse a comma-separated list of padded batch sizes, e.g. "64,256,1024"."""
+    return tuple(sorted({int(size) for size in value.split(",") if size.strip()}))
+
+
+class KerasEngine(InferenceEngine):
+    """
+    The Keras model, called through a compiled tf.function by default.
+
+    Model.predict builds a dataset and callbacks on every call and retraces for
+    each new batch shape, ragged last batches included. The compiled path pads
+    every batch up to the nearest of a few fixed bucket sizes instead, so only
+    len(buckets) graphs are ever traced, all of them at warm-up.
+    """
+
+    name = "keras"
+
+    def __init__(self, model_path: str, threads: int = 0, inter_op_threads: int = 0,
+                 compiled: bool = True, buckets: Tuple[int, ...] = (64, 256, 1024)):
+        super().__init__(model_path)
+        import tensorflow as tf
+        from tensorflow.keras.models import load_model
+
+        # Thread pools are fixed once TensorFlow starts executing, so set them before loading
+        if threads:
+            tf.config.threading.set_intra_op_parallelism_threads(threads)
+        if inter_op_threads:
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+        self.model = load_model(model_path)
+
+        # Check for GPU acceleration
+        gpu_devices = tf.config.list_physical_devices('GPU')
+        if gpu_devices:
+            tf.config.experimental.set_memory_growth(gpu_devices[0], True)
+            logger.info("Using GPU acceleration for model inference")
+        else:
+            logger.info("Using CPU for model inference")
+
+        self.compiled = compiled
+        self.buckets = buckets
+        if compiled:
+            self.name = "keras (compiled)"
+            self.preferred_batch_size = buckets[-1]
+            self._forward = tf.function(lambda x: self.model(x, training=False))
+
+    def _bucket(self, rows: int) -> int:
+        return next((size for size in self.buckets if size >= rows), self.buckets[-1])
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        if not self.compiled:
+            return self.model.predict(batch, verbose=0)
+
+        batch = batch.astype(np.float32, copy=False)
+        outputs = []
+        for start in range(0, len(batch), self.buckets[-1]):
+            chunk = batch[start:start + self.buckets[-1]]
+            size = self._bucket(len(chunk))
+            if len(chunk) < size:
+                padded = np.zeros((size, *chunk.shape[1:]), dtype=np.float32)
+                padded[:len(chunk)] = chunk
+                chunk_output = self._forward(padded).numpy()[:len(chunk)]
+            else:
+                chunk_output = self._forward(chunk).numpy()
+            outputs.append(chunk_output)
+        return outputs[0] if len(outputs) == 1 else np.concatenate(outputs)
+
+    def warm_up(self, input_shape: Tuple[int, ...]):
+        if not self.compiled:
+            return super().warm_up(input_shape)
+        # Trace every bucket now rather than on the request that first needs it
+        for size in self.buckets:
+            self.predict(np.zeros((size, *input_shape), dtype=np.float32))
+
+
+class OnnxEngine(InferenceEngine):
+    name = "onnx"
+
+    def __init__(self, model_path: str, threads: int = 0, quantization: str = "none"):
+        super().__init__(model_path, quantization)
+        self.name = f"onnx ({quantization})"
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads  # 0 lets onnxruntime pick
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        # InferenceSession.run is thread-safe
+        return self.session.run(None, {self.input_name: batch.astype(np.float32, copy=False)})[0]
+
+
+class TFLiteEngine(InferenceEngine):
+    name = "tflite"
+
+    def __init__(self, model_path: str, threads: int = 0, quantization: str = "none"):
+        super().__init__(model_path, quantization)
+        self.name = f"tflite ({quantization})"
+        try:
+            from tflite_runtime.interpreter import Interpreter
+        except ImportError:
+            from tensorflow.lite import Interpreter
+
+        self.interpreter = Interpreter(model_path=model_path, num_threads=threads or None)
+        self.interpreter.allocate_tensors()
+        self.input_index = self.interpreter.get_input_details()[0]["index"]
+        self.output_index = self.interpreter.get_output_details()[0]["index"]
+        self._batch_shape = None
+        # An interpreter holds its tensors, so calls must not overlap
+        self._lock = threading.Lock()
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        with self._lock:
+            if batch.shape != self._batch_shape:
+                self.interpreter.resize_tensor_input(self.input_index, batch.shape)
+                self.interpreter.allocate_tensors()
+                self._batch_shape = batch.shape
+            self.interpreter.set_tensor(self.input_index, batch.astype(np.float32, copy=False))
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self.output_index).copy()
+
+
+def create_inference_engine(model_path: str, engine: Optional[str] = None,
+                            quantization: Optional[str] = None, workers: Optional[int] = None,
+                            input_shape: Tuple[int, ...] = (12, 18), n_classes: int = 11) -> InferenceEngine:
+    """
+    Build the engine selected by LULC_INFERENCE_ENGINE (keras, onnx or tflite) for
+    a Keras model path. ONNX and TFLite load the export next to it, picked by
+    LULC_QUANTIZATION (none, float16 or int8), unless LULC_INFERENCE_MODEL
+    points at an exported file. LULC_INFERENCE_THREADS caps CPU threads.
+    Keras runs through a compiled function padded to LULC_KERAS_BATCH_BUCKETS
+    rows unless LULC_KERAS_COMPILED=0; LULC_INFERENCE_INTER_THREADS sets its
+    inter-op thread pool.
+    With LULC_INFERENCE_WORKERS > 0 the engine runs in that many worker
+    processes instead (see services.inference_pool).
+    """
+    engine = (engine or os.getenv("LULC_INFERENCE_ENGINE", "keras")).lower()
+    quantization = (quantization or os.getenv("LULC_QUANTIZATION", "none")).lower()
+    if workers is None:
+        workers = int(os.getenv("LULC_INFERENCE_WORKERS", "0"))
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown LULC_INFERENCE_ENGINE: {engine}")
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown LULC_QUANTIZATION: {quantization}")
+    threads = int(os.getenv("LULC_INFERENCE_THREADS", "0"))
+
+    if workers > 0:
+        from services.inference_pool import ProcessPoolEngine
+        return ProcessPoolEngine(
+            model_path, engine, quantization, workers,
+            input_shape=input_shape, n_classes=n_classes,
+            slot_rows=int(os.getenv("LULC_INFERENCE_SLOT_ROWS", "1000")),
+            threads_per_worker=threads
+        )
+
+    if engine == "keras":
+        if quantization != "none":
+            logger.warning("LULC_QUANTIZATION only applies to the onnx and tflite engines")
+        return KerasEngine(
+            model_path, threads,
+            inter_op_threads=int(os.getenv("LULC_INFERENCE_INTER_THREADS", "0")),
+            compiled=os.getenv("LULC_KERAS_COMPILED", "1") == "1",
+            buckets=batch_buckets(os.getenv("LULC_KERAS_BATCH_BUCKETS", "64,256,1024"))
+        )
+
+    path = engine_model_path(model_path, engine, quantization)
+    logger.info(f"Using {engine} inference engine ({quantization}) from {path}")
+    if engine == "onnx":
+        return OnnxEngine(path, threads, quantization)
+    return TFLiteEngine(path, threads, quantization)
@@ -0,0 +1,156 @@
+"""
+Inference spread over worker processes, each holding its own copy of the model.
+
+Batches travel through preallocated shared-memory slots rather than being
+pickled: the parent copies a chunk into a free slot's input buffer, a worker
+runs the model on it in place and writes probabilities to the slot's output
+buffer, and only the slot number and row count cross the process boundary.
+"""
+import atexit
+import logging
+import multiprocessing
+import os
+import queue
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from services.inference_engine import InferenceEngine, engine_model_path
+
+logger = logging.getLogger(__name__)
+
+# Per-process state of pool workers
+_worker_engine = None
+_worker_buffers: Dict[str, SharedMemory] = {}
+
+
+def _attach(name: str) -> SharedMemory:
+    """Open a parent-owned segment once per worker; the parent unlinks it on close()."""
+    if name not in _worker_buffers:
+        _worker_buffers[name] = SharedMemory(name=name)
+    return _worker_buffers[name]
+
+
+def _init_worker(model_path: str, engine: str, quantization: str, threads: int):
+    global _worker_engine
+    from services.inference_engine import create_inference_engine
+
+    os.environ["LULC_INFERENCE_THREADS"] = str(threads)
+    _worker_engine = create_inference_engine(model_path, engine, quantization, workers=0)
+
+
+def _predict_slot(input_name: str, output_name: str, rows: int, input_shape: Tuple[int, ...],
+                  n_classes: int) -> int:
+    inputs = np.ndarray((rows, *input_shape), dtype=np.float32, buffer=_attach(input_name).buf)
+    outputs = np.ndarray((rows, n_classes), dtype=np.float32, buffer=_attach(output_name).buf)
+    outputs[:] = _worker_engine.predict(inputs)
+    return rows
+
+
+def _warm_up_worker(input_shape: Tuple[int, ...]):
+    _worker_engine.warm_up(input_shape)
+
+
+class ProcessPoolEngine(InferenceEngine):
+    """
+    InferenceEngine that splits each batch into slot_rows chunks and runs them
+    on a pool of worker processes in parallel. Call predict with batches of
+    preferred_batch_size rows (or more) to keep every worker busy.
+    """
+
+    name = "process-pool"
+
+    def __init__(self, model_path: str, engine: str, quantization: str, workers: int,
+                 input_shape: Tuple[int, ...] = (12, 18), n_classes: int = 11,
+                 slot_rows: int = 1000, threads_per_worker: int = 0):
+        # Workers load the Keras model or its export; that file identifies the predictions
+        super().__init__(engine_model_path(model_path, engine, quantization),
+                         quantization if engine != "keras" else "none")
+        self.name = f"{engine} ({quantization}) x{workers} processes"
+        self.workers = workers
+        self.input_shape = tuple(input_shape)
+        self.n_classes = n_classes
+        self.slot_rows = slot_rows
+        self.preferred_batch_size = slot_rows * workers
+        threads = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+
+        # Two slots per worker, so the next chunk can be copied in while one runs
+        self._buffers: List[Tuple[SharedMemory, SharedMemory]] = []
+        self._free: "queue.Queue[int]" = queue.Queue()
+        row_bytes = int(np.prod(self.input_shape)) * 4
+        for slot in range(workers * 2):
+            self._buffers.append((
+                SharedMemory(create=True, size=slot_rows * row_bytes),
+                SharedMemory(create=True, size=slot_rows * n_classes * 4)
+            ))
+            self._free.put(slot)
+        atexit.register(self.close)
+
+        # Spawn, not fork: TensorFlow state does not survive a fork
+        self.pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_path, engine, quantization, threads)
+        )
+        list(self.pool.map(_warm_up_worker, [self.input_shape] * workers))
+        logger.info(f"Started inference pool with {workers} worker processes ({threads} threads each)")
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        output = np.empty((len(batch), self.n_classes), dtype=np.float32)
+        running = []
+        try:
+            for start in range(0, len(batch), self.slot_rows):
+                chunk = batch[start:start + self.slot_rows]
+                slot = self._next_slot(running, output)
+                input_buffer, output_buffer = self._buffers[slot]
+                np.ndarray(chunk.shape, dtype=np.float32, buffer=input_buffer.buf)[:] = chunk
+                future = self.pool.submit(
+                    _predict_slot, input_buffer.name, output_buffer.name, len(chunk),
+                    self.input_shape, self.n_classes
+                )
+                running.append((slot, start, future))
+                # Collect finished chunks early so their slots can be reused
+                while running and running[0][2].done():
+                    self._collect(running.pop(0), output)
+            while running:
+                self._collect(running.pop(0), output)
+        finally:
+            for slot, _, future in running:
+                future.cancel()
+                self._release_when_done(slot, future)
+        return output
+
+    def _next_slot(self, running: list, output: np.ndarray) -> int:
+        """A free slot, waiting on this call's own oldest chunk when all slots are busy."""
+        while running:
+            try:
+                return self._free.get_nowait()
+            except queue.Empty:
+                self._collect(running.pop(0), output)
+        return self._free.get()
+
+    def _collect(self, item: Tuple[int, int, object], output: np.ndarray):
+        slot, start, future = item
+        try:
+            rows = future.result()
+            results = np.ndarray((rows, self.n_classes), dtype=np.float32, buffer=self._buffers[slot][1].buf)
+            output[start:start + rows] = results
+        finally:
+            self._free.put(slot)
+
+    def _release_when_done(self, slot: int, future):
+        # A worker may still be writing to the slot; hand it back only once it has finished
+        future.add_done_callback(lambda _: self._free.put(slot))
+
+    def close(self):
+        if not self._buffers:
+            return
+        self.pool.shutdown(wait=True, cancel_futures=True)
+        for input_buffer, output_buffer in self._buffers:
+            for shm in (input_buffer, output_buffer):
+                shm.close()
+                shm.unlink()
+        self._buffers = []
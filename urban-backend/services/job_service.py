@@ -0,0 +1,244 @@
+import logging
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from cachetools import LRUCache
+
+from services.cache_service import DiskLRUCache, make_cache_key
+
+logger = logging.getLogger(__name__)
+
+# Seconds between a running job publishing its progress to the store and checking for remote cancellation
+SYNC_INTERVAL = 1.0
+
+
+class JobCancelled(Exception):
+    """Raised inside a job's work function once cancellation has been requested."""
+
+
+class Job:
+    """State of one background job, shared between the worker thread and API handlers."""
+
+    def __init__(self, kind: str, sync: Optional[Callable[["Job"], None]] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = "queued"  # queued -> running -> succeeded | failed | cancelled
+        self.progress: Dict[str, Any] = {}
+        self.result: Any = None
+        # Extra outputs kept alongside the result for other endpoints (e.g. tile layers)
+        self.artifacts: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.cancel_event = threading.Event()
+        self.future = None
+        # Set once result and artifacts have been moved to the manager's disk store
+        self.spilled = False
+        # Called at most every SYNC_INTERVAL seconds from update_progress (see JobManager._sync)
+        self._sync = sync
+        self._synced_at = 0.0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Job":
+        """Read-only copy of a job published by another process."""
+        job = cls(data["kind"])
+        job.id = data["job_id"]
+        job.status = data["status"]
+        job.progress = data["progress"]
+        job.error = data["error"]
+        job.created_at = data["created_at"]
+        job.started_at = data["started_at"]
+        job.finished_at = data["finished_at"]
+        job.spilled = data["spilled"]
+        return job
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed", "cancelled")
+
+    def update_progress(self, **progress):
+        """Record progress and stop the job here if it has been cancelled."""
+        with self._lock:
+            self.progress.update(progress)
+        if self._sync is not None and time.time() - self._synced_at >= SYNC_INTERVAL:
+            self._synced_at = time.time()
+            self._sync(self)
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise JobCancelled(f"Job {self.id} cancelled")
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            progress = dict(self.progress)
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": progress,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    Runs blocking work functions on a worker pool, off the event loop.
+
+    Finished jobs are kept for result_ttl seconds (and at most max_finished of
+    them) so clients can fetch results after polling for completion. With a
+    store, a succeeded job's result and artifacts are written to disk and only
+    its metadata stays in memory, apart from the hot_results most recently read
+    ones; results the store has evicted are gone, as if the job had expired.
+
+    Jobs run in the process that created them. With a store shared by several
+    processes (uvicorn workers on one cache directory), each job's status and
+    progress are also published to it, so any process can report on a job,
+    serve its result, or cancel it: the owning process picks the cancellation
+    up at the job's next progress update. Without a store, jobs are only
+    visible to their own process and need a single worker or sticky routing.
+    """
+
+    def __init__(self, max_workers: int = 2, result_ttl: float = 3600, max_finished: int = 50,
+                 store: Optional[DiskLRUCache] = None, hot_results: int = 2):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self.result_ttl = result_ttl
+        self.max_finished = max_finished
+        self.store = store if store is not None and store.enabled else None
+        self._hot: LRUCache = LRUCache(maxsize=max(hot_results, 1))
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, fn: Callable[..., Any], *args, **kwargs) -> Job:
+        """Queue fn(job, *args, **kwargs); its return value becomes the job result."""
+        self._prune()
+        job = Job(kind, sync=self._sync if self.store is not None else None)
+        with self._lock:
+            self._jobs[job.id] = job
+        self._publish(job)
+        job.future = self.executor.submit(self._run, job, fn, args, kwargs)
+        logger.info(f"Queued {kind} job {job.id}")
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        """A job of this process, else a snapshot of one another process published to the store."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is not None or self.store is None:
+            return job
+        data = self.store.get(self._store_key(job_id, "meta"))
+        if data is None:
+            return None
+        job = Job.from_dict(data)
+        if job.finished and time.time() - job.finished_at > self.result_ttl:
+            return None
+        return job
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a queued job outright, or ask a running one to stop at its next progress update."""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+        if job.future is None:
+            # Owned by another process, which checks for this marker
+            self.store.put(self._store_key(job_id, "cancel"), True)
+            logger.info(f"Cancellation requested for job {job_id} in another process")
+            return job
+        job.cancel_event.set()
+        if job.future is not None and job.future.cancel():
+            self._finish(job, "cancelled")
+        logger.info(f"Cancellation requested for job {job_id}")
+        return job
+
+    def outputs(self, job: Job) -> Optional[Dict[str, Any]]:
+        """{'result', 'artifacts'} of a succeeded job, or None if the store no longer has them."""
+        if not job.spilled:
+            return {"result": job.result, "artifacts": job.artifacts}
+        with self._lock:
+            outputs = self._hot.get(job.id)
+        if outputs is None:
+            outputs = self.store.get(self._store_key(job.id, "outputs"))
+            if outputs is not None:
+                with self._lock:
+                    self._hot[job.id] = outputs
+        return outputs
+
+    @staticmethod
+    def _store_key(job_id: str, part: str) -> str:
+        return make_cache_key("job", job_id, part)
+
+    def _publish(self, job: Job):
+        """Write a job's status and progress to the store for other processes."""
+        if self.store is not None:
+            self.store.put(self._store_key(job.id, "meta"), {**job.to_dict(), "spilled": job.spilled})
+
+    def _sync(self, job: Job):
+        """Publish a running job's progress and pick up cancellation requested by another process."""
+        self._publish(job)
+        if self.store.get(self._store_key(job.id, "cancel")) is not None:
+            job.cancel_event.set()
+
+    def _spill(self, job: Job):
+        """Move a succeeded job's result and artifacts to the store."""
+        if self.store is None:
+            return
+        self.store.put(self._store_key(job.id, "outputs"), {"result": job.result, "artifacts": job.artifacts})
+        job.result = None
+        job.artifacts = {}
+        job.spilled = True
+
+    def _run(self, job: Job, fn: Callable[..., Any], args: tuple, kwargs: dict):
+        if self.store is not None:
+            self._sync(job)
+        if job.cancel_event.is_set():
+            self._finish(job, "cancelled")
+            return
+        job.status = "running"
+        job.started_at = time.time()
+        self._publish(job)
+        try:
+            job.result = fn(job, *args, **kwargs)
+            self._spill(job)
+            self._finish(job, "succeeded")
+        except JobCancelled:
+            self._finish(job, "cancelled")
+        except Exception as e:
+            # A cancelled job may surface as whatever error its work function wraps it in
+            if job.cancel_event.is_set():
+                self._finish(job, "cancelled")
+                return
+            logger.error(f"Job {job.id} failed: {str(e)}")
+            logger.error(traceback.format_exc())
+            job.error = str(e)
+            self._finish(job, "failed")
+
+    def _finish(self, job: Job, status: str):
+        job.status = status
+        job.finished_at = time.time()
+        self._publish(job)
+        logger.info(f"Job {job.id} {status}")
+
+    def _prune(self):
+        """Forget expired finished jobs, and the oldest ones beyond max_finished."""
+        now = time.time()
+        with self._lock:
+            finished = sorted(
+                (job for job in self._jobs.values() if job.finished),
+                key=lambda job: job.finished_at
+            )
+            for i, job in enumerate(finished):
+                if now - job.finished_at > self.result_ttl or i < len(finished) - self.max_finished:
+                    del self._jobs[job.id]
+                    self._hot.pop(job.id, None)
+                    if self.store is not None:
+                        for part in ("meta", "cancel", "outputs"):
+                            self.store.delete(self._store_key(job.id, part))
@@ -0,0 +1,90 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Merges predict calls from concurrent requests into shared model batches.
+
+    Callers block in predict() while a single worker thread gathers queued
+    inputs until max_batch_size rows are pending or max_wait seconds have
+    passed since the first one arrived, runs them through predict_fn in one
+    call and hands each caller its slice of the output. A full batch is run
+    straight away, so a lone large request only waits on its last, partial batch.
+    """
+
+    def __init__(self, predict_fn: Callable[[np.ndarray], np.ndarray],
+                 max_batch_size: int = 1000, max_wait: float = 0.005):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.stats = {"calls": 0, "batches": 0, "rows": 0}
+        self._queue: "queue.Queue[Tuple[np.ndarray, Future]]" = queue.Queue()
+        self._carry = None  # request that didn't fit in the previous batch
+        self._stats_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        future = Future()
+        self._queue.put((batch, future))
+        return future.result()
+
+    def _gather(self) -> List[Tuple[np.ndarray, Future]]:
+        """Block for the next request, then collect more until the batch is full or max_wait runs out."""
+        if self._carry is not None:
+            first, self._carry = self._carry, None
+        else:
+            first = self._queue.get()
+        items = [first]
+        rows = len(first[0])
+        deadline = time.monotonic() + self.max_wait
+        while rows < self.max_batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if rows + len(item[0]) > self.max_batch_size:
+                self._carry = item
+                break
+            items.append(item)
+            rows += len(item[0])
+        return items
+
+    def _run(self):
+        while True:
+            items = self._gather()
+            batches = [batch for batch, _ in items]
+            try:
+                merged = batches[0] if len(batches) == 1 else np.concatenate(batches)
+                output = self.predict_fn(merged)
+            except Exception as e:
+                for _, future in items:
+                    future.set_exception(e)
+                continue
+
+            offsets = np.cumsum([len(batch) for batch in batches])[:-1]
+            for (_, future), result in zip(items, np.split(output, offsets)):
+                future.set_result(result)
+            with self._stats_lock:
+                self.stats["calls"] += len(items)
+                self.stats["batches"] += 1
+                self.stats["rows"] += len(merged)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats["mean_batch_rows"] = stats["rows"] / stats["batches"] if stats["batches"] else 0.0
+        stats["mean_requests_per_batch"] = stats["calls"] / stats["batches"] if stats["batches"] else 0.0
+        return stats
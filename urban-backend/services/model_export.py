@@ -0,0 +1,89 @@
+"""
+Export the Keras land cover model for the ONNX and TFLite inference engines.
+
+Run from urban-backend/:
+    python -m services.model_export --engine onnx --quantization int8
+    python -m services.model_export --engine tflite --quantization float16
+
+Needs tensorflow, plus tf2onnx (and onnxconverter-common for float16) for ONNX.
+int8 quantizes weights only (dynamic range); activations stay float, which keeps
+the LSTM within parity of the Keras model without a calibration set. Check the
+export with benchmarks/bench_inference.py before switching engines.
+"""
+import argparse
+import logging
+import os
+import tempfile
+
+from services.inference_engine import ENGINES, QUANTIZATIONS, exported_model_path
+
+logger = logging.getLogger(__name__)
+
+
+def export_onnx(model, output_path: str, quantization: str = "none", opset: int = 13):
+    import onnx
+    import tensorflow as tf
+    import tf2onnx
+
+    signature = (tf.TensorSpec((None, *model.input_shape[1:]), tf.float32, name="input"),)
+    onnx_model, _ = tf2onnx.convert.from_keras(model, input_signature=signature, opset=opset)
+
+    if quantization == "float16":
+        from onnxconverter_common import float16
+        # Keep float32 inputs/outputs so callers don't change
+        onnx_model = float16.convert_float_to_float16(onnx_model, keep_io_types=True)
+    elif quantization == "int8":
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        with tempfile.TemporaryDirectory() as tmp:
+            float_path = os.path.join(tmp, "model.onnx")
+            onnx.save(onnx_model, float_path)
+            quantize_dynamic(float_path, output_path, weight_type=QuantType.QInt8)
+        return
+    onnx.save(onnx_model, output_path)
+
+
+def export_tflite(model, output_path: str, quantization: str = "none"):
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if quantization != "none":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == "float16":
+        converter.target_spec.supported_types = [tf.float16]
+    with open(output_path, "wb") as f:
+        f.write(converter.convert())
+
+
+def export_model(model_path: str, engine: str, quantization: str = "none",
+                 output_path: str = None) -> str:
+    """Export a Keras model for an inference engine and return the exported file's path."""
+    from tensorflow.keras.models import load_model
+
+    output_path = output_path or exported_model_path(model_path, engine, quantization)
+    model = load_model(model_path)
+    if engine == "onnx":
+        export_onnx(model, output_path, quantization)
+    elif engine == "tflite":
+        export_tflite(model, output_path, quantization)
+    else:
+        raise ValueError(f"Nothing to export for engine: {engine}")
+
+    size_mb = os.path.getsize(output_path) / 1024 ** 2
+    logger.info(f"Exported {model_path} -> {output_path} ({size_mb:.2f} MB)")
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", default=os.getenv("MODEL_PATH", "models/LSTM_model_64.keras"))
+    parser.add_argument("--engine", choices=[e for e in ENGINES if e != "keras"], required=True)
+    parser.add_argument("--quantization", choices=QUANTIZATIONS, default="none")
+    parser.add_argument("--output", help="defaults to the path the inference engine looks for")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    export_model(args.model, args.engine, args.quantization, args.output)
+
+
+if __name__ == "__main__":
+    main()
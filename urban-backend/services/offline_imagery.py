@@ -0,0 +1,219 @@
+"""
+Imagery backends that work without a live Earth Engine connection, so the
+extraction and classification hot path can be benchmarked and load-tested offline.
+"""
+import glob
+import gzip
+import json
+import logging
+import os
+import threading
+import uuid
+from typing import Any, Dict, List
+
+import numpy as np
+import shapely
+
+from services.imagery_service import MAX_SAMPLE_ELEMENTS, METERS_PER_DEGREE, ImageryBackend
+
+logger = logging.getLogger(__name__)
+
+
+def check_element_limit(count: int):
+    """Fail the way Earth Engine does, so tile splitting behaves the same offline."""
+    if count > MAX_SAMPLE_ELEMENTS:
+        raise RuntimeError(
+            f"Collection query aborted after accumulating over {MAX_SAMPLE_ELEMENTS} elements."
+        )
+
+
+def pixel_feature(lon: float, lat: float, properties: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "type": "Feature",
+        "geometry": {"type": "Point", "coordinates": [lon, lat]},
+        "properties": properties,
+    }
+
+
+class GeoTiffBackend(ImageryBackend):
+    """
+    Monthly composites read from GeoTIFFs laid out as <root>/<year>/M01.tif .. M12.tif.
+
+    Each file holds one month's composite in EPSG:4326 with band descriptions
+    set to the band names ('B4', 'NDVI', 'VV', ...). All months must share one
+    pixel grid, and pixels are sampled on that native grid, so export the
+    fixtures at the scale you intend to request.
+    """
+
+    name = "geotiff"
+
+    def __init__(self, config, root: str):
+        super().__init__(config)
+        self.root = root
+
+    def annual_composite(self, geometry, year: int, date_ranges: List[tuple]) -> Dict[str, Any]:
+        files = {}
+        for month in range(1, len(date_ranges) + 1):
+            path = os.path.join(self.root, str(year), f"M{month:02d}.tif")
+            if os.path.exists(path):
+                files[month] = path
+        if not files:
+            raise FileNotFoundError(f"No GeoTIFF composites for {year} under {self.root}")
+        return {"year": year, "files": files}
+
+    def _band_descriptions(self, src) -> List[str]:
+        return [desc or f"band_{i + 1}" for i, desc in enumerate(src.descriptions)]
+
+    def band_names(self, composite: Dict[str, Any]) -> List[str]:
+        import rasterio
+
+        names = []
+        for month, path in sorted(composite["files"].items()):
+            with rasterio.open(path) as src:
+                names.extend(f"{band}_M{month:02d}" for band in self._band_descriptions(src))
+        return names
+
+    def sample(self, composite: Dict[str, Any], region, scale: int) -> List[Dict[str, Any]]:
+        import rasterio
+        from rasterio.windows import Window
+
+        min_lon, min_lat, max_lon, max_lat = region.bounds
+        grid = None
+        properties = None
+
+        for month, path in sorted(composite["files"].items()):
+            with rasterio.open(path) as src:
+                transform = src.transform
+                if grid is None:
+                    res_m = abs(transform.a) * METERS_PER_DEGREE
+                    if abs(res_m - scale) > 0.01 * scale:
+                        logger.warning(f"{path} has ~{res_m:.1f} m pixels but {scale} m was requested")
+
+                    # Pixel window covering the region's bounds, clamped to the raster
+                    col_min = max(0, int(np.floor((min_lon - transform.c) / transform.a)))
+                    col_max = min(src.width, int(np.ceil((max_lon - transform.c) / transform.a)))
+                    row_min = max(0, int(np.floor((max_lat - transform.f) / transform.e)))
+                    row_max = min(src.height, int(np.ceil((min_lat - transform.f) / transform.e)))
+                    window = Window(col_min, row_min, max(0, col_max - col_min), max(0, row_max - row_min))
+
+                    cols = col_min + np.arange(window.width) + 0.5
+                    rows = row_min + np.arange(window.height) + 0.5
+                    lon_grid, lat_grid = np.meshgrid(
+                        transform.c + cols * transform.a,
+                        transform.f + rows * transform.e
+                    )
+                    inside = shapely.contains_xy(region, lon_grid, lat_grid)
+                    check_element_limit(int(inside.sum()))
+                    grid = (transform, window, lon_grid[inside], lat_grid[inside], inside)
+                    properties = [dict() for _ in range(len(grid[2]))]
+                elif transform != grid[0]:
+                    raise ValueError(f"{path} is not on the same pixel grid as the other months")
+
+                _, window, _, _, inside = grid
+                data = src.read(window=window, masked=True)
+                for band, values in zip(self._band_descriptions(src), data):
+                    name = f"{band}_M{month:02d}"
+                    selected = values[inside]
+                    for props, value, masked in zip(properties, selected.data.tolist(),
+                                                    np.ma.getmaskarray(selected).tolist()):
+                        props[name] = None if masked else value
+
+        _, _, lons, lats, _ = grid
+        return [
+            pixel_feature(lon, lat, props)
+            for lon, lat, props in zip(lons.tolist(), lats.tolist(), properties)
+        ]
+
+
+class ReplayBackend(ImageryBackend):
+    """
+    Serves pixels previously captured by RecordingBackend.
+
+    Recordings are indexed as points per (year, scale), so any region (and any
+    tiling of it) inside the recorded area can be replayed, not only the exact
+    tiles that were fetched.
+    """
+
+    name = "replay"
+
+    def __init__(self, config, root: str):
+        super().__init__(config)
+        self.root = os.path.join(root, "recorded")
+        self._indexes: Dict[tuple, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def annual_composite(self, geometry, year: int, date_ranges: List[tuple]) -> Dict[str, Any]:
+        if not glob.glob(os.path.join(self.root, f"{year}_*")):
+            raise FileNotFoundError(f"No recorded imagery for {year} under {self.root}")
+        return {"year": year}
+
+    def band_names(self, composite: Dict[str, Any]) -> List[str]:
+        names = set()
+        for path in glob.glob(os.path.join(self.root, f"{composite['year']}_*", "band_names.json")):
+            with open(path) as f:
+                names.update(json.load(f))
+        return sorted(names)
+
+    def _index(self, year: int, scale: int) -> Dict[str, Any]:
+        """Load every recording for (year, scale) into point arrays, once."""
+        with self._lock:
+            key = (year, scale)
+            if key not in self._indexes:
+                by_position = {}
+                for path in glob.glob(os.path.join(self.root, f"{year}_{scale}", "*.json.gz")):
+                    with gzip.open(path, "rt") as f:
+                        for feature in json.load(f)["features"]:
+                            lon, lat = feature["geometry"]["coordinates"]
+                            # Overlapping recordings hold the same pixel more than once
+                            by_position[(round(lon, 9), round(lat, 9))] = feature
+                features = list(by_position.values())
+                coords = np.array(
+                    [feature["geometry"]["coordinates"] for feature in features], dtype=np.float64
+                ).reshape(-1, 2)
+                self._indexes[key] = {"features": features, "lon": coords[:, 0], "lat": coords[:, 1]}
+                logger.info(f"Loaded {len(features)} recorded pixels for {year} at {scale} m")
+            return self._indexes[key]
+
+    def sample(self, composite: Dict[str, Any], region, scale: int) -> List[Dict[str, Any]]:
+        index = self._index(composite["year"], scale)
+        min_lon, min_lat, max_lon, max_lat = region.bounds
+        candidates = np.flatnonzero(
+            (index["lon"] >= min_lon) & (index["lon"] <= max_lon)
+            & (index["lat"] >= min_lat) & (index["lat"] <= max_lat)
+        )
+        inside = candidates[shapely.contains_xy(region, index["lon"][candidates], index["lat"][candidates])]
+        check_element_limit(len(inside))
+        return [index["features"][i] for i in inside]
+
+
+class RecordingBackend(ImageryBackend):
+    """Wraps a live backend and records every sample() response for ReplayBackend."""
+
+    def __init__(self, inner: ImageryBackend, root: str):
+        super().__init__(inner.config)
+        self.inner = inner
+        self.root = os.path.join(root, "recorded")
+        self.name = f"{inner.name} (recording)"
+
+    def initialize(self):
+        self.inner.initialize()
+
+    def annual_composite(self, geometry, year: int, date_ranges: List[tuple]) -> Dict[str, Any]:
+        return {"year": year, "inner": self.inner.annual_composite(geometry, year, date_ranges)}
+
+    def band_names(self, composite: Dict[str, Any]) -> List[str]:
+        names = self.inner.band_names(composite["inner"])
+        composite["band_names"] = names
+        return names
+
+    def sample(self, composite: Dict[str, Any], region, scale: int) -> List[Dict[str, Any]]:
+        features = self.inner.sample(composite["inner"], region, scale)
+
+        directory = os.path.join(self.root, f"{composite['year']}_{scale}")
+        os.makedirs(directory, exist_ok=True)
+        if "band_names" in composite:
+            with open(os.path.join(directory, "band_names.json"), "w") as f:
+                json.dump(composite["band_names"], f)
+        with gzip.open(os.path.join(directory, f"{uuid.uuid4().hex}.json.gz"), "wt") as f:
+            json.dump({"features": features}, f)
+        return features
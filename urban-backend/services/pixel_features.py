@@ -0,0 +1,96 @@
+import logging
+from functools import lru_cache
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+MONTHS_PER_YEAR = 12
+
+
+def month_index(date: str) -> int:
+    """Zero-based month index of a "YYYY-MM[-DD]" string (e.g. "2023-03-15" -> 2)."""
+    return int(date.split("-")[1]) - 1
+
+
+def preprocess_pixel(pixel: Dict, band_order: Sequence[str]) -> np.ndarray:
+    """Convert one pixel dict with "monthly_data" to model input format (12 months × bands)"""
+    # Initialize array with zeros (handles missing data)
+    features = np.zeros((MONTHS_PER_YEAR, len(band_order)), dtype=np.float32)
+
+    for monthly_data in pixel["monthly_data"]:
+        try:
+            month_idx = month_index(monthly_data["month"])
+            if 0 <= month_idx < MONTHS_PER_YEAR:
+                for band_idx, band in enumerate(band_order):
+                    # Get value if available, else keep 0
+                    value = monthly_data["features"].get(band)
+                    if value is not None:
+                        features[month_idx, band_idx] = float(value)
+        except Exception as e:
+            logger.warning(f"Error processing monthly data: {str(e)}")
+
+    # Return 2D array (12, bands) - DO NOT FLATTEN
+    return features
+
+
+@lru_cache(maxsize=32)
+def _column_mapping(feature_bands: Tuple[str, ...], month_dates: Optional[Tuple[str, ...]],
+                    band_order: Tuple[str, ...]) -> tuple:
+    """
+    Source/target month and band indices for copying a stack into model layout.
+    Depends only on the stack's labels, so it is computed once per layout.
+    """
+    source_bands = {band: i for i, band in enumerate(feature_bands)}
+    dst_bands = [i for i, band in enumerate(band_order) if band in source_bands]
+    src_bands = [source_bands[band_order[i]] for i in dst_bands]
+
+    if month_dates is None:
+        # Months axis is already January..December
+        src_months = list(range(MONTHS_PER_YEAR))
+        dst_months = list(src_months)
+    else:
+        src_months, dst_months = [], []
+        for i, date in enumerate(month_dates):
+            month_idx = month_index(date)
+            if 0 <= month_idx < MONTHS_PER_YEAR:
+                src_months.append(i)
+                dst_months.append(month_idx)
+
+    identity = (
+        tuple(band_order) == tuple(feature_bands)
+        and src_months == dst_months == list(range(MONTHS_PER_YEAR))
+    )
+    return (
+        identity,
+        np.array(src_months, dtype=np.intp), np.array(dst_months, dtype=np.intp),
+        np.array(src_bands, dtype=np.intp), np.array(dst_bands, dtype=np.intp),
+    )
+
+
+def assemble_batch(features: np.ndarray, feature_bands: Sequence[str], band_order: Sequence[str],
+                   month_dates: Optional[Sequence[str]] = None,
+                   start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+    """
+    Build the model input tensor (pixels, 12, bands) for rows [start:stop] of a
+    columnar (pixels, months, bands) stack.
+
+    Bands are reordered to band_order and months placed by their date, with
+    NaN, missing months and missing bands zero-filled exactly as preprocess_pixel does.
+    """
+    rows = features[start:stop]
+    identity, src_months, dst_months, src_bands, dst_bands = _column_mapping(
+        tuple(feature_bands),
+        tuple(month_dates) if month_dates is not None else None,
+        tuple(band_order)
+    )
+
+    if identity:
+        X = np.array(rows, dtype=np.float32)
+    else:
+        X = np.zeros((len(rows), MONTHS_PER_YEAR, len(band_order)), dtype=np.float32)
+        X[:, dst_months[:, None], dst_bands] = rows[:, src_months[:, None], src_bands]
+
+    np.copyto(X, 0.0, where=np.isnan(X))
+    return X
@@ -0,0 +1,101 @@
+"""
+Gridded encoding of per-pixel classification results.
+
+Sampled pixel centres sit on the global EPSG:4326 grid Earth Engine samples
+on (see services.tile_planner.pixel_step), so they map back onto a raster
+exactly: one uint8 class id per cell plus a confidence grid, a GDAL-style
+geotransform and a class lookup table. That is a few bytes per pixel instead
+of a JSON object per pixel.
+"""
+import base64
+import zlib
+from typing import Any, Dict
+
+import numpy as np
+
+# Cells with no sampled pixel (outside the polygon or in a failed tile)
+NODATA = 255
+# uint8 confidences are stored as round(confidence * CONFIDENCE_SCALE)
+CONFIDENCE_SCALE = 254
+
+
+def rasterize(latitude: np.ndarray, longitude: np.ndarray, class_ids: np.ndarray,
+              confidences: np.ndarray, step: float, confidence_dtype: str = "uint8") -> Dict[str, Any]:
+    """Place pixel results on the sample grid; returns the class/confidence grids and geotransform."""
+    cols = np.round(longitude / step - 0.5).astype(np.int64)
+    rows = np.round(latitude / step - 0.5).astype(np.int64)
+    col_min, row_max = cols.min(), rows.max()
+    width = int(cols.max() - col_min + 1)
+    height = int(row_max - rows.min() + 1)
+    # North-up: raster row 0 is the northernmost grid row
+    x = cols - col_min
+    y = row_max - rows
+
+    classes = np.full((height, width), NODATA, dtype=np.uint8)
+    classes[y, x] = class_ids
+    if confidence_dtype == "float16":
+        confidence = np.full((height, width), np.nan, dtype=np.float16)
+        confidence[y, x] = confidences
+    else:
+        confidence = np.full((height, width), NODATA, dtype=np.uint8)
+        confidence[y, x] = np.round(np.clip(confidences, 0, 1) * CONFIDENCE_SCALE)
+
+    return {
+        "width": width,
+        "height": height,
+        # (west, pixel width, 0, north, 0, -pixel height), as in GDAL
+        "geotransform": [float(col_min * step), step, 0.0, float((row_max + 1) * step), 0.0, -step],
+        "crs": "EPSG:4326",
+        "classes": classes,
+        "confidence": confidence,
+    }
+
+
+def encode_array(array: np.ndarray) -> str:
+    """Row-major bytes of an array, zlib-compressed and base64-encoded."""
+    return base64.b64encode(zlib.compress(np.ascontiguousarray(array).tobytes(), 6)).decode("ascii")
+
+
+def raster_payload(raster: Dict[str, Any], class_names: Dict[int, str]) -> Dict[str, Any]:
+    """JSON-serializable form of a rasterize() result."""
+    confidence = raster["confidence"]
+    return {
+        "width": raster["width"],
+        "height": raster["height"],
+        "geotransform": raster["geotransform"],
+        "crs": raster["crs"],
+        "encoding": "zlib+base64",
+        "classes": {"dtype": "uint8", "nodata": NODATA, "data": encode_array(raster["classes"])},
+        "confidence": {
+            "dtype": str(confidence.dtype),
+            "nodata": NODATA if confidence.dtype == np.uint8 else None,
+            "scale": 1 / CONFIDENCE_SCALE if confidence.dtype == np.uint8 else 1.0,
+            "data": encode_array(confidence),
+        },
+        "class_lut": {str(class_id): name for class_id, name in class_names.items()},
+    }
+
+
+def to_geotiff(raster: Dict[str, Any], class_names: Dict[int, str]) -> bytes:
+    """Two-band (class id, uint8 confidence) deflate-compressed GeoTIFF."""
+    from affine import Affine
+    from rasterio.io import MemoryFile
+
+    confidence = raster["confidence"]
+    if confidence.dtype != np.uint8:
+        scaled = np.round(np.nan_to_num(confidence.astype(np.float32), nan=-1) * CONFIDENCE_SCALE)
+        confidence = np.where(scaled < 0, NODATA, scaled).astype(np.uint8)
+
+    with MemoryFile() as memfile:
+        with memfile.open(
+            driver="GTiff", width=raster["width"], height=raster["height"], count=2,
+            dtype="uint8", crs=raster["crs"], transform=Affine.from_gdal(*raster["geotransform"]),
+            nodata=NODATA, compress="deflate"
+        ) as dst:
+            dst.write(raster["classes"], 1)
+            dst.write(confidence, 2)
+            dst.set_band_description(1, "class_id")
+            dst.set_band_description(2, "confidence")
+            dst.update_tags(confidence_scale=str(1 / CONFIDENCE_SCALE),
+                            **{f"class_{class_id}": name for class_id, name in class_names.items()})
+        return memfile.read()
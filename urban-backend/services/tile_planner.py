@@ -0,0 +1,173 @@
+import logging
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+import shapely
+from pyproj import Transformer
+from shapely.geometry import MultiPolygon, Polygon
+from shapely.geometry.base import BaseGeometry
+
+from services.imagery_service import MAX_SAMPLE_ELEMENTS, METERS_PER_DEGREE
+
+logger = logging.getLogger(__name__)
+
+# Fill tiles to this fraction of the element limit, leaving room for pixels
+# whose centres sit exactly on the polygon edge
+TILE_FILL = 0.95
+
+
+def polygon_from_coordinates(coordinates: Sequence[Sequence[float]]) -> BaseGeometry:
+    """Polygon from a (lon, lat) ring, repairing self-intersections from hand-drawn shapes."""
+    geometry = Polygon(coordinates)
+    if not geometry.is_valid:
+        geometry = polygonal(shapely.make_valid(geometry))
+    return geometry
+
+
+def polygonal(geometry: BaseGeometry) -> BaseGeometry:
+    """Drop the points and lines that clipping leaves where shapes only touch."""
+    if isinstance(geometry, (Polygon, MultiPolygon)) or geometry.is_empty:
+        return geometry
+    parts = [part for part in getattr(geometry, "geoms", []) if isinstance(part, (Polygon, MultiPolygon))]
+    polygons = []
+    for part in parts:
+        polygons.extend(part.geoms if isinstance(part, MultiPolygon) else [part])
+    return MultiPolygon(polygons) if polygons else Polygon()
+
+
+def equal_area_transformer(geometry: BaseGeometry) -> Transformer:
+    """WGS84 -> Lambert azimuthal equal-area projection centred on the geometry."""
+    centroid = geometry.centroid
+    return Transformer.from_crs(
+        "EPSG:4326",
+        f"+proj=laea +lat_0={centroid.y} +lon_0={centroid.x} +datum=WGS84 +units=m",
+        always_xy=True
+    )
+
+
+def areas_m2(geometries, transformer: Transformer) -> np.ndarray:
+    """Areas in square metres of an array of lon/lat geometries."""
+    def project(coords):
+        x, y = transformer.transform(coords[:, 0], coords[:, 1])
+        return np.column_stack([x, y])
+    return shapely.area(shapely.transform(np.asarray(geometries, dtype=object), project))
+
+
+def pixel_step(scale: int) -> float:
+    """Pixel size in degrees of the EPSG:4326 grid Earth Engine samples at scale metres."""
+    return scale / METERS_PER_DEGREE
+
+
+def count_pixels(geometry: BaseGeometry, step: float) -> int:
+    """Exact number of sample-grid pixel centres inside a geometry."""
+    if geometry.is_empty:
+        return 0
+    min_lon, min_lat, max_lon, max_lat = geometry.bounds
+    cols = np.arange(np.ceil(min_lon / step - 0.5), np.floor(max_lon / step - 0.5) + 1)
+    rows = np.arange(np.ceil(min_lat / step - 0.5), np.floor(max_lat / step - 0.5) + 1)
+    if not len(cols) or not len(rows):
+        return 0
+    lon, lat = np.meshgrid((cols + 0.5) * step, (rows + 0.5) * step)
+    return int(shapely.contains_xy(geometry, lon, lat).sum())
+
+
+def block_size(max_elements: int = MAX_SAMPLE_ELEMENTS) -> int:
+    """Pixels along the edge of a grid block, sized so a full block fits one sample request."""
+    return int(np.sqrt(int(max_elements * TILE_FILL)))
+
+
+def grid_blocks(region: BaseGeometry, tile_size: float):
+    """(cols, rows, boxes) of the global grid blocks of tile_size degrees that intersect a region."""
+    min_lon, min_lat, max_lon, max_lat = region.bounds
+    cols, rows = np.meshgrid(
+        np.arange(np.floor(min_lon / tile_size), np.floor(max_lon / tile_size) + 1, dtype=np.int64),
+        np.arange(np.floor(min_lat / tile_size), np.floor(max_lat / tile_size) + 1, dtype=np.int64)
+    )
+    cols, rows = cols.ravel(), rows.ravel()
+    blocks = shapely.box(cols * tile_size, rows * tile_size, (cols + 1) * tile_size, (rows + 1) * tile_size)
+    hit = shapely.intersects(region, blocks)
+    return cols[hit], rows[hit], blocks[hit]
+
+
+def plan_tiles(region: BaseGeometry, scale: int, max_elements: int = MAX_SAMPLE_ELEMENTS) -> Dict[str, Any]:
+    """
+    Cover a lon/lat region with the fewest sample requests that stay under the element limit.
+
+    Tiles are square blocks of the sample pixel grid, sized so a full block fits
+    the limit and aligned to the global grid (so pixels never straddle tiles).
+    Pixel counts are exact centre counts, not area estimates. Partial blocks
+    along the polygon edge are packed together, row by row, up to the limit;
+    blocks with no pixel centres are never requested.
+    """
+    shapely.prepare(region)
+    transformer = equal_area_transformer(region)
+    area = float(areas_m2([region], transformer)[0])
+
+    step = pixel_step(scale)
+    budget = int(max_elements * TILE_FILL)
+    side = block_size(max_elements)  # pixels per tile edge
+    tile_size = side * step
+
+    cols, rows, blocks = grid_blocks(region, tile_size)
+    full = shapely.contains(region, blocks)
+    pieces = np.where(full, blocks, shapely.intersection(blocks, region))
+    counts = [side * side if is_full else count_pixels(piece, step) for piece, is_full in zip(pieces, full)]
+
+    # Greedily pack each row's blocks into requests of at most `budget` pixels
+    tiles = []
+    group = []
+
+    def flush():
+        if not group:
+            return
+        first, last, row = group[0][0], group[-1][0], group[0][1]
+        pieces_in_group = [piece for _, _, piece, _ in group]
+        tiles.append({
+            'geometry': pieces_in_group[0] if len(group) == 1 else polygonal(shapely.union_all(pieces_in_group)),
+            'id': f"tile_{first}_{row}" if first == last else f"tile_{first}-{last}_{row}",
+            'blocks': [(col, row) for col, row, _, _ in group],
+            'expected_pixels': sum(count for _, _, _, count in group)
+        })
+        group.clear()
+
+    blocks_by_row = sorted(zip(cols.tolist(), rows.tolist(), pieces, counts), key=lambda block: (block[1], block[0]))
+    for col, row, piece, count in blocks_by_row:
+        if not count:
+            continue
+        if group and (group[0][1] != row or sum(c for _, _, _, c in group) + count > budget):
+            flush()
+        group.append((col, row, polygonal(piece), count))
+    flush()
+
+    total = sum(tile['expected_pixels'] for tile in tiles)
+    logger.info(f"Planned {len(tiles)} requests for {total} pixels ({area / 1e6:.2f} km², {side}x{side} pixel blocks)")
+    return {'area': area, 'tiles': tiles, 'step': step, 'tile_size': tile_size}
+
+
+def split_tile(tile: Dict[str, Any], scale: int) -> List[Dict[str, Any]]:
+    """Quarter a tile's bounding box and clip the quarters back to the tile."""
+    step = pixel_step(scale)
+    geometry = tile['geometry']
+    min_lon, min_lat, max_lon, max_lat = geometry.bounds
+    # Split on pixel edges so no pixel lands in two quarters
+    mid_lon = np.round((min_lon + max_lon) / 2 / step) * step
+    mid_lat = np.round((min_lat + max_lat) / 2 / step) * step
+
+    quarters = [
+        [min_lon, min_lat, mid_lon, mid_lat],
+        [min_lon, mid_lat, mid_lon, max_lat],
+        [mid_lon, min_lat, max_lon, mid_lat],
+        [mid_lon, mid_lat, max_lon, max_lat]
+    ]
+    subtiles = []
+    for k, bounds in enumerate(quarters):
+        piece = polygonal(shapely.intersection(shapely.box(*bounds), geometry))
+        count = count_pixels(piece, step)
+        if count:
+            subtiles.append({
+                'geometry': piece,
+                'id': f"{tile['id']}_sub{k+1}",
+                'blocks': tile.get('blocks', []),
+                'expected_pixels': count
+            })
+    return subtiles
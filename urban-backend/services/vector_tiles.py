@@ -0,0 +1,159 @@
+"""
+Mapbox Vector Tiles (web mercator z/x/y) for UC polygon layers and classified pixels.
+
+Layers are built once from lon/lat data and then queried per tile, so a map
+only downloads what is visible at its zoom instead of whole GeoJSON files or
+one JSON object per pixel.
+"""
+import math
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import mapbox_vector_tile
+import numpy as np
+import shapely
+
+EARTH_RADIUS = 6378137.0
+# Half the width of the web mercator world, in metres
+MERCATOR_ORIGIN = math.pi * EARTH_RADIUS
+TILE_EXTENT = 4096
+# Features are clipped this many tile units beyond the tile edge, so polygons
+# don't show seams between neighbouring tiles
+TILE_BUFFER = 64
+# Classified pixels are drawn on at most this many cells across a tile
+MAX_PIXEL_GRID = 512
+
+
+def to_mercator(lon: np.ndarray, lat: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    lat = np.clip(lat, -85.0511, 85.0511)
+    x = np.radians(lon) * EARTH_RADIUS
+    y = np.log(np.tan(np.pi / 4 + np.radians(lat) / 2)) * EARTH_RADIUS
+    return x, y
+
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """(minx, miny, maxx, maxy) of a tile in web mercator metres."""
+    size = 2 * MERCATOR_ORIGIN / 2 ** z
+    minx = -MERCATOR_ORIGIN + x * size
+    maxy = MERCATOR_ORIGIN - y * size
+    return minx, maxy - size, minx + size, maxy
+
+
+def encode_tile(layers: Dict[str, List[Dict[str, Any]]], bounds: Tuple[float, float, float, float]) -> bytes:
+    """Encode {layer name: [{'geometry': mercator shapely geometry, 'properties': {...}}]} as one tile."""
+    return mapbox_vector_tile.encode(
+        [{"name": name, "features": features} for name, features in layers.items() if features],
+        default_options={"quantize_bounds": bounds, "extents": TILE_EXTENT}
+    )
+
+
+def _buffered(bounds: Tuple[float, float, float, float]) -> Tuple[float, float, float, float]:
+    pad = (bounds[2] - bounds[0]) * TILE_BUFFER / TILE_EXTENT
+    return bounds[0] - pad, bounds[1] - pad, bounds[2] + pad, bounds[3] + pad
+
+
+class PolygonLayer:
+    """Lon/lat polygons with properties (e.g. UC boundaries and indicators), indexed for tile queries."""
+
+    def __init__(self, geometries: Iterable, properties: List[Dict[str, Any]]):
+        def project(coords):
+            return np.column_stack(to_mercator(coords[:, 0], coords[:, 1]))
+
+        self.geometries = shapely.transform(np.asarray(list(geometries), dtype=object), project)
+        self.properties = properties
+        self.tree = shapely.STRtree(self.geometries)
+
+    @classmethod
+    def from_features(cls, features: Iterable[Dict[str, Any]]) -> "PolygonLayer":
+        """From GeoJSON features; properties with nested values are dropped, as MVT can't hold them."""
+        geometries, properties = [], []
+        for feature in features:
+            if not feature.get("geometry"):
+                continue
+            geometries.append(shapely.geometry.shape(feature["geometry"]))
+            properties.append({
+                key: value for key, value in (feature.get("properties") or {}).items()
+                if isinstance(value, (str, int, float, bool))
+            })
+        return cls(geometries, properties)
+
+    def features(self, bounds: Tuple[float, float, float, float]) -> List[Dict[str, Any]]:
+        clip = _buffered(bounds)
+        hits = self.tree.query(shapely.box(*clip))
+        if not len(hits):
+            return []
+        # Drop detail finer than one tile unit
+        tolerance = (bounds[2] - bounds[0]) / TILE_EXTENT
+        geometries = shapely.clip_by_rect(
+            shapely.simplify(self.geometries[hits], tolerance, preserve_topology=True), *clip
+        )
+        return [
+            {"geometry": geometry, "properties": self.properties[i]}
+            for i, geometry in zip(hits.tolist(), geometries)
+            if not geometry.is_empty
+        ]
+
+
+class PixelLayer:
+    """
+    Classified pixels drawn as rectangles.
+
+    Each tile gets a grid of at most MAX_PIXEL_GRID cells across (never finer
+    than the pixels themselves); every cell takes the most common class of the
+    pixels in it, and runs of equal cells along a row become one rectangle.
+    """
+
+    def __init__(self, latitude: np.ndarray, longitude: np.ndarray, class_ids: np.ndarray,
+                 step: float, class_names: Dict[int, str]):
+        self.x, self.y = to_mercator(np.asarray(longitude), np.asarray(latitude))
+        self.class_ids = np.asarray(class_ids, dtype=np.int64)
+        self.class_names = class_names
+        self.n_classes = max(class_names) + 1
+        # Pixel height in mercator metres at the layer's mean latitude (mercator stretches
+        # latitude by 1/cos), so grid cells are never smaller than a pixel in either direction
+        mean_lat = float(np.mean(latitude)) if len(latitude) else 0.0
+        self.pixel_size = np.radians(step) * EARTH_RADIUS / math.cos(math.radians(mean_lat))
+
+    def features(self, bounds: Tuple[float, float, float, float]) -> List[Dict[str, Any]]:
+        minx, miny, maxx, maxy = bounds
+        inside = np.flatnonzero((self.x >= minx) & (self.x < maxx) & (self.y > miny) & (self.y <= maxy))
+        if not len(inside):
+            return []
+
+        n = int(min(MAX_PIXEL_GRID, max(1, math.ceil((maxx - minx) / self.pixel_size))))
+        cell = (maxx - minx) / n
+        cols = np.minimum(((self.x[inside] - minx) / cell).astype(np.int64), n - 1)
+        rows = np.minimum(((maxy - self.y[inside]) / cell).astype(np.int64), n - 1)
+
+        # Majority class per cell; -1 where no pixel falls
+        votes = np.bincount(
+            (rows * n + cols) * self.n_classes + self.class_ids[inside], minlength=n * n * self.n_classes
+        ).reshape(n * n, self.n_classes)
+        grid = np.where(votes.any(axis=1), votes.argmax(axis=1), -1).reshape(n, n)
+
+        # Runs of equal cells along each row
+        starts = np.ones((n, n), dtype=bool)
+        starts[:, 1:] = grid[:, 1:] != grid[:, :-1]
+        run_rows, run_cols = np.nonzero(starts)
+        run_ends = np.append(run_cols[1:], n)
+        run_ends[np.append(run_rows[1:] != run_rows[:-1], True)] = n
+        classes = grid[run_rows, run_cols]
+        keep = classes >= 0
+        run_rows, run_cols, run_ends, classes = run_rows[keep], run_cols[keep], run_ends[keep], classes[keep]
+
+        boxes = shapely.box(
+            minx + run_cols * cell, maxy - (run_rows + 1) * cell,
+            minx + run_ends * cell, maxy - run_rows * cell
+        )
+        return [
+            {"geometry": box, "properties": {"class_id": int(class_id), "class": self.class_names.get(int(class_id), "")}}
+            for box, class_id in zip(boxes, classes.tolist())
+        ]
+
+
+def render_tile(layers: Dict[str, Any], z: int, x: int, y: int) -> Optional[bytes]:
+    """Encode the named PolygonLayer/PixelLayer objects for tile z/x/y; None if nothing is visible."""
+    bounds = tile_bounds(z, x, y)
+    features = {name: layer.features(bounds) for name, layer in layers.items()}
+    if not any(features.values()):
+        return None
+    return encode_tile(features, bounds)